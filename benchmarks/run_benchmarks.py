@@ -0,0 +1,197 @@
+from pathlib import Path
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+
+import pyarrow.parquet as pq
+
+from synthetic_data import DATA, default_config, generate_csv, parse_rows
+
+ROOT = Path(__file__).resolve().parent.parent
+SRC = ROOT / "src"
+BASELINES = Path(__file__).resolve().parent / "baselines.json"
+WORK = DATA / "work"
+
+# gated metrics: higher is worse
+METRICS = ["wall_s", "peak_rss_mb"]
+
+
+def stage_commands(raw: Path, work: Path, fe_engine: str, max_memory_mb: float | None) -> list[tuple]:
+    """
+    (stage, argv, input whose row count is the throughput denominator, output) — each stage's own CLI,
+    chained through Parquet intermediates.
+    """
+    tx, feats, labeled = work / "transactions_clean.parquet", work / "features.parquet", work / "labeled.parquet"
+    seg, scores, actions = work / "segments.parquet", work / "scores.parquet", work / "actions.parquet"
+    md_extra = ["--max_memory_mb", str(max_memory_mb)] if max_memory_mb else []
+    return [
+        ("make_dataset", ["make_dataset.py", "--in", raw, "--out", tx, "--format", "parquet", *md_extra], raw, tx),
+        ("feature_engineering", ["feature_engineering.py", "--in", tx, "--out", feats, "--engine", fe_engine,
+                                 "--format", "parquet"], tx, feats),
+        ("churn_label", ["churn_label.py", "--tx", tx, "--features", feats, "--out", labeled,
+                         "--format", "parquet"], feats, labeled),
+        ("segment_snapshot", ["segment_snapshot.py", "--in", tx, "--out", seg, "--format", "parquet"], tx, seg),
+        ("churn_model", ["churn_model.py", "--in", labeled, "--segment_snapshot", seg, "--out_scores", scores,
+                         "--out_report", work / "churn_model_report.txt", "--models_dir", work / "models",
+                         "--format", "parquet"], labeled, scores),
+        ("campaign_actions", ["campaign_actions.py", "--scores", scores, "--out", actions, "--format", "parquet"],
+         scores, actions),
+    ]
+
+
+def downstream(stage: str) -> list[str]:
+    names = [s[0] for s in stage_commands(Path(), Path(), "incremental", None)]
+    return names[names.index(stage) + 1:]
+
+
+def count_rows(path: Path) -> int:
+    if path.suffix == ".parquet":
+        return pq.ParquetFile(path).metadata.num_rows
+    sidecar = path.with_suffix(".json")
+    if sidecar.exists():
+        return json.loads(sidecar.read_text())["rows_written"]
+    with open(path, "rb") as f:
+        return sum(1 for _ in f) - 1
+
+
+def run_measured(argv: list) -> dict:
+    """
+    Run one stage in its own process: wall time, CPU time and that process's peak RSS (wait4 rusage).
+    """
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, *map(str, argv)], cwd=SRC, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT)
+    output = proc.stdout.read()
+    _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - t0
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{argv[0]} failed ({proc.returncode}):\n{output.decode(errors='replace')[-2000:]}")
+    return {
+        "wall_s": round(wall, 3),
+        "cpu_s": round(usage.ru_utime + usage.ru_stime, 3),
+        # ru_maxrss: KiB on Linux, bytes on macOS
+        "peak_rss_mb": round(usage.ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10), 1),
+    }
+
+
+def synthetic_input(label: str, regenerate: bool = False) -> Path:
+    path = DATA / f"synthetic_{label}.csv"
+    cfg = default_config(parse_rows(label))
+    sidecar = path.with_suffix(".json")
+    if not regenerate and path.exists() and sidecar.exists():
+        stored = json.loads(sidecar.read_text())
+        if {k: stored.get(k) for k in cfg} == cfg:
+            return path
+    t0 = time.perf_counter()
+    generate_csv(cfg, path)
+    print(f"▶ generated {path.name}: {cfg['rows']:,} rows in {time.perf_counter() - t0:.1f}s")
+    return path
+
+
+def run_size(label: str, stages: list[str] | None, fe_engine: str, max_memory_mb: float | None,
+             regenerate: bool = False) -> dict:
+    raw = synthetic_input(label, regenerate)
+    work = WORK / label
+    if not stages:
+        shutil.rmtree(work, ignore_errors=True)
+    work.mkdir(parents=True, exist_ok=True)
+
+    results = {}
+    for name, argv, rows_from, out in stage_commands(raw, work, fe_engine, max_memory_mb):
+        if stages and name not in stages:
+            # upstream of a measured subset: reuse the previous run's output, else build it unmeasured
+            if not out.exists() and any(s in stages for s in downstream(name)):
+                print(f"   {label:>5} {name:<20} (input for {','.join(stages)}, not measured)")
+                run_measured(argv)
+            continue
+        stats = run_measured(argv)
+        rows = count_rows(rows_from)
+        stats = {"rows": rows, **stats, "rows_per_s": round(rows / max(stats["wall_s"], 1e-9), 1)}
+        results[name] = stats
+        print(f"   {label:>5} {name:<20} {stats['wall_s']:>9.2f}s {stats['rows_per_s']:>13,.0f} rows/s "
+              f"{stats['peak_rss_mb']:>9,.0f} MB")
+    return results
+
+
+def compare(results: dict, baselines: dict, margin: float) -> list[str]:
+    """
+    Regressions: metric above baseline * (1 + margin). Sizes / stages without a baseline are not gated.
+    """
+    failures = []
+    for label, stages in results.items():
+        for stage, stats in stages.items():
+            base = baselines.get("sizes", {}).get(label, {}).get(stage)
+            if not base:
+                continue
+            for metric in METRICS:
+                if metric in base and stats[metric] > base[metric] * (1 + margin):
+                    failures.append(f"{label} {stage} {metric}: {stats[metric]} > {base[metric]} "
+                                    f"(+{stats[metric] / base[metric] - 1:.0%}, margin {margin:.0%})")
+    return failures
+
+
+def machine_info() -> dict:
+    return {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1M,10M,50M", help="comma-separated raw row counts, e.g. 1M or 1M,10M,50M")
+    ap.add_argument("--stages", default=None, help="comma-separated subset of stages (default: all)")
+    ap.add_argument("--fe_engine", choices=["prefix", "incremental", "asof", "duckdb"], default="prefix",
+                    help="feature_engineering engine (asof = build_features_asof per snapshot; duckdb = out-of-core SQL)")
+    ap.add_argument("--max_memory_mb", type=float, default=None, help="make_dataset: chunked ingestion budget")
+    ap.add_argument("--margin", type=float, default=0.25, help="allowed regression vs baseline (0.25 = +25%%)")
+    ap.add_argument("--baselines", default=str(BASELINES))
+    ap.add_argument("--update_baseline", action="store_true", help="store this run as the baseline")
+    ap.add_argument("--regenerate", action="store_true", help="rewrite the synthetic inputs")
+    ap.add_argument("--out", default=None, help="write this run's results (JSON)")
+    args = ap.parse_args()
+
+    labels = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    stages = [s.strip() for s in args.stages.split(",")] if args.stages else None
+
+    results = {}
+    for label in labels:
+        print(f"▶ benchmark {label} ({args.fe_engine} features)")
+        results[label] = run_size(label, stages, args.fe_engine, args.max_memory_mb, args.regenerate)
+
+    run = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "machine": machine_info(),
+           "fe_engine": args.fe_engine, "sizes": results}
+    if args.out:
+        Path(args.out).write_text(json.dumps(run, indent=2), encoding="utf-8")
+
+    baselines_path = Path(args.baselines)
+    baselines = json.loads(baselines_path.read_text()) if baselines_path.exists() else {}
+
+    if args.update_baseline:
+        merged = {**baselines, "machine": run["machine"], "fe_engine": args.fe_engine, "updated_at": run["created_at"]}
+        merged["sizes"] = {**baselines.get("sizes", {}),
+                           **{k: {**baselines.get("sizes", {}).get(k, {}), **v} for k, v in results.items()}}
+        baselines_path.write_text(json.dumps(merged, indent=2), encoding="utf-8")
+        print(f"✅ Saved baselines: {baselines_path}")
+        return
+
+    if not baselines:
+        print(f"ℹ️ No baselines at {baselines_path}; rerun with --update_baseline to record them.")
+        return
+    if baselines.get("machine") != run["machine"]:
+        print(f"⚠️ Baselines were recorded on {baselines.get('machine')}; this machine: {run['machine']}")
+
+    failures = compare(results, baselines, args.margin)
+    if failures:
+        print("❌ Regressions:")
+        for f in failures:
+            print(f"   {f}")
+        sys.exit(1)
+    print(f"✅ No regressions (margin {args.margin:.0%})")
+
+
+if __name__ == "__main__":
+    main()
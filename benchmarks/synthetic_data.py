@@ -0,0 +1,179 @@
+from pathlib import Path
+import argparse
+import json
+import numpy as np
+import pandas as pd
+
+DATA = Path(__file__).resolve().parent / "data"
+
+# Online Retail II layout (column names / order as in the Kaggle export)
+COLUMNS = ["Invoice", "StockCode", "Description", "Quantity", "InvoiceDate", "Price", "Customer ID", "Country"]
+COUNTRIES = ["United Kingdom", "Germany", "France", "EIRE", "Netherlands", "Spain", "Belgium", "Switzerland"]
+COUNTRY_WEIGHTS = [0.90, 0.02, 0.02, 0.02, 0.01, 0.01, 0.01, 0.01]
+
+FIRST_INVOICE = 489434
+FIRST_CUSTOMER = 12346
+FIRST_SKU = 10000
+CHUNKS_PER_YEAR = 24  # time slices; each one is generated and written independently
+
+
+def default_config(rows: int) -> dict:
+    """
+    Shape of the real export: ~20 lines per invoice, ~170 lines per customer, 2 years, ~4k SKUs.
+    """
+    return {
+        "rows": int(rows),
+        "customers": max(1_000, int(rows) // 170),
+        "invoices": max(1_000, int(rows) // 20),
+        "skus": 4_000,
+        "years": 2,
+        "start": "2009-12-01",
+        "guest_share": 0.2,
+        "cancel_share": 0.02,
+        "seed": 42,
+    }
+
+
+def _customers(cfg: dict, rng: np.random.Generator, start: int, end: int) -> pd.DataFrame:
+    """
+    Per-customer activity rate (heavy-tailed), active window (joins over time, ~40% stop buying) and country.
+    """
+    n = cfg["customers"]
+    span = end - start
+    first = start + (rng.random(n) ** 1.5 * span * 0.9).astype("int64")
+    last = np.where(rng.random(n) < 0.4, first + (rng.random(n) * (end - first)).astype("int64"), end)
+    return pd.DataFrame({
+        "CustomerID": np.arange(FIRST_CUSTOMER, FIRST_CUSTOMER + n),
+        "rate": rng.lognormal(0.0, 1.0, n),
+        "first": first,
+        "last": np.maximum(last, first + 86_400 * 10**9),
+        "Country": rng.choice(COUNTRIES, n, p=COUNTRY_WEIGHTS),
+    })
+
+
+def generate_chunks(cfg: dict):
+    """
+    Yield raw DataFrames (COLUMNS) in time order; same cfg -> same rows, whatever the consumer.
+    """
+    rng = np.random.default_rng(cfg["seed"])
+    start = pd.Timestamp(cfg["start"]).value
+    end = (pd.Timestamp(cfg["start"]) + pd.DateOffset(years=cfg["years"])).value
+    customers = _customers(cfg, rng, start, end)
+
+    # SKU catalogue: Zipf-like popularity, fixed list price
+    skus = np.arange(FIRST_SKU, FIRST_SKU + cfg["skus"])
+    popularity = 1.0 / np.arange(1, cfg["skus"] + 1) ** 0.8
+    popularity /= popularity.sum()
+    prices = np.round(rng.lognormal(0.8, 0.8, cfg["skus"]), 2) + 0.01
+
+    n_chunks = max(1, CHUNKS_PER_YEAR * cfg["years"])
+    bounds = np.linspace(start, end, n_chunks + 1).astype("int64")
+    lines_per_invoice = cfg["rows"] / cfg["invoices"]
+    next_invoice = FIRST_INVOICE
+    rows_left = cfg["rows"]
+
+    for k in range(n_chunks):
+        crng = np.random.default_rng([cfg["seed"], k])
+        t0, t1 = bounds[k], bounds[k + 1]
+        target = rows_left // (n_chunks - k)
+        rows_left -= target
+        if target <= 0:
+            continue
+
+        active = customers[(customers["first"] < t1) & (customers["last"] >= t0)]
+        n_inv = max(1, int(round(target / lines_per_invoice)))
+        lines = crng.geometric(1.0 / lines_per_invoice, n_inv)
+        cum = np.cumsum(lines)
+        # exactly `target` rows: cut at the invoice that crosses it, or pad the last one
+        if cum[-1] >= target:
+            n_inv = int(np.searchsorted(cum, target)) + 1
+            lines = lines[:n_inv]
+            lines[-1] -= cum[n_inv - 1] - target
+        else:
+            lines[-1] += target - cum[-1]
+
+        # invoice -> customer (by activity rate) or guest checkout; date inside the customer's window
+        if len(active):
+            who = crng.choice(len(active), n_inv, p=(active["rate"] / active["rate"].sum()).to_numpy())
+            lo = np.maximum(active["first"].to_numpy()[who], t0)
+            hi = np.minimum(active["last"].to_numpy()[who], t1)
+            cust = active["CustomerID"].to_numpy()[who].astype(float)
+            country = active["Country"].to_numpy()[who]
+        else:
+            lo, hi = np.full(n_inv, t0), np.full(n_inv, t1)
+            cust = np.full(n_inv, np.nan)
+            country = np.full(n_inv, COUNTRIES[0], dtype=object)
+        guest = crng.random(n_inv) < cfg["guest_share"]
+        cust[guest] = np.nan
+        ts = lo + (crng.random(n_inv) * np.maximum(hi - lo, 1)).astype("int64")
+
+        order = np.argsort(ts, kind="stable")
+        ts, cust, country, lines = ts[order], cust[order], country[order], lines[order]
+        invoice = np.arange(next_invoice, next_invoice + n_inv).astype(str).astype(object)
+        next_invoice += n_inv
+        cancel = crng.random(n_inv) < cfg["cancel_share"]
+        invoice[cancel] = "C" + invoice[cancel]
+
+        idx = np.repeat(np.arange(n_inv), lines)
+        sku = crng.choice(cfg["skus"], len(idx), p=popularity)
+        qty = crng.geometric(0.3, len(idx))
+        qty = np.where(cancel[idx], -qty, qty)
+
+        yield pd.DataFrame({
+            "Invoice": invoice[idx],
+            "StockCode": skus[sku],
+            "Description": np.char.add("PRODUCT ", skus[sku].astype(str)),
+            "Quantity": qty,
+            "InvoiceDate": pd.to_datetime(ts[idx]).floor("min").strftime("%Y-%m-%d %H:%M:%S"),
+            "Price": prices[sku],
+            "Customer ID": cust[idx],
+            "Country": country[idx],
+        }, columns=COLUMNS)
+
+
+def generate_csv(cfg: dict, out_path) -> Path:
+    """
+    Stream the synthetic export to CSV (memory = one time slice) + a <name>.json sidecar with cfg and row count.
+    """
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    rows = 0
+    with open(out_path, "w", encoding="utf-8", newline="") as f:
+        for i, chunk in enumerate(generate_chunks(cfg)):
+            chunk.to_csv(f, index=False, header=(i == 0))
+            rows += len(chunk)
+    out_path.with_suffix(".json").write_text(json.dumps({**cfg, "rows_written": rows}, indent=2), encoding="utf-8")
+    return out_path
+
+
+def parse_rows(arg: str) -> int:
+    """
+    "1M" / "10m" / "250k" / "50000000" -> int.
+    """
+    s = str(arg).strip().lower().replace("_", "")
+    mult = {"k": 10**3, "m": 10**6, "b": 10**9}.get(s[-1:], 1)
+    return int(float(s[:-1] if mult > 1 else s) * mult)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", default="1M", help="raw rows, e.g. 1M, 10M, 50M")
+    ap.add_argument("--customers", type=int, default=None, help="default: rows / 170")
+    ap.add_argument("--invoices", type=int, default=None, help="default: rows / 20")
+    ap.add_argument("--skus", type=int, default=None)
+    ap.add_argument("--years", type=int, default=None)
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--out", default=None, help="default: benchmarks/data/synthetic_<rows>.csv")
+    args = ap.parse_args()
+
+    cfg = default_config(parse_rows(args.rows))
+    for k in ["customers", "invoices", "skus", "years", "seed"]:
+        if getattr(args, k) is not None:
+            cfg[k] = getattr(args, k)
+
+    out = generate_csv(cfg, args.out or DATA / f"synthetic_{args.rows}.csv")
+    print(f"✅ Saved synthetic transactions: {out} | Rows: {cfg['rows']:,} | Customers: {cfg['customers']:,}")
+
+
+if __name__ == "__main__":
+    main()
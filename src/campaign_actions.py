@@ -1,29 +1,175 @@
 from pathlib import Path
 import argparse
+import json
 import pandas as pd
 import numpy as np
 
+from customer_ids import clean_ids
+from table_io import FORMATS, REASON_COLUMN, is_columnar, read_table, reason_columns_in, write_table
 
-def to_clean_id(s: pd.Series) -> pd.Series:
-    return s.astype(str).str.replace(".0", "", regex=False).str.strip()
+RULES = Path(__file__).resolve().parent.parent / "config" / "campaign_rules.json"
 
 
 def normalize_date(s: pd.Series) -> pd.Series:
     return pd.to_datetime(s, errors="coerce").dt.normalize()
 
 
-def safe_num(x, default=0.0):
-    try:
-        if pd.isna(x):
-            return default
-        return float(x)
-    except Exception:
-        return default
+# -------------------------
+# Rule table (config/campaign_rules.json) -> vectorized masks + np.select
+# -------------------------
+NUMERIC_FIELDS = ["churn_probability", "churn_flag", "recency_days", "total_orders", "total_revenue"]
+TEXT_FIELDS = ["value_tier", "segment", "priority"]  # + reason_N: churn_scores top churn drivers (feature names)
+OPS = ["==", "!=", ">", ">=", "<", "<=", "in", "contains"]
+
+
+def load_rules(path=RULES) -> dict:
+    with open(path, encoding="utf-8") as f:
+        rules = json.load(f)
+    for section in ["conditions", "priority", "action", "budget"]:
+        if section not in rules:
+            raise ValueError(f"Missing section in campaign rules ({path}): {section}")
+    return rules
+
+
+def _num(df: pd.DataFrame, cols: list[str], default: float = 0.0) -> pd.Series:
+    # first existing column, coerced to float; missing/unparseable -> default
+    for c in cols:
+        if c in df.columns:
+            return pd.to_numeric(df[c], errors="coerce").astype(float).fillna(default)
+    return pd.Series(default, index=df.index, dtype=float)
+
+
+def _text(df: pd.DataFrame, cols: list[str], default: str = "") -> pd.Series:
+    for c in cols:
+        if c in df.columns:
+            return df[c].astype(str).str.strip().str.lower()
+    return pd.Series(default, index=df.index, dtype=object)
+
+
+def rule_context(df: pd.DataFrame) -> dict:
+    """
+    Columns the rules can reference, normalized once for the whole frame.
+    """
+    return {
+        "churn_probability": _num(df, ["churn_probability"]),
+        "churn_flag": np.trunc(_num(df, ["churn_flag"])),
+        "recency_days": _num(df, ["recency_days", "RecencyDays"]),
+        "total_orders": _num(df, ["total_orders", "Frequency"]),
+        "total_revenue": _num(df, ["total_revenue"]),
+        "value_tier": _text(df, ["value_tier"], "unknown"),
+        "segment": _text(df, ["segment", "Segment"]),
+        **{c: _text(df, [c]) for c in reason_columns_in(df.columns)},
+    }
+
+
+def _compare(values: pd.Series, op: str, target) -> pd.Series:
+    if op == "==":
+        return values == target
+    if op == "!=":
+        return values != target
+    if op == ">":
+        return values > target
+    if op == ">=":
+        return values >= target
+    if op == "<":
+        return values < target
+    if op == "<=":
+        return values <= target
+    if op == "in":
+        return values.isin(target if isinstance(target, list) else [target])
+    if op == "contains":
+        return values.str.contains(str(target).lower(), regex=False)
+    raise ValueError(f"Unknown rule op: {op} (expected one of {OPS})")
+
+
+class RuleCompiler:
+    """
+    Evaluates named/inline conditions to boolean masks over a rule context (each named condition once).
+    """
+
+    def __init__(self, conditions: dict, ctx: dict):
+        self.conditions = conditions
+        self.ctx = ctx
+        self._masks: dict[str, np.ndarray] = {}
+        self._resolving: set[str] = set()
+
+    def mask(self, cond) -> np.ndarray:
+        if isinstance(cond, str):
+            return self._named(cond)
+        if isinstance(cond, list):
+            return self._all(cond)
+        if not isinstance(cond, dict):
+            raise ValueError(f"Invalid rule condition: {cond!r}")
+        if "any" in cond:
+            out = np.zeros(self._n(), dtype=bool)
+            for c in cond["any"]:
+                out |= self.mask(c)
+            return out
+        if "all" in cond:
+            return self._all(cond["all"])
+        if "not" in cond:
+            return ~self.mask(cond["not"])
+
+        field = cond.get("field")
+        is_reason = isinstance(field, str) and REASON_COLUMN.fullmatch(field) is not None
+        if field not in self.ctx:
+            if not is_reason:
+                raise ValueError(
+                    f"Unknown rule field: {field} (expected one of {NUMERIC_FIELDS + TEXT_FIELDS + ['reason_N']})"
+                )
+            # reason slot the scores do not have (fewer --reasons): no driver, like an empty slot
+            self.ctx[field] = pd.Series("nan", index=next(iter(self.ctx.values())).index, dtype=object)
+        target = cond.get("value")
+        if field in TEXT_FIELDS or is_reason:
+            target = [str(v).lower() for v in target] if isinstance(target, list) else str(target).lower()
+        return _compare(self.ctx[field], cond.get("op"), target).to_numpy(dtype=bool)
+
+    def _n(self) -> int:
+        return len(next(iter(self.ctx.values())))
+
+    def _all(self, conds: list) -> np.ndarray:
+        out = np.ones(self._n(), dtype=bool)
+        for c in conds:
+            out &= self.mask(c)
+        return out
+
+    def _named(self, name: str) -> np.ndarray:
+        if name in self._masks:
+            return self._masks[name]
+        if name not in self.conditions:
+            raise ValueError(f"Unknown rule condition: {name}")
+        if name in self._resolving:
+            raise ValueError(f"Circular rule condition: {name}")
+        self._resolving.add(name)
+        self._masks[name] = self.mask(self.conditions[name])
+        self._resolving.discard(name)
+        return self._masks[name]
+
+
+def apply_rule_table(table: dict, compiler: RuleCompiler, index: pd.Index) -> pd.DataFrame:
+    """
+    Ordered rules, first match wins; outputs a rule does not set fall back to the table default.
+    """
+    default = table.get("default", {})
+    rules = table.get("rules", [])
+    masks = [compiler.mask(r.get("when", [])) for r in rules]
+    keys = list(default) + [k for r in rules for k in r.get("set", {}) if k not in default]
+
+    out = {}
+    for k in keys:
+        fallback = default.get(k)
+        choices = [r.get("set", {}).get(k, fallback) for r in rules]
+        values = np.full(len(index), fallback, dtype=object)
+        # reversed so earlier rules overwrite later ones
+        for m, v in zip(reversed(masks), reversed(choices)):
+            values[m] = v
+        out[k] = values
+    return pd.DataFrame(out, index=index)
 
 
 def compute_value_tier(df: pd.DataFrame) -> pd.Series:
     if "value_tier" in df.columns and df["value_tier"].notna().any():
-        return df["value_tier"].fillna("Unknown").astype(str)
+        return df["value_tier"].astype(object).fillna("Unknown").astype(str)
 
     if "total_revenue" not in df.columns:
         return pd.Series(["Unknown"] * len(df), index=df.index)
@@ -32,120 +178,53 @@ def compute_value_tier(df: pd.DataFrame) -> pd.Series:
     q1 = float(rev.quantile(0.33))
     q2 = float(rev.quantile(0.66))
 
-    def tier(v):
-        v = safe_num(v, 0.0)
-        if v >= q2:
-            return "High Value"
-        if v >= q1:
-            return "Mid Value"
-        return "Low Value"
+    tier = np.select([rev >= q2, rev >= q1], ["High Value", "Mid Value"], default="Low Value")
+    return pd.Series(tier, index=df.index, dtype=object)
 
-    return rev.apply(tier)
 
+def budget_suggestion(ctx: dict, priority: pd.Series, compiler: RuleCompiler, budget: dict) -> pd.Series:
+    revenue = ctx["total_revenue"]
+    p = ctx["churn_probability"].clip(0.0, 1.0)
 
-def compute_priority(row: pd.Series) -> str:
-    churn_flag = int(safe_num(row.get("churn_flag", 0), 0))
-    p = safe_num(row.get("churn_probability", 0), 0.0)
-    tier = str(row.get("value_tier", "Unknown")).lower()
-    seg = str(row.get("segment", row.get("Segment", ""))).lower()
+    mult = priority.astype(str).map(budget["priority_multiplier"]).astype(float).fillna(budget["default_multiplier"])
+    base = budget["revenue_rate"] * revenue
+    base = base * mult
+    base = base * (budget["probability_base"] + budget["probability_slope"] * p)
 
-    if churn_flag == 1:
-        if "high" in tier or seg in ["champions", "loyal"]:
-            return "P1"
-        if "mid" in tier:
-            return "P2"
-        return "P3"
+    limits = apply_rule_table(budget["limits"], compiler, revenue.index)
+    cap = limits["cap"].astype(float)
+    floor = limits["floor"].astype(float)
 
-    if p >= 0.60 and ("high" in tier or seg in ["champions", "loyal"]):
-        return "P2"
+    out = np.minimum(cap, np.maximum(floor, base))
+    return out.where(revenue > 0, floor)
 
-    return "P4"
-
-
-def choose_action_offer_message(row: pd.Series) -> tuple[str, str, str]:
-    p = safe_num(row.get("churn_probability", 0.0), 0.0)
-    churn_flag = int(safe_num(row.get("churn_flag", 0), 0))
-    tier = str(row.get("value_tier", "Unknown")).lower()
-    seg = str(row.get("segment", row.get("Segment", ""))).strip()
-
-    rec = safe_num(row.get("recency_days", row.get("RecencyDays", 0)), 0.0)
-    orders = safe_num(row.get("total_orders", row.get("Frequency", 0)), 0.0)
-
-    high_value = ("high" in tier) or (seg.lower() in ["champions", "loyal"])
-    very_inactive = rec >= 180
-    new_or_one_timer = orders <= 1
-
-    if churn_flag == 1:
-        if high_value:
-            if very_inactive:
-                return ("Win-back (1:1 outreach)", "Personalized discount (10–15%)", "We miss you + tailored picks")
-            return ("Win-back (priority queue)", "Personalized voucher (10%)", "Exclusive comeback: curated bestsellers")
-
-        if very_inactive:
-            return ("Reactivation campaign", "Free shipping / limited-time voucher", "Limited-time comeback offer")
-        if new_or_one_timer:
-            return ("Second-purchase nudge", "Small voucher (5–10%)", "Complete your set / popular add-ons")
-
-        return ("Re-engagement email", "Small voucher (5–10%)", "New arrivals + reminder")
-
-    if p >= 0.60 and high_value:
-        return ("Proactive retention", "Perks / early access", "VIP early access + tailored picks")
-    if p >= 0.40:
-        return ("Cross-sell / upsell", "Bundle offer", "Recommended bundles based on your history")
-
-    return ("Growth nurture", "Content / recommendations", "New arrivals + personalized recommendations")
-
-
-def budget_suggestion(row: pd.Series) -> float:
-    tier = str(row.get("value_tier", "Unknown")).lower()
-    revenue = safe_num(row.get("total_revenue", 0.0), 0.0)
-    p = safe_num(row.get("churn_probability", 0.0), 0.0)
-    prio = str(row.get("priority", "P4"))
-
-    base = 0.03 * revenue
-
-    if prio == "P1":
-        base *= 1.5
-    elif prio == "P2":
-        base *= 1.2
-    elif prio == "P3":
-        base *= 1.0
-    else:
-        base *= 0.6
-
-    base *= (0.8 + 0.4 * min(max(p, 0.0), 1.0))
-
-    if "high" in tier:
-        cap, floor = 500.0, 80.0
-    elif "mid" in tier:
-        cap, floor = 200.0, 25.0
-    elif "low" in tier:
-        cap, floor = 80.0, 10.0
-    else:
-        cap, floor = 150.0, 15.0
-
-    if revenue <= 0:
-        return float(floor)
-
-    return float(min(cap, max(floor, base)))
-
-
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--scores", required=True, help="churn_scores.csv")
-    ap.add_argument("--out", required=True, help="campaign_actions.csv")
-    ap.add_argument("--only_flagged", action="store_true", help="Keep only churn_flag=1 rows.")
-    ap.add_argument("--only_action_list", action="store_true", help="Keep only action_flag_top15=1 rows (recommended).")
-    args = ap.parse_args()
-
-    df = pd.read_csv(args.scores)
 
+def prepare_scores(df: pd.DataFrame, typed: bool = False) -> pd.DataFrame:
+    """
+    Validate + normalize churn scores. typed=True: dates/IDs already typed (Parquet/in-memory).
+    """
     for col in ["CustomerID", "SnapshotDate", "churn_probability"]:
         if col not in df.columns:
             raise ValueError(f"Missing required column in scores: {col}")
 
-    df["CustomerID"] = to_clean_id(df["CustomerID"])
-    df["SnapshotDate"] = normalize_date(df["SnapshotDate"])
+    if not typed:
+        df = df.copy()
+        df["CustomerID"] = clean_ids(df["CustomerID"])
+        df["SnapshotDate"] = normalize_date(df["SnapshotDate"])
+
+    return df
+
+
+def build_campaign_actions(
+    df: pd.DataFrame,
+    only_flagged: bool = False,
+    only_action_list: bool = False,
+    rules: dict | None = None,
+) -> pd.DataFrame:
+    """
+    Priority / action / offer / message / budget from the campaign rule table (default: config/campaign_rules.json).
+    """
+    df = df.copy()
 
     # Robust aliases (do not remove originals)
     if "Segment" in df.columns and "segment" not in df.columns:
@@ -161,14 +240,8 @@ def main():
         ).astype(str)
 
     if "dynamic_threshold" not in df.columns:
-        def rb_thr(rb):
-            rb = str(rb).lower()
-            if rb == "high":
-                return 0.30
-            if rb == "medium":
-                return 0.50
-            return 0.70
-        df["dynamic_threshold"] = df["risk_bucket"].apply(rb_thr)
+        rb = df["risk_bucket"].astype(str).str.lower()
+        df["dynamic_threshold"] = np.select([rb == "high", rb == "medium"], [0.30, 0.50], default=0.70)
 
     if "churn_flag" not in df.columns:
         df["churn_flag"] = (
@@ -177,21 +250,26 @@ def main():
         ).astype(int)
 
     df["value_tier"] = compute_value_tier(df)
-    df["priority"] = df.apply(compute_priority, axis=1)
 
-    triples = df.apply(choose_action_offer_message, axis=1)
-    df["action"] = [t[0] for t in triples]
-    df["offer_type"] = [t[1] for t in triples]
-    df["message_angle"] = [t[2] for t in triples]
+    rules = rules if rules is not None else load_rules()
+    ctx = rule_context(df)
+    compiler = RuleCompiler(rules["conditions"], ctx)
+
+    df["priority"] = apply_rule_table(rules["priority"], compiler, df.index)["priority"]
+    ctx["priority"] = df["priority"].astype(str).str.lower()
+
+    decisions = apply_rule_table(rules["action"], compiler, df.index)
+    for col in ["action", "offer_type", "message_angle"]:
+        df[col] = decisions[col]
 
-    df["budget_suggestion"] = df.apply(budget_suggestion, axis=1).round(2)
+    df["budget_suggestion"] = budget_suggestion(ctx, df["priority"], compiler, rules["budget"]).round(2)
 
-    if args.only_action_list:
+    if only_action_list:
         if "action_flag_top15" not in df.columns:
             raise ValueError("action_flag_top15 not found in scores. Run churn_model.py first.")
         df = df[df["action_flag_top15"] == 1].copy()
 
-    if args.only_flagged:
+    if only_flagged:
         df = df[df["churn_flag"] == 1].copy()
 
     out_cols = [
@@ -201,13 +279,33 @@ def main():
         "expected_loss", "action_flag_top15",
         "total_revenue", "total_orders", "recency_days", "tenure_days",
         "segment", "RFM_Score", "value_tier",
-        "priority", "action", "offer_type", "message_angle", "budget_suggestion"
+        "priority", "action", "offer_type", "message_angle", *reason_columns_in(df.columns), "budget_suggestion"
     ]
+    # extra action lists (churn_model --top_pct 0.05,0.10,...) sit next to the top15 flag
+    extra_flags = [c for c in df.columns if c.startswith("action_flag_top") and c not in out_cols]
+    at = out_cols.index("action_flag_top15") + 1
+    out_cols = out_cols[:at] + extra_flags + out_cols[at:]
     out_cols = [c for c in out_cols if c in df.columns]
+    return df[out_cols]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scores", required=True, help="churn_scores.csv")
+    ap.add_argument("--out", required=True, help="campaign_actions.csv")
+    ap.add_argument("--only_flagged", action="store_true", help="Keep only churn_flag=1 rows.")
+    ap.add_argument("--only_action_list", action="store_true", help="Keep only action_flag_top15=1 rows (recommended).")
+    ap.add_argument("--format", choices=FORMATS, default="csv", help="output format (scores are read by suffix)")
+    ap.add_argument("--rules", default=str(RULES), help="campaign rule table (JSON)")
+    args = ap.parse_args()
+
+    df = prepare_scores(read_table(args.scores), typed=is_columnar(args.scores))
+    out = build_campaign_actions(
+        df, only_flagged=args.only_flagged, only_action_list=args.only_action_list, rules=load_rules(args.rules)
+    )
 
-    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
-    df[out_cols].to_csv(args.out, index=False)
-    print(f"✅ Saved campaign actions: {args.out} | Rows: {len(df):,}")
+    out_path = write_table(out, args.out, args.format)
+    print(f"✅ Saved campaign actions: {out_path} | Rows: {len(out):,}")
 
 
 if __name__ == "__main__":
@@ -1,74 +1,133 @@
-from pathlib import Path
 import argparse
 import pandas as pd
 import numpy as np
 
-
-def to_clean_id(s: pd.Series) -> pd.Series:
-    return s.astype(str).str.replace(".0", "", regex=False).str.strip()
+from customer_ids import clean_ids
+from snapshots import parse_windows
+from table_io import FORMATS, is_columnar, read_table, write_table
 
 
 def normalize_date(s: pd.Series) -> pd.Series:
     return pd.to_datetime(s, errors="coerce").dt.normalize()
 
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--tx", required=True, help="transactions_clean.csv")
-    ap.add_argument("--features", required=True, help="customer_features_monthly.csv")
-    ap.add_argument("--out", required=True)
-    ap.add_argument("--label_window_days", type=int, default=90)
-    ap.add_argument("--require_active_in_lookback", action="store_true",
-                    help="Only keep customers active in lookback features")
-    args = ap.parse_args()
+def parse_label_windows(arg: str) -> list[int]:
+    """
+    "90" -> [90]; "90,30,180" -> [90, 30, 180]. First window is the primary churn_label.
+    """
+    return parse_windows(arg, primary_first=True, option="--label_window_days")
+
 
-    tx = pd.read_csv(args.tx)
-    tx["InvoiceDate"] = pd.to_datetime(tx["InvoiceDate"], errors="coerce")
+def next_purchase_dates(tx: pd.DataFrame, feats: pd.DataFrame) -> pd.Series:
+    """
+    First purchase date strictly after SnapshotDate for every (CustomerID, SnapshotDate) row.
+    One sorted as-of join instead of masking tx per snapshot. NaT = no later purchase.
+    """
+    buys = (
+        tx[["CustomerID", "InvoiceDate"]]
+        .drop_duplicates()
+        .rename(columns={"InvoiceDate": "NextPurchase"})
+        .sort_values("NextPurchase", kind="stable")
+    )
+    left = feats[["CustomerID", "SnapshotDate"]].reset_index(names="_row").sort_values("SnapshotDate", kind="stable")
+    joined = pd.merge_asof(
+        left,
+        buys,
+        left_on="SnapshotDate",
+        right_on="NextPurchase",
+        by="CustomerID",
+        direction="forward",
+        allow_exact_matches=False,
+    )
+    return joined.set_index("_row")["NextPurchase"].reindex(feats.index)
+
+
+def label_churn(
+    snapshot: pd.Series,
+    next_purchase: pd.Series,
+    window_days: int,
+    global_max_tx: pd.Timestamp,
+) -> pd.Series:
+    """
+    churn = 1 if no purchase in (snapshot, snapshot + window]; NaN if the window
+    ends after the last observed transaction date (right-censoring).
+    """
+    window_end = snapshot + pd.Timedelta(days=window_days)
+    label = pd.Series(np.where(next_purchase <= window_end, 0.0, 1.0), index=snapshot.index)
+    label[window_end > global_max_tx] = np.nan
+    if label.notna().all():
+        label = label.astype(int)
+    return label
+
+
+def prepare_transactions(tx: pd.DataFrame, typed: bool = False) -> pd.DataFrame:
+    """
+    Purchase days per customer. typed=True: dates/IDs already typed (Parquet/in-memory), skip re-parsing.
+    """
+    tx = tx[["InvoiceDate", "CustomerID", "InvoiceNo"]].copy()
+    if not typed:
+        tx["InvoiceDate"] = pd.to_datetime(tx["InvoiceDate"], errors="coerce")
     tx = tx.dropna(subset=["InvoiceDate", "CustomerID", "InvoiceNo"]).copy()
-    tx["CustomerID"] = to_clean_id(tx["CustomerID"])
+    if not typed:
+        tx["CustomerID"] = clean_ids(tx["CustomerID"])
     tx["InvoiceDate"] = tx["InvoiceDate"].dt.normalize()
+    return tx
 
-    feats = pd.read_csv(args.features)
-    feats["SnapshotDate"] = normalize_date(feats["SnapshotDate"])
-    feats["CustomerID"] = to_clean_id(feats["CustomerID"])
-    feats = feats.dropna(subset=["SnapshotDate", "CustomerID"]).copy()
 
+def prepare_features(feats: pd.DataFrame, typed: bool = False) -> pd.DataFrame:
+    if not typed:
+        feats = feats.copy()
+        feats["SnapshotDate"] = normalize_date(feats["SnapshotDate"])
+        feats["CustomerID"] = clean_ids(feats["CustomerID"])
+    return feats.dropna(subset=["SnapshotDate", "CustomerID"]).copy()
+
+
+def label_features(
+    tx: pd.DataFrame,
+    feats: pd.DataFrame,
+    windows: list[int],
+    require_active_in_lookback: bool = False,
+) -> pd.DataFrame:
     global_max_tx = tx["InvoiceDate"].max()
     if pd.isna(global_max_tx):
         raise ValueError("No valid InvoiceDate found in transactions.")
 
-    labels = []
-    for snap, chunk in feats.groupby("SnapshotDate", sort=True):
-        window_end = snap + pd.Timedelta(days=args.label_window_days)
-        if window_end > global_max_tx:
-            labels.append(
-                pd.DataFrame({
-                    "CustomerID": chunk["CustomerID"].tolist(),
-                    "SnapshotDate": snap,
-                    "churn_label": np.nan
-                })
-            )
-            continue
-
-        start = snap + pd.Timedelta(days=1)
-        end = window_end
-
-        in_window = tx[(tx["InvoiceDate"] >= start) & (tx["InvoiceDate"] <= end)]
-        buyers = set(in_window["CustomerID"].unique())
-
-        cids = chunk["CustomerID"].tolist()
-        churn = [0 if cid in buyers else 1 for cid in cids]
-        labels.append(pd.DataFrame({"CustomerID": cids, "SnapshotDate": snap, "churn_label": churn}))
-
-    lab = pd.concat(labels, ignore_index=True)
-    out = feats.merge(lab, on=["CustomerID", "SnapshotDate"], how="left")
-
-    if args.require_active_in_lookback:
+    next_purchase = next_purchase_dates(tx, feats)
+
+    out = feats.copy()
+    out["churn_label"] = label_churn(out["SnapshotDate"], next_purchase, windows[0], global_max_tx)
+    if len(windows) > 1:
+        for w in windows:
+            out[f"churn_label_{w}d"] = label_churn(out["SnapshotDate"], next_purchase, w, global_max_tx)
+
+    if require_active_in_lookback:
         if "total_orders" in out.columns:
             out = out[out["total_orders"].fillna(0) > 0].copy()
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tx", required=True, help="transactions_clean.csv or order facts (one row per order)")
+    ap.add_argument("--features", required=True, help="customer_features_monthly.csv")
+    ap.add_argument("--out", required=True)
+    ap.add_argument("--label_window_days", type=str, default="90",
+                    help="Days, or comma list for multi-horizon labels (e.g. 30,60,90,180). First = churn_label.")
+    ap.add_argument("--require_active_in_lookback", action="store_true",
+                    help="Only keep customers active in lookback features")
+    ap.add_argument("--format", choices=FORMATS, default="csv", help="output format (inputs are read by suffix)")
+    args = ap.parse_args()
+
+    # Parquet inputs are already typed (datetime dates, clean IDs): skip re-parsing
+    tx = prepare_transactions(
+        read_table(args.tx, columns=["InvoiceDate", "CustomerID", "InvoiceNo"]), typed=is_columnar(args.tx)
+    )
+    feats = prepare_features(read_table(args.features), typed=is_columnar(args.features))
+
+    windows = parse_label_windows(args.label_window_days)
+    out = label_features(tx, feats, windows, require_active_in_lookback=args.require_active_in_lookback)
 
-    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
-    out.to_csv(args.out, index=False)
+    out_path = write_table(out, args.out, args.format)
 
     n_total = len(out)
     n_labeled = int(out["churn_label"].notna().sum())
@@ -76,10 +135,14 @@ def main():
     months = out["SnapshotDate"].nunique()
 
     print(
-        f"✅ Saved labeled snapshots: {args.out} | Rows: {n_total:,} | Months: {months} | "
+        f"✅ Saved labeled snapshots: {out_path} | Rows: {n_total:,} | Months: {months} | "
         f"Labeled: {n_labeled:,} | Unobservable (NaN): {n_unobs:,} | "
-        f"Global max tx date: {global_max_tx.date()}"
+        f"Global max tx date: {tx['InvoiceDate'].max().date()}"
     )
+    if len(windows) > 1:
+        for w in windows:
+            col = f"churn_label_{w}d"
+            print(f"   {col}: labeled {int(out[col].notna().sum()):,} | churn rate {out[col].mean():.4f}")
 
 
 if __name__ == "__main__":
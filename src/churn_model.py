@@ -1,18 +1,33 @@
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 import argparse
+import json
+import multiprocessing
+import os
+import pickle
+import re
+import time
 import pandas as pd
 import numpy as np
 
 from sklearn.metrics import roc_auc_score, average_precision_score
 from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from threadpoolctl import threadpool_limits
 
-try:
-    from lightgbm import LGBMClassifier
-    HAS_LGBM = True
-except Exception:
-    HAS_LGBM = False
+import instrumentation
+import lgbm_dataset
+import reason_codes
+from decisioning import DEFAULT_TOP_PCT, apply_decisioning, parse_top_pcts, risk_buckets
+from customer_ids import clean_ids
+from lgbm_dataset import HAS_LGBM
+from table_io import FORMATS, is_columnar, read_table, write_table
 
 
+MODELS = Path(__file__).resolve().parent.parent / "models" / "churn_model"
+ARTIFACT_FORMAT = 1
+
 FEATURE_CANDIDATES = [
     "tenure_days",
     "total_orders",
@@ -23,23 +38,17 @@ FEATURE_CANDIDATES = [
     "avg_days_between_orders",
     "median_days_between_orders",
     "recency_days",
-    "revenue_last_30d",
-    "orders_last_30d",
-    "revenue_last_90d",
-    "orders_last_90d",
 ]
+# rolling windows are configurable (feature_engineering --windows): every revenue/orders_last_<d>d pair is a feature
+ROLLING_FEATURE = re.compile(r"^(revenue|orders)_last_(\d+)d$")
 
 
-def bucket_risk(p: float) -> str:
-    if p >= 0.80:
-        return "High"
-    if p >= 0.50:
-        return "Medium"
-    return "Low"
-
-
-def to_clean_id(s: pd.Series) -> pd.Series:
-    return s.astype(str).str.replace(".0", "", regex=False).str.strip()
+def feature_columns(df: pd.DataFrame) -> list[str]:
+    """
+    FEATURE_CANDIDATES present in df, then the rolling-window columns by window (30d before 90d).
+    """
+    rolling = [(int(m.group(2)), m.group(1) == "orders", c) for c in df.columns if (m := ROLLING_FEATURE.match(c))]
+    return [c for c in FEATURE_CANDIDATES if c in df.columns] + [c for *_, c in sorted(rolling)]
 
 
 def normalize_date(s: pd.Series) -> pd.Series:
@@ -69,111 +78,113 @@ def choose_cutoff_date(df: pd.DataFrame, cutoff_arg: str | None) -> pd.Timestamp
     return pd.to_datetime(cutoff).normalize()
 
 
-def dynamic_threshold(row: pd.Series) -> float:
-    """
-    Non-circular decision threshold:
-    - Prefer value_tier / segment if present
-    - else single default threshold (0.50)
+def prepare_labeled(df: pd.DataFrame, typed: bool = False, require_label: bool = True) -> pd.DataFrame:
     """
-    seg = str(row.get("segment", row.get("Segment", ""))).strip()
-    tier = str(row.get("value_tier", row.get("ValueTier", ""))).strip()
-
-    if tier:
-        t = tier.lower()
-        if t.startswith("high"):
-            return 0.30
-        if t.startswith("mid"):
-            return 0.50
-        if t.startswith("low"):
-            return 0.70
-
-    if seg:
-        seg_l = seg.lower()
-        if seg_l in ["champions", "loyal"]:
-            return 0.30
-        if seg_l in ["potential loyalist", "promising", "new customers", "needs attention"]:
-            return 0.50
-        if seg_l in ["at risk", "hibernating", "lost", "about to sleep"]:
-            return 0.70
-
-    return 0.50
-
-
-def add_action_flag_top_percent(scores: pd.DataFrame, top_pct: float = 0.15) -> pd.DataFrame:
+    Validate + normalize features-labeled input (KEEP unlabeled rows for scoring), sorted by SnapshotDate.
+    typed=True: dates/IDs already typed (Parquet/in-memory), skip re-parsing.
+    require_label=False: plain features are enough (score mode).
     """
-    Add action_flag_topXX within each SnapshotDate.
-    Prioritize expected_loss if present, else churn_probability.
-    """
-    flag_col = f"action_flag_top{int(top_pct*100)}"
-    metric = "expected_loss" if "expected_loss" in scores.columns else "churn_probability"
-
-    def _flag(g: pd.DataFrame) -> pd.DataFrame:
-        g = g.copy()
-        # rank descending
-        g["_rank"] = g[metric].rank(method="first", ascending=False)
-        cutoff = int(np.ceil(len(g) * top_pct))
-        cutoff = max(cutoff, 1)
-        g[flag_col] = (g["_rank"] <= cutoff).astype(int)
-        return g.drop(columns=["_rank"])
-
-    return scores.groupby("SnapshotDate", group_keys=False).apply(_flag)
-
-
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--in", dest="in_path", required=True, help="customer_features_labeled.csv")
-    ap.add_argument("--segment_snapshot", default=None, help="customer_segment_snapshot.csv (optional)")
-    ap.add_argument("--out_scores", required=True)
-    ap.add_argument("--out_report", required=True)
-    ap.add_argument("--cutoff_date", default=None, help="YYYY-MM-DD for time split. If empty, uses last 3 months as test.")
-    args = ap.parse_args()
-
-    # -------------------------
-    # Load & normalize base df (KEEP unlabeled rows for scoring)
-    # -------------------------
-    df = pd.read_csv(args.in_path)
-
     if "SnapshotDate" not in df.columns:
         raise ValueError("Missing SnapshotDate in features-labeled input.")
-    df["SnapshotDate"] = normalize_date(df["SnapshotDate"])
-
     if "CustomerID" not in df.columns:
         raise ValueError("Missing CustomerID in features-labeled input.")
-    df["CustomerID"] = to_clean_id(df["CustomerID"])
-
-    if "churn_label" not in df.columns:
+    if require_label and "churn_label" not in df.columns:
         raise ValueError("Missing churn_label in features-labeled input.")
 
+    if not typed:
+        df = df.copy()
+        df["SnapshotDate"] = normalize_date(df["SnapshotDate"])
+        df["CustomerID"] = clean_ids(df["CustomerID"])
+
     df = df.dropna(subset=["SnapshotDate", "CustomerID"]).copy()
 
     # -------------------------
     # SORT FIRST (alignment)
     # -------------------------
-    df = df.sort_values("SnapshotDate").reset_index(drop=True)
+    return df.sort_values("SnapshotDate").reset_index(drop=True)
 
+
+def prepare_segments(seg: pd.DataFrame, typed: bool = False) -> pd.DataFrame:
+    if "SnapshotDate" not in seg.columns or "CustomerID" not in seg.columns:
+        raise ValueError("segment_snapshot must contain CustomerID and SnapshotDate.")
+    if not typed:
+        seg = seg.copy()
+        seg["SnapshotDate"] = normalize_date(seg["SnapshotDate"])
+        seg["CustomerID"] = clean_ids(seg["CustomerID"])
+    return seg
+
+
+def model_matrix(df: pd.DataFrame, feats: list[str]) -> pd.DataFrame:
+    return df[feats].replace([np.inf, -np.inf], np.nan).fillna(0)
+
+
+LGBM_PARAMS = {
+    "random_state": 42,
+    "n_estimators": 300,
+    "learning_rate": 0.05,
+    "num_leaves": 31,
+    "min_child_samples": 200,
+    "subsample": 0.8,
+    "subsample_freq": 1,
+    "colsample_bytree": 0.8,
+}
+
+
+def make_logreg(C: float = 1.0):
+    # CV candidates: standardized inputs, lbfgs converges in tens of iterations (raw revenue/day scales
+    # needed thousands). The holdout path keeps the unscaled baseline so default scores do not move.
+    return make_pipeline(StandardScaler(), LogisticRegression(C=C, max_iter=1000))
+
+
+def train_model(
+    df: pd.DataFrame,
+    cutoff_date: str | None = None,
+    selection: str = "holdout",
+    cv_folds: int | None = None,
+    workers: int | None = None,
+    dataset_cache=None,
+) -> tuple[object, dict, list[str]]:
+    """
+    Model selection (LogReg vs LightGBM) on the labeled rows.
+    selection="holdout": one time split (choose_cutoff_date).
+    selection="cv": rolling-origin folds x CV_GRID across `workers` processes (see train_model_cv).
+    dataset_cache: directory for binned LightGBM Datasets, reused while the training rows are unchanged.
+    Returns (selected model, metadata, report_lines).
+    """
     # -------------------------
     # Feature selection + clean (ALL rows for scoring)
     # -------------------------
-    feats = [c for c in FEATURE_CANDIDATES if c in df.columns]
+    feats = feature_columns(df)
     if not feats:
         raise ValueError("No candidate features found in input. Check your feature_engineering output.")
 
-    X_all = df[feats].copy()
-    X_all = X_all.replace([np.inf, -np.inf], np.nan).fillna(0)
-
-    # labeled subset for training/evaluation
+    # labeled subset for training/evaluation (scoring builds its own matrix)
     labeled_mask = df["churn_label"].notna()
     df_lab = df.loc[labeled_mask].copy()
-    X_lab = X_all.loc[labeled_mask].copy()
+    X_lab = model_matrix(df_lab, feats)
     y = df_lab["churn_label"].astype(int).values
 
     if len(df_lab) < 100:
         raise ValueError("Too few labeled rows after right-censoring. Check churn_label.py window and dataset max date.")
 
+    if selection == "cv":
+        model, metadata, report_lines = train_model_cv(X_lab, y, df_lab["SnapshotDate"], cv_folds or CV_FOLDS, workers,
+                                                       dataset_cache)
+        report_lines += [
+            f"Features ({len(feats)}): {feats}",
+            f"Total rows scored (incl. unlabeled): {len(df):,}",
+            f"Rows labeled for training/eval: {int(labeled_mask.sum()):,} | Unlabeled (unobservable): {int((~labeled_mask).sum()):,}",
+        ]
+        metadata = {"features": feats, "trained_through": str(df_lab["SnapshotDate"].max().date()), **metadata,
+                    "report": report_lines}
+        return model, metadata, report_lines
+    if selection != "holdout":
+        raise ValueError(f"Unknown selection: {selection}")
+
     # -------------------------
     # Time-based split (on labeled rows)
     # -------------------------
-    cutoff = choose_cutoff_date(df_lab, args.cutoff_date)
+    cutoff = choose_cutoff_date(df_lab, cutoff_date)
     train_idx = df_lab["SnapshotDate"] < cutoff
     test_idx = ~train_idx
 
@@ -191,7 +202,8 @@ def main():
     # Models
     # -------------------------
     lr = LogisticRegression(max_iter=5000)
-    lr.fit(X_train, y_train)
+    with instrumentation.step("fit_logreg", rows_in=len(X_train)):
+        lr.fit(X_train, y_train)
     lr_proba = lr.predict_proba(X_test)[:, 1]
     lr_auc = roc_auc_score(y_test, lr_proba)
     lr_ap = average_precision_score(y_test, lr_proba)
@@ -205,17 +217,8 @@ def main():
     lgbm_ap = None
 
     if HAS_LGBM:
-        lgbm = LGBMClassifier(
-            random_state=42,
-            n_estimators=300,
-            learning_rate=0.05,
-            num_leaves=31,
-            min_child_samples=200,
-            subsample=0.8,
-            subsample_freq=1,
-            colsample_bytree=0.8,
-        )
-        lgbm.fit(X_train, y_train)
+        with instrumentation.step("fit_lightgbm", rows_in=len(X_train)):
+            lgbm = fit_candidate("LightGBM", {}, X_train, y_train, cache_dir=dataset_cache)
         lgbm_proba = lgbm.predict_proba(X_test)[:, 1]
         lgbm_auc = roc_auc_score(y_test, lgbm_proba)
         lgbm_ap = average_precision_score(y_test, lgbm_proba)
@@ -250,22 +253,268 @@ def main():
         f"Rows labeled for training/eval: {int(labeled_mask.sum()):,} | Unlabeled (unobservable): {int((~labeled_mask).sum()):,}",
     ]
 
-    Path(args.out_report).parent.mkdir(parents=True, exist_ok=True)
-    Path(args.out_report).write_text("\n".join(report_lines), encoding="utf-8")
+    metadata = {
+        "model": best_name,
+        "selection": "holdout",
+        "features": feats,
+        "cutoff_date": str(cutoff.date()),
+        "trained_through": str(df_lab["SnapshotDate"].max().date()),
+        "train_rows": int(len(X_train)),
+        "test_rows": int(len(X_test)),
+        "metrics": {
+            "LogReg": {"roc_auc": float(lr_auc), "pr_auc": float(lr_ap)},
+            **({"LightGBM": {"roc_auc": float(lgbm_auc), "pr_auc": float(lgbm_ap)}} if HAS_LGBM else {}),
+        },
+        "report": report_lines,
+    }
+    return best_model, metadata, report_lines
+
+
+# -------------------------
+# Rolling-origin CV: fold k tests on one snapshot month, early-stops LightGBM on the month before it
+# and trains on everything earlier. Folds x grid run in worker processes; each worker's LightGBM gets
+# cores // workers threads, so processes x threads never exceeds the CPU budget.
+# -------------------------
+CV_FOLDS = 3
+CV_MAX_TREES = 1000
+CV_EARLY_STOPPING = 50
+CV_GRID = [
+    ("LogReg", {"C": 0.1}),
+    ("LogReg", {"C": 1.0}),
+    ("LightGBM", {"num_leaves": 15, "min_child_samples": 100}),
+    ("LightGBM", {"num_leaves": 31, "min_child_samples": 200}),
+    ("LightGBM", {"num_leaves": 63, "min_child_samples": 400}),
+]
+
+_CV: dict = {}
+
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS / Windows
+        return os.cpu_count() or 1
+
+
+def thread_budget(workers: int | None, tasks: int, cpus: int | None = None) -> tuple[int, int]:
+    """
+    (processes, LightGBM threads per process) for `tasks` fits on `cpus` cores (default: all available).
+    """
+    cpus = cpus or available_cpus()
+    workers = max(1, min(workers or cpus, tasks, cpus))
+    return workers, max(1, cpus // workers)
+
+
+def candidate_grid() -> list[tuple[str, dict]]:
+    return [c for c in CV_GRID if HAS_LGBM or c[0] != "LightGBM"]
+
+
+def candidate_name(family: str, params: dict) -> str:
+    return f"{family} " + ", ".join(f"{k}={v}" for k, v in params.items())
+
+
+def rolling_folds(dates: pd.Series, y: np.ndarray, n_folds: int) -> list[dict]:
+    """
+    Row positions per fold for the last n_folds snapshot months (folds without both classes are skipped).
+    """
+    months = dates.dt.to_period("M").to_numpy()
+    uniq = sorted(set(months))
+    folds = []
+    for i in range(max(2, len(uniq) - n_folds), len(uniq)):
+        train = np.flatnonzero(months < uniq[i - 1])
+        val = np.flatnonzero(months == uniq[i - 1])
+        test = np.flatnonzero(months == uniq[i])
+        if len(np.unique(y[train])) < 2 or len(np.unique(y[test])) < 2:
+            continue
+        folds.append({"train": train, "val": val, "test": test,
+                      "val_month": str(uniq[i - 1]), "test_month": str(uniq[i])})
+    return folds
+
+
+def fit_candidate(
+    family: str,
+    params: dict,
+    X_train,
+    y_train,
+    X_val=None,
+    y_val=None,
+    n_jobs: int | None = None,
+    feats: list[str] | None = None,
+    cache_dir=None,
+):
+    """
+    One candidate. LightGBM trains on a binned float32 Dataset (cached in cache_dir) and early-stops
+    on (X_val, y_val) when given with both classes. feats: column names when X_train is an array.
+    """
+    if family == "LogReg":
+        return make_logreg(**params).fit(X_train, y_train)
+    feats = feats or list(X_train.columns)
+    params = {**LGBM_PARAMS, **params, **({"n_jobs": n_jobs} if n_jobs else {})}
+    with instrumentation.step("lgbm_dataset", rows_in=len(X_train)):
+        train = lgbm_dataset.binned_dataset(X_train, y_train, feats, cache_dir)
+    if X_val is not None and len(np.unique(y_val)) == 2:
+        params["n_estimators"] = CV_MAX_TREES
+        return lgbm_dataset.train_booster(params, train, (X_val, y_val), CV_EARLY_STOPPING)
+    return lgbm_dataset.train_booster(params, train)
+
+
+def _init_cv(X: np.ndarray, y: np.ndarray, folds: list[dict], threads: int, feats: list[str], cache_dir) -> None:
+    """
+    Pool initializer: the labeled matrix is sent once per worker, not per task.
+    """
+    threadpool_limits(threads)  # BLAS / OpenMP pools (LogReg, numpy) follow the same per-process budget
+    _CV.update(X=X, y=y, folds=folds, threads=threads, feats=feats, cache_dir=cache_dir)
+
+
+def _cv_task(task: tuple[int, int]) -> dict:
+    k, c = task
+    X, y, fold = _CV["X"], _CV["y"], _CV["folds"][k]
+    family, params = candidate_grid()[c]
+    t0 = time.perf_counter()
+    # the fold's binned Dataset is built once (cache_dir) and shared by every LightGBM candidate
+    model = fit_candidate(family, params, X[fold["train"]], y[fold["train"]], X[fold["val"]], y[fold["val"]],
+                          n_jobs=_CV["threads"], feats=_CV["feats"], cache_dir=_CV["cache_dir"])
+    proba = model.predict_proba(X[fold["test"]])[:, 1]
+    return {
+        "fold": k,
+        "candidate": c,
+        "roc_auc": float(roc_auc_score(y[fold["test"]], proba)),
+        "pr_auc": float(average_precision_score(y[fold["test"]], proba)),
+        "best_iteration": int(getattr(model, "best_iteration_", 0) or 0) or None,
+        "fit_s": time.perf_counter() - t0,
+    }
+
+
+def train_model_cv(
+    X_lab: pd.DataFrame,
+    y: np.ndarray,
+    dates: pd.Series,
+    n_folds: int = CV_FOLDS,
+    workers: int | None = None,
+    dataset_cache=None,
+) -> tuple[object, dict, list[str]]:
+    """
+    Rolling-origin selection over candidate_grid(): highest mean test ROC-AUC (ties: PR-AUC), then refit on
+    all labeled rows (LightGBM with the median early-stopped tree count).
+    Returns (model, metadata without features, report_lines).
+    """
+    folds = rolling_folds(dates.reset_index(drop=True), y, n_folds)
+    if not folds:
+        raise ValueError("No usable rolling-origin folds (need 3+ labeled snapshot months). Use --selection holdout.")
+    grid = candidate_grid()
+    tasks = [(k, c) for k in range(len(folds)) for c in range(len(grid))]
+    procs, threads = thread_budget(workers, len(tasks))
+
+    X, feats = lgbm_dataset.float32_matrix(X_lab), list(X_lab.columns)
+    with instrumentation.step("cross_validate", rows_in=len(X) * len(folds)) as st:
+        if procs == 1:
+            # in-process: same BLAS / OpenMP budget as a pool worker, restored afterwards
+            with threadpool_limits(threads):
+                _CV.update(X=X, y=y, folds=folds, threads=threads, feats=feats, cache_dir=dataset_cache)
+                results = [_cv_task(t) for t in tasks]
+                _CV.clear()
+        else:
+            # spawn: LightGBM's OpenMP runtime is not fork-safe once the parent has used it
+            with ProcessPoolExecutor(max_workers=procs, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_init_cv, initargs=(X, y, folds, threads, feats, dataset_cache)) as pool:
+                results = list(pool.map(_cv_task, tasks))
+        st.note(processes=procs, lgbm_threads=threads, fits=len(tasks))
+
+    summary = []
+    for c, (family, params) in enumerate(grid):
+        runs = [r for r in results if r["candidate"] == c]
+        summary.append({
+            "name": candidate_name(family, params),
+            "family": family,
+            "params": params,
+            "roc_auc": float(np.mean([r["roc_auc"] for r in runs])),
+            "pr_auc": float(np.mean([r["pr_auc"] for r in runs])),
+            "folds": [{"roc_auc": r["roc_auc"], "pr_auc": r["pr_auc"], "best_iteration": r["best_iteration"]}
+                      for r in runs],
+        })
+    best = summary[0]
+    for cand in summary[1:]:
+        if cand["roc_auc"] > best["roc_auc"] or (np.isclose(cand["roc_auc"], best["roc_auc"])
+                                                 and cand["pr_auc"] > best["pr_auc"]):
+            best = cand
+
+    params = dict(best["params"])
+    iterations = [f["best_iteration"] for f in best["folds"] if f["best_iteration"]]
+    if best["family"] == "LightGBM" and iterations:
+        params["n_estimators"] = int(np.median(iterations))
+    with instrumentation.step(f"fit_{best['family'].lower()}", rows_in=len(X_lab)):
+        model = fit_candidate(best["family"], params, X_lab, y, n_jobs=procs * threads, cache_dir=dataset_cache)
+
+    report_lines = [
+        f"Selection: rolling-origin CV, {len(folds)} folds x {len(grid)} candidates "
+        f"({procs} processes x {threads} LightGBM threads)",
+    ]
+    for k, fold in enumerate(folds):
+        report_lines.append(
+            f"Fold {k + 1}: train < {fold['val_month']} ({len(fold['train']):,} rows) | "
+            f"early stopping {fold['val_month']} | test {fold['test_month']} ({len(fold['test']):,} rows, "
+            f"churn rate {float(np.mean(y[fold['test']])):.4f})"
+        )
+    for cand in summary:
+        rocs = ", ".join(f"{f['roc_auc']:.4f}" for f in cand["folds"])
+        aps = ", ".join(f"{f['pr_auc']:.4f}" for f in cand["folds"])
+        report_lines.append(
+            f"{cand['name']}: ROC-AUC {cand['roc_auc']:.4f} [{rocs}] | PR-AUC {cand['pr_auc']:.4f} [{aps}]"
+        )
+    report_lines.append(f"Selected model: {candidate_name(best['family'], params)} (refit on all labeled rows)")
+
+    metadata = {
+        "model": best["family"],
+        "selection": "cv",
+        "params": params,
+        "cutoff_date": str(dates.iloc[folds[0]["test"]].min().date()),
+        "train_rows": int(len(X_lab)),
+        "test_rows": int(sum(len(f["test"]) for f in folds)),
+        "folds": [{"val_month": f["val_month"], "test_month": f["test_month"], "train_rows": int(len(f["train"])),
+                   "test_rows": int(len(f["test"]))} for f in folds],
+        "metrics": {c["name"]: {k: c[k] for k in ["roc_auc", "pr_auc", "folds"]} for c in summary},
+    }
+    return model, metadata, report_lines
+
+
+def score_snapshots(
+    model,
+    feats: list[str],
+    df: pd.DataFrame,
+    seg: pd.DataFrame | None = None,
+    top_pcts=(DEFAULT_TOP_PCT,),
+    reasons: int = reason_codes.N_REASONS,
+    reason_workers: int | None = None,
+    reason_rows: np.ndarray | None = None,
+) -> pd.DataFrame:
+    """
+    Score every row of df with a fitted model, join segments and add decisioning (no fitting).
+    reasons: reason_1..reason_N columns (top churn drivers per row, see reason_codes); 0 = none.
+    reason_rows: boolean mask of the rows that get reasons (default: latest snapshot; explaining a row costs far more than scoring it).
+    """
+    missing = [c for c in feats if c not in df.columns]
+    if missing:
+        raise ValueError(f"Model features missing from input: {missing}")
 
     # -------------------------
     # Score ALL rows (incl unlabeled)
     # -------------------------
-    proba_all = best_model.predict_proba(X_all)[:, 1]
+    with instrumentation.step("predict", rows_in=len(df)):
+        proba_all = model.predict_proba(model_matrix(df, feats))[:, 1]
 
     scores = df[["CustomerID", "SnapshotDate"]].copy()
-    scores["CustomerID"] = to_clean_id(scores["CustomerID"])
-    scores["SnapshotDate"] = normalize_date(scores["SnapshotDate"])
 
-    # keep churn_label as-is (can be NaN for unobservable snapshots)
-    scores["churn_label"] = df["churn_label"]
+    # keep churn_label as-is (can be NaN for unobservable snapshots; absent when scoring fresh features)
+    if "churn_label" in df.columns:
+        scores["churn_label"] = df["churn_label"]
     scores["churn_probability"] = proba_all
-    scores["risk_bucket"] = scores["churn_probability"].apply(bucket_risk)
+    scores["risk_bucket"] = risk_buckets(scores["churn_probability"])
+    if reasons > 0:
+        if reason_rows is None:
+            reason_rows = snapshot_mask(df, "latest")
+        codes = reason_codes.reason_codes(model, df, feats, n=reasons, workers=reason_workers, rows=reason_rows)
+        for c in codes.columns:
+            scores[c] = codes[c].values
 
     # carry BI-friendly columns
     keep_cols = ["total_revenue", "total_orders", "recency_days", "tenure_days"]
@@ -276,13 +525,7 @@ def main():
     # -------------------------
     # Segment join (optional)
     # -------------------------
-    if args.segment_snapshot:
-        seg = pd.read_csv(args.segment_snapshot)
-        if "SnapshotDate" not in seg.columns or "CustomerID" not in seg.columns:
-            raise ValueError("segment_snapshot must contain CustomerID and SnapshotDate.")
-        seg["SnapshotDate"] = normalize_date(seg["SnapshotDate"])
-        seg["CustomerID"] = to_clean_id(seg["CustomerID"])
-
+    if seg is not None:
         join_cols = [c for c in seg.columns if c not in ["CustomerID", "SnapshotDate"]]
         scores = scores.merge(
             seg[["CustomerID", "SnapshotDate"] + join_cols],
@@ -299,21 +542,162 @@ def main():
     # -------------------------
     # Decisioning + Action targeting
     # -------------------------
-    scores["dynamic_threshold"] = scores.apply(dynamic_threshold, axis=1)
-    scores["churn_flag"] = (scores["churn_probability"] >= scores["dynamic_threshold"]).astype(int)
+    # thresholds + churn_flag + expected_loss, action lists: top X% within each snapshot
+    with instrumentation.step("decisioning", rows_in=len(scores)):
+        return apply_decisioning(scores, top_pcts=top_pcts)
+
+
+# -------------------------
+# Versioned model artifacts: models/churn_model/<version>/{model.pkl, metadata.json} + LATEST
+# -------------------------
+def save_model_artifact(model, metadata: dict, models_dir: Path = MODELS) -> Path:
+    models_dir = Path(models_dir)
+    version = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    path = models_dir / version
+    n = 1
+    while path.exists():
+        n += 1
+        path = models_dir / f"{version}-{n}"
+    path.mkdir(parents=True)
+
+    meta = {
+        "version": path.name,
+        "artifact_format": ARTIFACT_FORMAT,
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "libraries": library_versions(),
+        **metadata,
+    }
+    with open(path / "model.pkl", "wb") as f:
+        pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+    (path / "metadata.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    # pointer last, so LATEST never names a half-written artifact
+    tmp = models_dir / "LATEST.tmp"
+    tmp.write_text(path.name, encoding="utf-8")
+    tmp.replace(models_dir / "LATEST")
+    return path
+
+
+def resolve_artifact(model: str | None = None, models_dir: Path = MODELS) -> Path:
+    """
+    None / "latest" -> models_dir/LATEST; a version name -> models_dir/<version>; else a directory path.
+    """
+    models_dir = Path(models_dir)
+    if model in (None, "latest"):
+        latest = models_dir / "LATEST"
+        if not latest.exists():
+            raise FileNotFoundError(f"No trained model in {models_dir}. Run churn_model.py --mode train first.")
+        model = latest.read_text(encoding="utf-8").strip()
+    path = Path(model) if Path(model).is_dir() else models_dir / model
+    if not (path / "metadata.json").exists():
+        raise FileNotFoundError(f"Not a model artifact: {path}")
+    return path
+
+
+def load_model_artifact(model: str | None = None, models_dir: Path = MODELS) -> tuple[object, dict]:
+    path = resolve_artifact(model, models_dir)
+    meta = json.loads((path / "metadata.json").read_text(encoding="utf-8"))
+    if meta.get("artifact_format") != ARTIFACT_FORMAT:
+        raise ValueError(f"Unsupported artifact format in {path}: {meta.get('artifact_format')}")
+    with open(path / "model.pkl", "rb") as f:
+        return pickle.load(f), meta
+
+
+def library_versions() -> dict:
+    import sklearn
+    versions = {"pandas": pd.__version__, "numpy": np.__version__, "scikit-learn": sklearn.__version__}
+    if HAS_LGBM:
+        import lightgbm
+        versions["lightgbm"] = lightgbm.__version__
+    return versions
 
-    # expected_loss proxy (keeps dashboard stable even if column missing)
-    if "total_revenue" in scores.columns:
-        scores["expected_loss"] = scores["churn_probability"] * scores["total_revenue"].fillna(0)
-    else:
-        scores["expected_loss"] = scores["churn_probability"]
 
-    # action list: top 15% within each snapshot
-    scores = add_action_flag_top_percent(scores, top_pct=0.15)
+def snapshot_mask(df: pd.DataFrame, arg: str = "latest") -> np.ndarray:
+    """
+    Boolean row mask: "latest" -> newest SnapshotDate; "all"; or comma list of YYYY-MM-DD.
+    """
+    if arg == "all":
+        return np.ones(len(df), dtype=bool)
+    if arg == "latest":
+        return (df["SnapshotDate"] == df["SnapshotDate"].max()).to_numpy()
+    wanted = pd.to_datetime([d for d in arg.split(",") if d.strip()], errors="coerce").normalize()
+    if wanted.isna().any():
+        raise ValueError(f"Invalid snapshot list: {arg}")
+    missing = sorted(set(wanted) - set(df["SnapshotDate"].unique()))
+    if missing:
+        raise ValueError(f"Snapshots not in input: {[str(d.date()) for d in missing]}")
+    return df["SnapshotDate"].isin(wanted).to_numpy()
+
+
+def select_snapshots(df: pd.DataFrame, arg: str = "latest") -> pd.DataFrame:
+    return df[snapshot_mask(df, arg)]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mode", choices=["train", "score"], default="train",
+                    help="train = model selection + artifact + scores; score = load artifact, inference only")
+    ap.add_argument("--in", dest="in_path", required=True, help="customer_features_labeled.csv (score: features are enough)")
+    ap.add_argument("--segment_snapshot", default=None, help="customer_segment_snapshot.csv (optional)")
+    ap.add_argument("--out_scores", required=True)
+    ap.add_argument("--out_report", default=None, help="training report (train mode)")
+    ap.add_argument("--cutoff_date", default=None, help="YYYY-MM-DD for time split. If empty, uses last 3 months as test.")
+    ap.add_argument("--selection", choices=["holdout", "cv"], default="holdout",
+                    help="holdout = one time split; cv = rolling-origin folds x small grid, LightGBM early stopping")
+    ap.add_argument("--cv_folds", type=int, default=CV_FOLDS, help="cv: test months (one fold each)")
+    ap.add_argument("--cv_workers", type=int, default=None,
+                    help="cv: processes (default: all cores; LightGBM threads = cores // processes)")
+    ap.add_argument("--dataset_cache", default=None,
+                    help="directory for binned LightGBM Datasets (reused while the training rows are unchanged)")
+    ap.add_argument("--top_pct", type=str, default=str(DEFAULT_TOP_PCT),
+                    help="action list share(s) per snapshot, e.g. 0.15 or 0.05,0.10,0.15,0.25")
+    ap.add_argument("--models_dir", default=str(MODELS), help="versioned model artifacts")
+    ap.add_argument("--model", default="latest", help="score mode: artifact version or directory (default: latest)")
+    ap.add_argument("--snapshots", default="latest", help="score mode: latest | all | YYYY-MM-DD[,YYYY-MM-DD...]")
+    ap.add_argument("--reasons", type=int, default=reason_codes.N_REASONS,
+                    help="reason_1..reason_N columns: top churn drivers per row (0 = off)")
+    ap.add_argument("--reason_workers", type=int, default=None, help="threads for reason codes (default: all cores)")
+    ap.add_argument("--reason_snapshots", default=None,
+                    help="rows with reason codes: latest | all | YYYY-MM-DD[,...] "
+                         "(default: train = latest, score = every scored snapshot)")
+    ap.add_argument("--format", choices=FORMATS, default="csv", help="scores format (inputs are read by suffix)")
+    args = ap.parse_args()
+    if args.mode == "train" and not args.out_report:
+        ap.error("--out_report is required with --mode train")
+
+    df = prepare_labeled(read_table(args.in_path), typed=is_columnar(args.in_path), require_label=args.mode == "train")
+    seg = None
+    if args.segment_snapshot:
+        seg = prepare_segments(read_table(args.segment_snapshot), typed=is_columnar(args.segment_snapshot))
+    top_pcts = parse_top_pcts(args.top_pct)
+
+    if args.mode == "score":
+        model, meta = load_model_artifact(args.model, Path(args.models_dir))
+        df = select_snapshots(df, args.snapshots)
+        scores = score_snapshots(model, meta["features"], df, seg, top_pcts=top_pcts, reasons=args.reasons,
+                                 reason_workers=args.reason_workers,
+                                 reason_rows=snapshot_mask(df, args.reason_snapshots or "all"))
+        out_scores = write_table(scores, args.out_scores, args.format)
+        print(
+            f"✅ Saved scores: {out_scores} | Rows: {len(scores):,} | "
+            f"Snapshots: {scores['SnapshotDate'].nunique()} | Model: {meta['model']} ({meta['version']})"
+        )
+        return
+
+    model, meta, report_lines = train_model(df, cutoff_date=args.cutoff_date, selection=args.selection,
+                                            cv_folds=args.cv_folds, workers=args.cv_workers,
+                                            dataset_cache=args.dataset_cache)
+    artifact = save_model_artifact(model, meta, Path(args.models_dir))
+    scores = score_snapshots(model, meta["features"], df, seg, top_pcts=top_pcts, reasons=args.reasons,
+                             reason_workers=args.reason_workers,
+                             reason_rows=snapshot_mask(df, args.reason_snapshots or "latest"))
+
+    Path(args.out_report).parent.mkdir(parents=True, exist_ok=True)
+    Path(args.out_report).write_text("\n".join(report_lines), encoding="utf-8")
 
-    Path(args.out_scores).parent.mkdir(parents=True, exist_ok=True)
-    scores.to_csv(args.out_scores, index=False)
-    print(f"✅ Saved scores: {args.out_scores} | Rows: {len(scores):,} | Model: {best_name}")
+    out_scores = write_table(scores, args.out_scores, args.format)
+    print(f"✅ Saved scores: {out_scores} | Rows: {len(scores):,} | Model: {meta['model']}")
+    print(f"✅ Saved model artifact: {artifact}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,210 @@
+from pathlib import Path
+import argparse
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+from table_io import apply_schema, read_table
+
+STORE = Path(__file__).resolve().parent.parent / "data" / "processed" / "customer360"
+STORE_FORMAT = 1
+KEYS = ["CustomerID", "SnapshotDate"]
+
+
+# -------------------------
+# Layout (one .npy per column, customer-sorted, opened with mmap):
+#   customer_ids.npy     sorted unique IDs
+#   offsets.npy          int64, len = customers + 1; customer i = rows offsets[i]:offsets[i+1]
+#   <col>.npy            numeric / datetime values
+#   <col>.codes.npy      text columns: dictionary codes (-1 = missing) + <col>.categories.npy
+#   meta.json            columns, kinds, row / customer counts
+# -------------------------
+def history_frame(scores: pd.DataFrame, actions: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Score history + the campaign columns churn_scores does not carry (one row per customer-snapshot).
+    """
+    if actions is None:
+        return scores
+    extra = [c for c in actions.columns if c not in scores.columns]
+    return scores.merge(actions[KEYS + extra], on=KEYS, how="left")
+
+
+def _id_array(ids: pd.Series) -> np.ndarray:
+    if pd.api.types.is_integer_dtype(ids):
+        return ids.to_numpy(dtype="int64")
+    return ids.astype(str).to_numpy(dtype=str)
+
+
+def build_store(df: pd.DataFrame, out_dir=STORE) -> Path:
+    """
+    Write df (must hold CustomerID + SnapshotDate) as a customer-sorted memory-mappable store.
+    Built next to out_dir and swapped in, so readers never see a half-written store.
+    """
+    for col in KEYS:
+        if col not in df.columns:
+            raise ValueError(f"Missing required column for customer360: {col}")
+    out_dir = Path(out_dir)
+    tmp = out_dir.with_name(out_dir.name + ".tmp")
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+
+    # customer, then snapshot (both stable): each customer's history is one contiguous, dated slice
+    ids = _id_array(df["CustomerID"])
+    order = np.argsort(df["SnapshotDate"].to_numpy(), kind="stable")
+    order = order[np.argsort(ids[order], kind="stable")]
+    ids = ids[order]
+
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if len(ids) else np.array([], dtype="int64")
+    np.save(tmp / "customer_ids.npy", ids[starts])
+    np.save(tmp / "offsets.npy", np.append(starts, len(ids)).astype("int64"))
+
+    columns = []
+    for col in df.columns:
+        if col == "CustomerID":
+            continue
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype) or s.dtype == object or pd.api.types.is_string_dtype(s):
+            codes, cats = pd.factorize(s.astype(object) if not isinstance(s.dtype, pd.CategoricalDtype) else s,
+                                       sort=True)
+            cats = np.asarray(cats, dtype=object).astype(str)
+            code_type = "int16" if len(cats) < np.iinfo("int16").max else "int32"
+            np.save(tmp / f"{col}.codes.npy", codes.astype(code_type)[order])
+            np.save(tmp / f"{col}.categories.npy", cats)
+            columns.append({"name": col, "kind": "text"})
+        elif pd.api.types.is_datetime64_any_dtype(s):
+            np.save(tmp / f"{col}.npy", s.to_numpy(dtype="datetime64[ns]")[order])
+            columns.append({"name": col, "kind": "datetime"})
+        else:
+            values = s.to_numpy(dtype="float64" if s.hasnans or not pd.api.types.is_numeric_dtype(s) else None)
+            np.save(tmp / f"{col}.npy", values[order])
+            columns.append({"name": col, "kind": "numeric"})
+
+    meta = {
+        "store_format": STORE_FORMAT,
+        "rows": int(len(df)),
+        "customers": int(len(starts)),
+        "id_kind": "int" if ids.dtype.kind == "i" else "text",
+        "snapshots": [str(df["SnapshotDate"].min().date()), str(df["SnapshotDate"].max().date())] if len(df) else [],
+        "columns": columns,
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    tmp.rename(out_dir)
+    return out_dir
+
+
+class Customer360Store:
+    """
+    Read side: every array is memory-mapped, so opening costs O(1) and a lookup touches only
+    the ID index (binary search) and the customer's own row range in each requested column.
+    """
+
+    def __init__(self, path=STORE):
+        self.path = Path(path)
+        meta_path = self.path / "meta.json"
+        if not meta_path.exists():
+            raise FileNotFoundError(f"Not a customer360 store: {self.path}. Run run_pipeline.py first.")
+        self.meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if self.meta.get("store_format") != STORE_FORMAT:
+            raise ValueError(f"Unsupported customer360 store format: {self.meta.get('store_format')}")
+        self.ids = np.load(self.path / "customer_ids.npy", mmap_mode="r")
+        self.offsets = np.load(self.path / "offsets.npy", mmap_mode="r")
+        self.kinds = {c["name"]: c["kind"] for c in self.meta["columns"]}
+        self._arrays: dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, customer_id) -> bool:
+        return self.span(customer_id) is not None
+
+    @property
+    def columns(self) -> list[str]:
+        return ["CustomerID"] + list(self.kinds)
+
+    def _key(self, customer_id):
+        key = str(customer_id).replace(".0", "").strip()
+        if self.meta["id_kind"] == "int":
+            try:
+                return int(key)
+            except ValueError:
+                return None
+        return key
+
+    def _array(self, name: str) -> np.ndarray:
+        if name not in self._arrays:
+            suffix = ".codes.npy" if self.kinds[name] == "text" else ".npy"
+            self._arrays[name] = np.load(self.path / f"{name}{suffix}", mmap_mode="r")
+            if self.kinds[name] == "text":
+                self._arrays[f"{name}.categories"] = np.load(self.path / f"{name}.categories.npy")
+        return self._arrays[name]
+
+    def span(self, customer_id) -> tuple[int, int] | None:
+        """
+        (start, stop) rows of one customer's history, or None if unknown.
+        """
+        key = self._key(customer_id)
+        if key is None:
+            return None
+        i = int(np.searchsorted(self.ids, key))
+        if i >= len(self.ids) or self.ids[i] != key:
+            return None
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+
+    def history(self, customer_id, columns: list[str] | None = None) -> pd.DataFrame:
+        """
+        One customer's rows (SnapshotDate ascending); empty frame for unknown customers.
+        """
+        columns = [c for c in (columns or self.kinds) if c != "CustomerID"]
+        unknown = [c for c in columns if c not in self.kinds]
+        if unknown:
+            raise ValueError(f"Unknown customer360 columns: {unknown}")
+
+        start, stop = self.span(customer_id) or (0, 0)
+        out = {"CustomerID": np.full(stop - start, self._key(customer_id) if stop > start else None)}
+        for col in columns:
+            values = np.array(self._array(col)[start:stop])
+            if self.kinds[col] == "text":
+                codes = values
+                values = np.full(len(codes), None, dtype=object)
+                values[codes >= 0] = self._arrays[f"{col}.categories"][codes[codes >= 0]]
+            out[col] = values
+        return apply_schema(pd.DataFrame(out))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--store", default=str(STORE), help="customer360 store directory")
+    ap.add_argument("--scores", default=None, help="build: churn_scores.csv / .parquet")
+    ap.add_argument("--actions", default=None, help="build: campaign_actions.csv / .parquet (optional)")
+    ap.add_argument("--customer", default=None, help="lookup: print one customer's history")
+    ap.add_argument("--columns", default=None, help="lookup: comma-separated columns (default: all)")
+    args = ap.parse_args()
+
+    if args.scores:
+        scores = apply_schema(read_table(args.scores))
+        actions = apply_schema(read_table(args.actions)) if args.actions else None
+        path = build_store(history_frame(scores, actions), args.store)
+        meta = Customer360Store(path).meta
+        print(f"✅ Saved customer360 store: {path} | Rows: {meta['rows']:,} | Customers: {meta['customers']:,}")
+
+    if args.customer:
+        store = Customer360Store(args.store)
+        columns = [c for c in args.columns.split(",") if c.strip()] if args.columns else None
+        hist = store.history(args.customer, columns)
+        if hist.empty:
+            print(f"ℹ️ Customer not in store: {args.customer}")
+        else:
+            with pd.option_context("display.max_columns", None, "display.width", 200):
+                print(hist.to_string(index=False))
+
+    if not args.scores and not args.customer:
+        ap.error("nothing to do: pass --scores to build and/or --customer to look up")
+
+
+if __name__ == "__main__":
+    main()
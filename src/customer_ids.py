@@ -0,0 +1,88 @@
+import pandas as pd
+
+from table_io import ID_COLUMN, numeric_ids
+
+
+def clean_ids(s: pd.Series) -> pd.Series:
+    """
+    Raw CustomerID values -> cleaned strings ("12346.0" -> "12346"). Each distinct value is cleaned
+    once and broadcast back, instead of a string pass over every row.
+    """
+    codes, uniques = pd.factorize(s)
+    cleaned = pd.Series(uniques, dtype=object).astype(str).str.replace(".0", "", regex=False).str.strip()
+    out = pd.Series(cleaned.to_numpy()[codes], index=s.index, name=s.name, dtype=object)
+    missing = codes < 0
+    if missing.any():
+        # NaN / None keep their plain-string spelling ("nan" / "None"), as the row-wise version did
+        out[missing] = s[missing].astype(str).str.strip()
+    return out
+
+
+class CustomerRegistry:
+    """
+    Cleaned CustomerID <-> dense int32 code (code = position in `ids`).
+    IDs are typed like apply_schema types them (int64 when every ID is an integer, else str) and
+    codes follow their sort order, so grouping / sorting / ranking on codes orders rows exactly
+    like the IDs themselves.
+    """
+
+    def __init__(self, ids: pd.Series):
+        self.ids = pd.Series(ids, name=ID_COLUMN).reset_index(drop=True)
+        self._index = pd.Index(self.ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def kind(self) -> str:
+        return "int" if pd.api.types.is_integer_dtype(self.ids) else "text"
+
+    @classmethod
+    def encode_new(cls, ids: pd.Series) -> tuple["CustomerRegistry", pd.Series]:
+        """
+        Build the registry from cleaned IDs and return it with their codes (one factorize pass).
+        """
+        codes, uniques = pd.factorize(numeric_ids(ids), sort=True)
+        if (codes < 0).any():
+            raise ValueError("CustomerID must not be missing when building the ID registry.")
+        return cls(pd.Series(uniques)), pd.Series(codes.astype("int32"), index=ids.index, name=ids.name)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "CustomerRegistry":
+        return cls(df[ID_COLUMN])
+
+    def frame(self) -> pd.DataFrame:
+        return self.ids.to_frame()
+
+    def _typed(self, ids: pd.Series) -> pd.Series:
+        if self.kind == "text":
+            return ids.astype(str)
+        return numeric_ids(ids)
+
+    def encode(self, ids: pd.Series) -> pd.Series:
+        """
+        IDs (cleaned strings or typed) -> int32 codes; unknown IDs are an error.
+        """
+        codes = self._index.get_indexer(self._typed(ids))
+        if (codes < 0).any():
+            unknown = ids[codes < 0].unique()[:5].tolist()
+            raise ValueError(f"CustomerIDs not in the ID registry: {unknown}")
+        return pd.Series(codes.astype("int32"), index=ids.index, name=ids.name)
+
+    def decode(self, codes: pd.Series) -> pd.Series:
+        return pd.Series(self.ids.to_numpy()[codes.to_numpy()], index=codes.index, name=codes.name)
+
+    def decode_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Copy of df with CustomerID codes replaced by the original IDs (BI exports).
+        """
+        if ID_COLUMN not in df.columns:
+            return df
+        out = df.copy(deep=False)  # only the ID column is replaced; other columns are shared
+        out[ID_COLUMN] = self.decode(out[ID_COLUMN])
+        return out
+
+    def encode_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        out = df.copy(deep=False)
+        out[ID_COLUMN] = self.encode(out[ID_COLUMN])
+        return out
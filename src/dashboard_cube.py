@@ -0,0 +1,161 @@
+from pathlib import Path
+import argparse
+import pandas as pd
+import numpy as np
+
+from customer_ids import clean_ids
+from table_io import FORMATS, apply_schema, is_columnar, read_table, write_table
+
+# Pre-aggregated tables for the dashboard pages: the report reads thousands of cube rows instead of
+# filtering millions of transaction / score rows in DAX. Every measure column is additive (sums / counts)
+# unless its name says otherwise (distinct counts, rates), so visuals can re-aggregate along the keys.
+CUBES = ["sales_monthly", "cohort_retention", "risk_segments", "action_budget"]
+
+
+def _month_start(dates: pd.Series) -> np.ndarray:
+    return dates.to_numpy(dtype="datetime64[ns]").astype("datetime64[M]")
+
+
+# -------------------------
+# Transactions: Sales Performance / Executive Overview, Cohort & Retention
+# -------------------------
+def sales_monthly(tx: pd.DataFrame) -> pd.DataFrame:
+    """
+    Month x Country: Revenue, Units, Lines, Orders / Customers (distinct within the cell).
+    """
+    country = tx["Country"] if "Country" in tx.columns else pd.Series("Unknown", index=tx.index)
+    lines = pd.DataFrame({
+        "Month": _month_start(tx["InvoiceDate"]).astype("datetime64[ns]"),
+        "Country": country.astype("category"),
+        "InvoiceNo": tx["InvoiceNo"].to_numpy(),
+        "CustomerID": tx["CustomerID"].to_numpy(),
+        "TotalPrice": tx["TotalPrice"].to_numpy(),
+        "Quantity": tx["Quantity"].to_numpy() if "Quantity" in tx.columns else 0,
+    })
+    keys = ["Month", "Country"]
+    out = lines.groupby(keys, sort=True, observed=True).agg(
+        Revenue=("TotalPrice", "sum"),
+        Units=("Quantity", "sum"),
+        Lines=("TotalPrice", "size"),
+    )
+    out["Orders"] = lines.drop_duplicates(keys + ["InvoiceNo"]).groupby(keys, sort=True, observed=True).size()
+    out["Customers"] = lines.drop_duplicates(keys + ["CustomerID"]).groupby(keys, sort=True, observed=True).size()
+    return out.reset_index()
+
+
+def cohort_retention(tx: pd.DataFrame) -> pd.DataFrame:
+    """
+    First-purchase month cohort x month offset: CohortSize, ActiveCustomers, RetentionRate, Revenue, Orders.
+    """
+    month = _month_start(tx["InvoiceDate"]).astype("int64")  # months since 1970-01
+    codes, _ = pd.factorize(tx["CustomerID"])
+    cohort = pd.Series(month).groupby(codes).transform("min").to_numpy()
+    lines = pd.DataFrame({
+        "cohort": cohort,
+        "offset": month - cohort,
+        "customer": codes,
+        "InvoiceNo": tx["InvoiceNo"].to_numpy(),
+        "TotalPrice": tx["TotalPrice"].to_numpy(),
+    })
+    keys = ["cohort", "offset"]
+    out = lines.groupby(keys, sort=True).agg(Revenue=("TotalPrice", "sum"))
+    out["Orders"] = lines.drop_duplicates(keys + ["InvoiceNo"]).groupby(keys, sort=True).size()
+    out["ActiveCustomers"] = lines.drop_duplicates(["customer", "offset"]).groupby(keys, sort=True).size()
+    out = out.reset_index()
+
+    # every customer is active in its first month: offset 0 holds the cohort size
+    size = out.loc[out["offset"] == 0].set_index("cohort")["ActiveCustomers"]
+    out["CohortSize"] = size.reindex(out["cohort"]).to_numpy()
+    out["RetentionRate"] = out["ActiveCustomers"] / out["CohortSize"]
+    out.insert(0, "CohortMonth", out["cohort"].to_numpy().astype("datetime64[M]").astype("datetime64[ns]"))
+    out.insert(1, "MonthOffset", out["offset"])
+    out.insert(2, "ActivityMonth", (out["cohort"] + out["offset"]).to_numpy().astype("datetime64[M]")
+               .astype("datetime64[ns]"))
+    cols = ["CohortMonth", "MonthOffset", "ActivityMonth", "CohortSize", "ActiveCustomers", "RetentionRate",
+            "Revenue", "Orders"]
+    return out[cols]
+
+
+# -------------------------
+# Scores / actions: Churn & Risk, Action Playbook
+# -------------------------
+def _flag_columns(df: pd.DataFrame) -> list[str]:
+    return [c for c in df.columns if c.startswith("action_flag_top")]
+
+
+def risk_segments(scores: pd.DataFrame) -> pd.DataFrame:
+    """
+    SnapshotDate x segment x risk_bucket: Customers, FlaggedCustomers, ExpectedLoss, Revenue (as-of lifetime),
+    ChurnProbabilitySum (avg = sum / Customers), action-list counts per top-N flag.
+    """
+    segment = "segment" if "segment" in scores.columns else "Segment"
+    keys = ["SnapshotDate", segment, "risk_bucket"]
+    sums = {
+        "FlaggedCustomers": "churn_flag",
+        "ExpectedLoss": "expected_loss",
+        "Revenue": "total_revenue",
+        "ChurnProbabilitySum": "churn_probability",
+    }
+    sums.update({c: c for c in _flag_columns(scores)})
+    cells = scores[keys + [c for c in sums.values() if c in scores.columns]]
+    g = cells.groupby(keys, sort=True, observed=True, dropna=False)
+    out = g.size().rename("Customers").to_frame()
+    for name, col in sums.items():
+        if col in cells.columns:
+            out[name] = g[col].sum()
+    return out.reset_index().rename(columns={segment: "segment"})
+
+
+def action_budget(actions: pd.DataFrame) -> pd.DataFrame:
+    """
+    SnapshotDate x priority x action: Customers, Budget (budget_suggestion total), ExpectedLoss,
+    action-list counts per top-N flag.
+    """
+    keys = ["SnapshotDate", "priority", "action"]
+    sums = {"Budget": "budget_suggestion", "ExpectedLoss": "expected_loss"}
+    sums.update({c: c for c in _flag_columns(actions)})
+    cells = actions[keys + [c for c in sums.values() if c in actions.columns]]
+    g = cells.groupby(keys, sort=True, observed=True, dropna=False)
+    out = g.size().rename("Customers").to_frame()
+    for name, col in sums.items():
+        if col in cells.columns:
+            out[name] = g[col].sum()
+    return out.reset_index()
+
+
+def build_dashboard_cube(tx: pd.DataFrame, scores: pd.DataFrame, actions: pd.DataFrame) -> dict:
+    """
+    cleaned transactions + churn scores + campaign actions -> {cube name: aggregate table} (see CUBES).
+    """
+    return {
+        "sales_monthly": sales_monthly(tx),
+        "cohort_retention": cohort_retention(tx),
+        "risk_segments": risk_segments(scores),
+        "action_budget": action_budget(actions),
+    }
+
+
+def _read(path: str) -> pd.DataFrame:
+    df = read_table(path)
+    if not is_columnar(path) and "CustomerID" in df.columns:
+        df["CustomerID"] = clean_ids(df["CustomerID"])
+    return apply_schema(df)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--transactions", required=True, help="transactions_clean.csv")
+    ap.add_argument("--scores", required=True, help="churn_scores.csv")
+    ap.add_argument("--actions", required=True, help="campaign_actions.csv")
+    ap.add_argument("--out_dir", required=True, help="writes dashboard_<cube>.<format> per cube")
+    ap.add_argument("--format", choices=FORMATS, default="csv", help="output format (inputs are read by suffix)")
+    args = ap.parse_args()
+
+    cubes = build_dashboard_cube(_read(args.transactions), _read(args.scores), _read(args.actions))
+    for name, df in cubes.items():
+        out_path = write_table(df, Path(args.out_dir) / f"dashboard_{name}.csv", args.format)
+        print(f"✅ Saved {name}: {out_path} | Rows: {len(df):,}")
+
+
+if __name__ == "__main__":
+    main()
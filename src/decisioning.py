@@ -0,0 +1,125 @@
+import pandas as pd
+import numpy as np
+
+# Thresholds / buckets used to turn churn_probability into decisions
+RISK_BUCKETS = [(0.80, "High"), (0.50, "Medium")]
+DEFAULT_BUCKET = "Low"
+
+TIER_THRESHOLDS = [("high", 0.30), ("mid", 0.50), ("low", 0.70)]
+SEGMENT_THRESHOLDS = [
+    (["champions", "loyal"], 0.30),
+    (["potential loyalist", "promising", "new customers", "needs attention"], 0.50),
+    (["at risk", "hibernating", "lost", "about to sleep"], 0.70),
+]
+DEFAULT_THRESHOLD = 0.50
+DEFAULT_TOP_PCT = 0.15
+
+
+def parse_top_pcts(arg) -> list[float]:
+    """
+    "0.15" -> [0.15]; "0.05,0.10,0.15,0.25" -> one action flag per share.
+    """
+    pcts = [float(p) for p in str(arg).split(",") if p.strip()]
+    if not pcts or any(not 0 < p <= 1 for p in pcts):
+        raise ValueError(f"Invalid --top_pct: {arg}")
+    return list(dict.fromkeys(pcts))
+
+
+def flag_column(top_pct: float) -> str:
+    return f"action_flag_top{int(round(top_pct * 100))}"
+
+
+def _text(df: pd.DataFrame, cols: list[str]) -> pd.Series:
+    # first existing column, stripped + lower-cased ("" when absent, "nan" for missing values)
+    for c in cols:
+        if c in df.columns:
+            return df[c].astype(str).str.strip().str.lower()
+    return pd.Series("", index=df.index, dtype=object)
+
+
+def risk_buckets(p: pd.Series) -> pd.Series:
+    p = pd.to_numeric(p, errors="coerce")
+    out = np.select([p >= t for t, _ in RISK_BUCKETS], [b for _, b in RISK_BUCKETS], default=DEFAULT_BUCKET)
+    return pd.Series(out, index=p.index, dtype=object)
+
+
+def dynamic_thresholds(df: pd.DataFrame) -> pd.Series:
+    """
+    Non-circular decision threshold:
+    - Prefer value_tier / segment if present
+    - else single default threshold (0.50)
+    """
+    tier = _text(df, ["value_tier", "ValueTier"])
+    seg = _text(df, ["segment", "Segment"])
+
+    conds = [tier.str.startswith(prefix) for prefix, _ in TIER_THRESHOLDS]
+    conds += [seg.isin(names) for names, _ in SEGMENT_THRESHOLDS]
+    choices = [t for _, t in TIER_THRESHOLDS] + [t for _, t in SEGMENT_THRESHOLDS]
+    return pd.Series(np.select(conds, choices, default=DEFAULT_THRESHOLD), index=df.index)
+
+
+def top_k_mask(values: np.ndarray, k: int) -> np.ndarray:
+    """
+    Mask of the k largest values (NaN never selected); ties at the cut keep the earliest rows.
+    Same selection as rank(method="first", ascending=False) <= k, via partial sort.
+    """
+    n = len(values)
+    valid = ~np.isnan(values)
+    n_valid = int(valid.sum())
+    if k >= n_valid:
+        return valid
+    if k <= 0:
+        return np.zeros(n, dtype=bool)
+
+    kth = np.partition(values[valid], n_valid - k)[n_valid - k]
+    mask = values > kth
+    ties = np.flatnonzero(values == kth)
+    mask[ties[: k - int(mask.sum())]] = True
+    return mask
+
+
+def add_action_flags(scores: pd.DataFrame, top_pcts=(DEFAULT_TOP_PCT,)) -> pd.DataFrame:
+    """
+    Add action_flag_topXX within each SnapshotDate, for every share in top_pcts.
+    Prioritize expected_loss if present, else churn_probability.
+    """
+    metric = "expected_loss" if "expected_loss" in scores.columns else "churn_probability"
+    values = pd.to_numeric(scores[metric], errors="coerce").to_numpy(dtype=float)
+
+    # one stable grouping for all shares: rows of each snapshot, in original order
+    codes, _ = pd.factorize(scores["SnapshotDate"], sort=True)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.cumsum(np.bincount(codes[codes >= 0]))
+    groups = np.split(order[codes[order] >= 0], bounds[:-1])
+
+    out = scores.copy()
+    for pct in top_pcts:
+        flag = np.zeros(len(scores), dtype=int)
+        for rows in groups:
+            k = max(int(np.ceil(len(rows) * pct)), 1)
+            flag[rows[top_k_mask(values[rows], k)]] = 1
+        out[flag_column(pct)] = flag
+    return out
+
+
+def apply_thresholds(scores: pd.DataFrame) -> pd.DataFrame:
+    """
+    dynamic_threshold, churn_flag and expected_loss (row-local: no snapshot-wide ranking).
+    """
+    scores = scores.copy()
+    scores["dynamic_threshold"] = dynamic_thresholds(scores)
+    scores["churn_flag"] = (scores["churn_probability"] >= scores["dynamic_threshold"]).astype(int)
+
+    # expected_loss proxy (keeps dashboard stable even if column missing)
+    if "total_revenue" in scores.columns:
+        scores["expected_loss"] = scores["churn_probability"] * scores["total_revenue"].fillna(0)
+    else:
+        scores["expected_loss"] = scores["churn_probability"]
+    return scores
+
+
+def apply_decisioning(scores: pd.DataFrame, top_pcts=(DEFAULT_TOP_PCT,)) -> pd.DataFrame:
+    """
+    apply_thresholds + top-X% action flags (risk_bucket: see risk_buckets).
+    """
+    return add_action_flags(apply_thresholds(scores), top_pcts)
@@ -0,0 +1,299 @@
+from contextlib import contextmanager
+from pathlib import Path
+import tempfile
+import pandas as pd
+
+try:
+    import duckdb
+    HAS_DUCKDB = True
+except Exception:
+    HAS_DUCKDB = False
+
+from order_facts import ORDER_COLUMNS, is_order_facts
+from table_io import is_columnar
+
+# Out-of-core snapshot engine: transactions stay in a Parquet file (or a registered frame) and every
+# snapshot date is computed by one SQL query; joins, aggregates and windows spill to temp_dir under memory_limit.
+SOURCE_COLUMNS = ["CustomerID", "InvoiceNo", "StockCode", "InvoiceDate", "TotalPrice", "Quantity", "UnitPrice"]
+DAY_US = 86_400_000_000
+
+
+# -------------------------
+# Session: one in-process database per call, spilling to a private temp directory
+# -------------------------
+@contextmanager
+def session(source, memory_limit: str | None = None, temp_dir: str | None = None):
+    """
+    DuckDB connection with the order fact table (order_facts.build_order_facts) as table `orders`.
+    source: Parquet path (scanned from disk) or DataFrame (registered, not copied) of cleaned
+    transactions or order facts.
+    memory_limit: e.g. "2GB" (DuckDB default: 80% of RAM); larger intermediates spill to temp_dir.
+    """
+    if not HAS_DUCKDB:
+        raise ImportError("The duckdb engine needs the duckdb package (pip install duckdb).")
+    with tempfile.TemporaryDirectory(prefix="duckdb_spill_", dir=temp_dir) as spill:
+        con = duckdb.connect()
+        try:
+            con.execute(f"SET temp_directory = '{spill}'")
+            con.execute("SET preserve_insertion_order = false")  # ordering comes from ORDER BY only
+            if memory_limit:
+                con.execute(f"SET memory_limit = '{memory_limit}'")
+            _register_orders(con, source)
+            yield con
+        finally:
+            con.close()
+
+
+def _register_source(con, source) -> list[str]:
+    if isinstance(source, pd.DataFrame):
+        cols = [c for c in SOURCE_COLUMNS + ORDER_COLUMNS if c in source.columns]
+        con.register("tx_source", source[list(dict.fromkeys(cols))])
+    else:
+        if not is_columnar(source):
+            raise ValueError(f"The duckdb engine scans Parquet files; got {source}")
+        path = Path(source).as_posix().replace("'", "''")
+        con.execute(f"CREATE VIEW tx_source AS SELECT * FROM read_parquet('{path}')")
+    return con.table("tx_source").columns
+
+
+def _register_orders(con, source) -> None:
+    cols = _register_source(con, source)
+    valid = "InvoiceDate IS NOT NULL AND CustomerID IS NOT NULL AND InvoiceNo IS NOT NULL"
+
+    if is_order_facts(pd.DataFrame(columns=cols)):
+        con.execute(f"""
+            CREATE VIEW orders AS
+            SELECT CustomerID, InvoiceNo, InvoiceDate, coalesce(TotalPrice, 0) AS TotalPrice,
+                   coalesce(Quantity, 0) AS Quantity, UniqueSKUs, NewSKUs
+            FROM tx_source WHERE {valid}
+        """)
+        return
+
+    if "TotalPrice" in cols:
+        price = "TotalPrice"
+    elif {"Quantity", "UnitPrice"}.issubset(cols):
+        price = "Quantity * UnitPrice"
+    else:
+        raise ValueError("No TotalPrice column found (and cannot derive from Quantity*UnitPrice).")
+    quantity = "Quantity" if "Quantity" in cols else "0"
+    con.execute(f"""
+        CREATE VIEW lines AS
+        SELECT CustomerID, InvoiceNo, {"StockCode" if "StockCode" in cols else "NULL"} AS StockCode, InvoiceDate,
+               coalesce({price}, 0) AS TotalPrice, coalesce({quantity}, 0) AS Quantity
+        FROM tx_source WHERE {valid}
+    """)
+    price_type, items_type = _sum_type(con, "lines", "TotalPrice"), _sum_type(con, "lines", "Quantity")
+
+    if "StockCode" in cols:
+        skus = f"""
+            o AS (
+                SELECT CustomerID, InvoiceNo, min(InvoiceDate) AS InvoiceDate,
+                       CAST(fsum(TotalPrice) AS {price_type}) AS TotalPrice,
+                       CAST(sum(Quantity) AS {items_type}) AS Quantity, count(DISTINCT StockCode) AS UniqueSKUs
+                FROM lines GROUP BY CustomerID, InvoiceNo
+            ),
+            -- a customer's SKU is new in its earliest order (ties share a date, so any of them will do)
+            new AS (
+                SELECT CustomerID, InvoiceNo, count(*) AS NewSKUs FROM (
+                    SELECT p.CustomerID, arg_min(p.InvoiceNo, o.InvoiceDate) AS InvoiceNo
+                    FROM (SELECT DISTINCT CustomerID, InvoiceNo, StockCode FROM lines WHERE StockCode IS NOT NULL) p
+                    JOIN o USING (CustomerID, InvoiceNo)
+                    GROUP BY p.CustomerID, p.StockCode
+                ) GROUP BY ALL
+            )"""
+    else:  # no StockCode: SKU counts are line counts, as in order_facts
+        skus = f"""
+            o AS (
+                SELECT CustomerID, InvoiceNo, min(InvoiceDate) AS InvoiceDate,
+                       CAST(fsum(TotalPrice) AS {price_type}) AS TotalPrice,
+                       CAST(sum(Quantity) AS {items_type}) AS Quantity, count(*) AS UniqueSKUs
+                FROM lines GROUP BY CustomerID, InvoiceNo
+            ),
+            new AS (SELECT CustomerID, InvoiceNo, UniqueSKUs AS NewSKUs FROM o)"""
+    # materialized once (the buffer manager spills it too); every query below reads it twice or more
+    con.execute(f"""
+        CREATE TEMP TABLE orders AS
+        WITH {skus}
+        SELECT o.*, CAST(coalesce(n.NewSKUs, 0) AS BIGINT) AS NewSKUs
+        FROM o LEFT JOIN new n USING (CustomerID, InvoiceNo)
+    """)
+
+
+def date_bounds(source) -> tuple[pd.Timestamp, pd.Timestamp]:
+    """
+    First / last InvoiceDate of a Parquet file without loading it.
+    """
+    with session(source) as con:
+        lo, hi = con.execute("SELECT min(InvoiceDate), max(InvoiceDate) FROM orders").fetchone()
+    return pd.Timestamp(lo), pd.Timestamp(hi)
+
+
+def _snapshot_table(con, snaps, lookback_days: int | None = None, windows=()) -> None:
+    snaps = pd.DatetimeIndex([pd.Timestamp(s).normalize() for s in snaps])
+    frame = pd.DataFrame({"snap_ts": snaps})
+    if lookback_days is not None and lookback_days > 0:
+        frame["lb_start"] = snaps - pd.Timedelta(days=lookback_days)
+    for d in windows:
+        frame[f"start_{d}d"] = snaps - pd.Timedelta(days=d)
+    con.register("snaps_frame", frame)
+    con.execute("CREATE TEMP TABLE snaps AS SELECT CAST(snap_ts AS DATE) AS snap, * FROM snaps_frame")
+
+
+def _sum_type(con, table: str, column: str) -> str:
+    """
+    groupby-sum dtype: integer columns stay integer (BIGINT, not DuckDB's HUGEINT), everything else DOUBLE.
+    """
+    kind = con.execute(f"SELECT typeof({column}) FROM {table} LIMIT 1").fetchone()
+    integer = kind is not None and kind[0] in {"TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT"}
+    return "BIGINT" if integer else "DOUBLE"
+
+
+# -------------------------
+# Lifetime state: per (customer, snapshot period) cells, accumulated with running windows, read as-of each snapshot
+# -------------------------
+def _lifetime_sql(revenue_type: str, items_type: str) -> str:
+    """
+    CTEs ending in `life`: one row per (snapshot, customer seen by then) with the lifetime aggregates.
+    """
+    # bucket = first snapshot whose midnight is >= InvoiceDate (any cadence; orders after the last one drop out)
+    return f"""
+        cells AS (
+            SELECT o.CustomerID, s.snap AS bucket, min(o.InvoiceDate) AS first_ts, max(o.InvoiceDate) AS last_ts,
+                   count(*) AS orders, fsum(o.TotalPrice) AS revenue, sum(o.Quantity) AS items,
+                   sum(o.NewSKUs) AS skus
+            FROM orders o ASOF JOIN snaps s ON o.InvoiceDate <= s.snap_ts
+            GROUP BY o.CustomerID, s.snap
+        ),
+        cum AS (
+            SELECT CustomerID, bucket,
+                   min(first_ts) OVER w AS first_purchase,
+                   max(last_ts) OVER w AS last_purchase,
+                   CAST(sum(orders) OVER w AS BIGINT) AS total_orders,
+                   CAST(fsum(revenue) OVER w AS {revenue_type}) AS total_revenue,
+                   CAST(sum(items) OVER w AS {items_type}) AS total_items,
+                   CAST(sum(skus) OVER w AS BIGINT) AS unique_skus
+            FROM cells
+            WINDOW w AS (PARTITION BY CustomerID ORDER BY bucket ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW)
+        ),
+        panel AS (
+            SELECT s.snap, s.snap_ts, f.CustomerID
+            FROM (SELECT CustomerID, min(bucket) AS first_bucket FROM cells GROUP BY CustomerID) f
+            JOIN snaps s ON s.snap >= f.first_bucket
+        ),
+        life AS (
+            SELECT p.snap, p.snap_ts, p.CustomerID, c.first_purchase, c.last_purchase, c.total_orders,
+                   c.total_revenue, c.total_items, c.unique_skus
+            FROM panel p ASOF JOIN cum c ON p.CustomerID = c.CustomerID AND p.snap >= c.bucket
+        )"""
+
+
+def _with_dates(df: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
+    for c in columns:
+        if c in df.columns:
+            df[c] = pd.to_datetime(df[c]).astype("datetime64[ns]")
+    return df
+
+
+# -------------------------
+# Snapshot features (same columns / values as feature_engineering.build_features_asof per snapshot)
+# -------------------------
+def monthly_features(
+    source,
+    snaps,
+    lookback_days: int | None,
+    windows=(30, 90),
+    memory_limit: str | None = None,
+    temp_dir: str | None = None,
+) -> pd.DataFrame:
+    """
+    Feature snapshots for every as-of date in `snaps` (any cadence), ordered by (SnapshotDate, CustomerID).
+    Lookback / rolling stats come from one range join of orders onto the snapshots whose window holds them.
+    """
+    with session(source, memory_limit, temp_dir) as con:
+        _snapshot_table(con, snaps, lookback_days, windows)
+        has_lb = lookback_days is not None and lookback_days > 0
+        revenue_type, items_type = _sum_type(con, "orders", "TotalPrice"), _sum_type(con, "orders", "Quantity")
+
+        # each order joins every snapshot whose lookback (>= start) or rolling window (> start) contains it;
+        # no lookback = whole history up to the snapshot
+        starts = ", ".join(["s.lb_start"] + [f"s.start_{d}d" for d in windows])
+        lower = f"AND o.InvoiceDate >= least({starts})" if has_lb else ""
+        in_lb = "o.InvoiceDate >= s.lb_start" if has_lb else "TRUE"
+        flags = "".join(f", o.InvoiceDate > s.start_{d}d AS in_{d}d" for d in windows)
+        cust_windows = "".join(
+            f", fsum(TotalPrice) FILTER (WHERE in_{d}d) AS revenue_last_{d}d"
+            f", count(*) FILTER (WHERE in_{d}d) AS orders_last_{d}d"
+            for d in windows
+        )
+        # rolling columns: missing -> 0, float like the pandas engines' fillna(0.0) after the left merge
+        select_windows = "".join(
+            f", CAST(coalesce(b.revenue_last_{d}d, 0) AS DOUBLE) AS revenue_last_{d}d"
+            f", CAST(coalesce(b.orders_last_{d}d, 0) AS DOUBLE) AS orders_last_{d}d"
+            for d in windows
+        )
+
+        sql = f"""
+        WITH {_lifetime_sql(revenue_type, items_type)},
+        win AS (
+            SELECT s.snap, o.CustomerID, o.InvoiceDate, o.TotalPrice, o.Quantity, o.UniqueSKUs,
+                   {in_lb} AS in_lb{flags}
+            FROM orders o JOIN snaps s ON o.InvoiceDate <= s.snap_ts {lower}
+        ),
+        basket AS (
+            SELECT snap, CustomerID,
+                   avg(TotalPrice) FILTER (WHERE in_lb) AS avg_basket_value,
+                   avg(Quantity) FILTER (WHERE in_lb) AS avg_items_per_order,
+                   avg(UniqueSKUs) FILTER (WHERE in_lb) AS avg_unique_skus{cust_windows}
+            FROM win GROUP BY snap, CustomerID
+        ),
+        gaps AS (
+            SELECT snap, CustomerID, avg(days) AS avg_days_between_orders, median(days) AS median_days_between_orders
+            FROM (
+                SELECT snap, CustomerID,
+                       (epoch_us(InvoiceDate) - epoch_us(lag(InvoiceDate) OVER (
+                           PARTITION BY snap, CustomerID ORDER BY InvoiceDate))) // {DAY_US} AS days
+                FROM win WHERE in_lb
+            ) WHERE days IS NOT NULL
+            GROUP BY snap, CustomerID
+        )
+        SELECT l.CustomerID, l.first_purchase, l.last_purchase, l.total_orders, l.total_revenue, l.total_items,
+               l.unique_skus,
+               (epoch_us(l.snap_ts) - epoch_us(l.last_purchase)) // {DAY_US} AS recency_days,
+               (epoch_us(l.last_purchase) - epoch_us(l.first_purchase)) // {DAY_US} AS tenure_days,
+               b.avg_basket_value, b.avg_items_per_order, b.avg_unique_skus,
+               g.avg_days_between_orders, g.median_days_between_orders{select_windows},
+               l.snap_ts AS SnapshotDate
+        FROM life l
+        LEFT JOIN basket b ON b.snap = l.snap AND b.CustomerID = l.CustomerID
+        LEFT JOIN gaps g ON g.snap = l.snap AND g.CustomerID = l.CustomerID
+        ORDER BY l.snap, l.CustomerID
+        """
+        out = con.execute(sql).df()
+    return _with_dates(out, ["first_purchase", "last_purchase", "SnapshotDate"])
+
+
+# -------------------------
+# RFM inputs (same values as segment_snapshot.compute_snapshot_rfm before scoring)
+# -------------------------
+def rfm_inputs(
+    source,
+    month_ends,
+    memory_limit: str | None = None,
+    temp_dir: str | None = None,
+) -> pd.DataFrame:
+    """
+    CustomerID, SnapshotDate, RecencyDays, Frequency, Monetary for every snapshot date, ordered (SnapshotDate, CustomerID).
+    """
+    with session(source, memory_limit, temp_dir) as con:
+        _snapshot_table(con, month_ends)
+        sql = f"""
+        WITH {_lifetime_sql(_sum_type(con, "orders", "TotalPrice"), "DOUBLE")}
+        SELECT CustomerID, snap_ts AS SnapshotDate,
+               greatest((epoch_us(snap_ts) + {DAY_US} - epoch_us(last_purchase)) // {DAY_US}, 0) AS RecencyDays,
+               total_orders AS Frequency,
+               total_revenue AS Monetary
+        FROM life
+        ORDER BY snap, CustomerID
+        """
+        out = con.execute(sql).df()
+    return _with_dates(out, ["SnapshotDate"])
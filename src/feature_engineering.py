@@ -1,32 +1,112 @@
-from pathlib import Path
 import argparse
 import pandas as pd
 import numpy as np
 
+import duckdb_engine
+import instrumentation
+from customer_ids import clean_ids
+from order_facts import ensure_order_facts
+from snapshots import CADENCES, parse_windows, snapshot_dates
+from table_io import FORMATS, TableWriter, csv_date_format, is_columnar, read_table
 
-def month_end_dates(first: pd.Timestamp, last: pd.Timestamp) -> pd.DatetimeIndex:
-    first_me = (first + pd.offsets.MonthEnd(0))
-    last_me = (last + pd.offsets.MonthEnd(0))
-    return pd.date_range(first_me, last_me, freq="ME")
+ROLLING_WINDOWS = (30, 90)
+DAY_NS = pd.Timedelta(days=1).value
 
 
-def _to_clean_id(s: pd.Series) -> pd.Series:
-    return s.astype(str).str.replace(".0", "", regex=False).str.strip()
+def _empty_snapshot() -> pd.DataFrame:
+    return pd.DataFrame(columns=["CustomerID", "SnapshotDate"])
 
 
-def build_features_asof(tx: pd.DataFrame, as_of: pd.Timestamp, lookback_days: int) -> pd.DataFrame:
+def _lookback_stats(hist_lb: pd.DataFrame, customers: pd.Series) -> tuple[pd.DataFrame, pd.DataFrame]:
     """
-    As-of features (no leakage): use ONLY data <= as_of.
+    Order-level behaviour inside the lookback window (hist_lb = order facts): basket stats + gaps between orders.
+    """
+    if hist_lb.empty:
+        per_cust = pd.DataFrame({"CustomerID": customers})
+        per_cust["avg_basket_value"] = np.nan
+        per_cust["avg_items_per_order"] = np.nan
+        per_cust["avg_unique_skus"] = np.nan
+        gaps = pd.DataFrame({"CustomerID": customers})
+        gaps["avg_days_between_orders"] = np.nan
+        gaps["median_days_between_orders"] = np.nan
+        return per_cust, gaps
+
+    order_level = hist_lb[["CustomerID", "InvoiceDate", "TotalPrice", "Quantity", "UniqueSKUs"]].rename(columns={
+        "TotalPrice": "order_revenue",
+        "Quantity": "order_items",
+        "UniqueSKUs": "order_unique_skus",
+        "InvoiceDate": "order_date",
+    })
+
+    per_cust = order_level.groupby("CustomerID", as_index=False).agg(
+        avg_basket_value=("order_revenue", "mean"),
+        avg_items_per_order=("order_items", "mean"),
+        avg_unique_skus=("order_unique_skus", "mean"),
+    )
+
+    order_level = order_level.sort_values(["CustomerID", "order_date"])
+    order_level["prev_date"] = order_level.groupby("CustomerID")["order_date"].shift(1)
+    order_level["days_between"] = (order_level["order_date"] - order_level["prev_date"]).dt.days
+    gaps = order_level.dropna(subset=["days_between"]).groupby("CustomerID", as_index=False).agg(
+        avg_days_between_orders=("days_between", "mean"),
+        median_days_between_orders=("days_between", "median"),
+    )
+    return per_cust, gaps
+
+
+def _rolling_metrics(w: pd.DataFrame, customers: pd.Series, days: int) -> pd.DataFrame:
+    """
+    Revenue / orders inside an as_of anchored window (w = order facts, already filtered).
+    """
+    if w.empty:
+        return pd.DataFrame({"CustomerID": customers, f"revenue_last_{days}d": 0.0, f"orders_last_{days}d": 0})
+    gw = w.groupby("CustomerID", as_index=False).agg(
+        revenue=("TotalPrice", "sum"),
+        orders=("InvoiceNo", "size"),
+    )
+    return gw.rename(columns={"revenue": f"revenue_last_{days}d", "orders": f"orders_last_{days}d"})
+
+
+def _assemble(
+    agg: pd.DataFrame,
+    per_cust: pd.DataFrame,
+    gaps: pd.DataFrame,
+    rolling: list[pd.DataFrame],
+    as_of: pd.Timestamp,
+    windows=ROLLING_WINDOWS,
+) -> pd.DataFrame:
+    out = agg.merge(per_cust, on="CustomerID", how="left").merge(gaps, on="CustomerID", how="left")
+    for r in rolling:
+        out = out.merge(r, on="CustomerID", how="left")
+
+    # Fill rolling NaNs (always float: every snapshot frame gets the same dtype, filled or not)
+    for days in windows:
+        for c in [f"revenue_last_{days}d", f"orders_last_{days}d"]:
+            if c in out.columns:
+                out[c] = pd.to_numeric(out[c], errors="coerce").fillna(0.0).astype("float64")
+
+    out["SnapshotDate"] = as_of
+    return out
+
+
+def build_features_asof(
+    orders: pd.DataFrame, as_of: pd.Timestamp, lookback_days: int, windows=ROLLING_WINDOWS
+) -> pd.DataFrame:
+    """
+    As-of features (no leakage): use ONLY orders <= as_of (orders = order_facts table).
 
     Fix:
     - Lifetime metrics computed from full history (<= as_of).
     - Lookback only used for "behavioral" stats (avg basket, gaps).
+
+    Reference implementation: re-filters the full frame per snapshot.
+    iter_features_incremental() must produce the same columns/values.
     """
     as_of = pd.Timestamp(as_of).normalize()
 
-    hist_all = tx[tx["InvoiceDate"] <= as_of].copy()
+    hist_all = orders[orders["InvoiceDate"] <= as_of].copy()
     if hist_all.empty:
-        return pd.DataFrame(columns=["CustomerID", "SnapshotDate"])
+        return _empty_snapshot()
 
     if lookback_days is not None and lookback_days > 0:
         start = as_of - pd.Timedelta(days=lookback_days)
@@ -37,114 +117,455 @@ def build_features_asof(tx: pd.DataFrame, as_of: pd.Timestamp, lookback_days: in
     # -------------------------
     # Lifetime aggregates (correct tenure)
     # -------------------------
-    g_all = hist_all.groupby("CustomerID", as_index=False)
-    agg = g_all.agg(
-        first_purchase=("InvoiceDate", "min"),
-        last_purchase=("InvoiceDate", "max"),
-        total_orders=("InvoiceNo", pd.Series.nunique),
-        total_revenue=("TotalPrice", "sum"),
-        total_items=("Quantity", "sum"),
-        unique_skus=("StockCode", pd.Series.nunique) if "StockCode" in hist_all.columns else ("InvoiceNo", "size"),
-    )
+    with instrumentation.step("lifetime", rows_in=len(hist_all)):
+        g_all = hist_all.groupby("CustomerID", as_index=False)
+        agg = g_all.agg(
+            first_purchase=("InvoiceDate", "min"),
+            last_purchase=("InvoiceDate", "max"),
+            total_orders=("InvoiceNo", "size"),
+            total_revenue=("TotalPrice", "sum"),
+            total_items=("Quantity", "sum"),
+            unique_skus=("NewSKUs", "sum"),
+        )
 
-    agg["recency_days"] = (as_of - agg["last_purchase"]).dt.days
-    agg["tenure_days"] = (agg["last_purchase"] - agg["first_purchase"]).dt.days
+        agg["recency_days"] = (as_of - agg["last_purchase"]).dt.days
+        agg["tenure_days"] = (agg["last_purchase"] - agg["first_purchase"]).dt.days
 
     # -------------------------
     # Lookback order-level stats (recent behavior)
     # -------------------------
-    if hist_lb.empty:
-        per_cust = agg[["CustomerID"]].copy()
-        per_cust["avg_basket_value"] = np.nan
-        per_cust["avg_items_per_order"] = np.nan
-        per_cust["avg_unique_skus"] = np.nan
-        gaps = agg[["CustomerID"]].copy()
-        gaps["avg_days_between_orders"] = np.nan
-        gaps["median_days_between_orders"] = np.nan
-    else:
-        order_level = hist_lb.groupby(["CustomerID", "InvoiceNo"], as_index=False).agg(
-            order_revenue=("TotalPrice", "sum"),
-            order_items=("Quantity", "sum"),
-            order_unique_skus=("StockCode", pd.Series.nunique) if "StockCode" in hist_lb.columns else ("InvoiceNo", "size"),
-            order_date=("InvoiceDate", "min"),
-        )
-
-        per_cust = order_level.groupby("CustomerID", as_index=False).agg(
-            avg_basket_value=("order_revenue", "mean"),
-            avg_items_per_order=("order_items", "mean"),
-            avg_unique_skus=("order_unique_skus", "mean"),
-        )
-
-        order_level = order_level.sort_values(["CustomerID", "order_date"])
-        order_level["prev_date"] = order_level.groupby("CustomerID")["order_date"].shift(1)
-        order_level["days_between"] = (order_level["order_date"] - order_level["prev_date"]).dt.days
-        gaps = order_level.dropna(subset=["days_between"]).groupby("CustomerID", as_index=False).agg(
-            avg_days_between_orders=("days_between", "mean"),
-            median_days_between_orders=("days_between", "median"),
-        )
+    with instrumentation.step("lookback", rows_in=len(hist_lb)):
+        per_cust, gaps = _lookback_stats(hist_lb, agg["CustomerID"])
 
     # -------------------------
     # Rolling windows (as_of anchored)
     # -------------------------
-    def rolling_metrics(days: int) -> pd.DataFrame:
-        w = hist_all[hist_all["InvoiceDate"] > (as_of - pd.Timedelta(days=days))]
-        if w.empty:
-            return pd.DataFrame({"CustomerID": agg["CustomerID"], f"revenue_last_{days}d": 0.0, f"orders_last_{days}d": 0})
-        gw = w.groupby("CustomerID", as_index=False).agg(
-            revenue=("TotalPrice", "sum"),
-            orders=("InvoiceNo", pd.Series.nunique),
-        )
-        return gw.rename(columns={"revenue": f"revenue_last_{days}d", "orders": f"orders_last_{days}d"})
+    with instrumentation.step("rolling"):
+        rolling = [
+            _rolling_metrics(hist_all[hist_all["InvoiceDate"] > (as_of - pd.Timedelta(days=d))], agg["CustomerID"], d)
+            for d in windows
+        ]
 
-    r30 = rolling_metrics(30)
-    r90 = rolling_metrics(90)
+    with instrumentation.step("assemble", rows_in=len(agg)):
+        return _assemble(agg, per_cust, gaps, rolling, as_of, windows)
 
-    out = agg.merge(per_cust, on="CustomerID", how="left").merge(gaps, on="CustomerID", how="left")
-    out = out.merge(r30, on="CustomerID", how="left").merge(r90, on="CustomerID", how="left")
 
-    # Fill rolling NaNs
-    for c in ["revenue_last_30d", "orders_last_30d", "revenue_last_90d", "orders_last_90d"]:
-        if c in out.columns:
-            out[c] = pd.to_numeric(out[c], errors="coerce").fillna(0.0)
+def iter_features_incremental(
+    orders: pd.DataFrame, snaps, lookback_days: int, since: pd.Timestamp | None = None, windows=ROLLING_WINDOWS
+):
+    """
+    Single-pass as-of engine (same output as build_features_asof per snapshot).
+    Snapshots before `since` only advance the carried state (nothing is yielded for them).
 
-    out["SnapshotDate"] = as_of
+    - orders (order_facts table) are sorted by InvoiceDate once; each snapshot only
+      consumes the orders added since the previous snapshot.
+    - Lifetime state (first/last purchase, orders, revenue, items, SKUs) is
+      carried forward in per-customer arrays.
+    - Lookback / rolling stats read a contiguous date slice (searchsorted),
+      no full-frame boolean mask or copy.
+    """
+    orders = orders.sort_values("InvoiceDate", kind="stable").reset_index(drop=True)
+    dates = orders["InvoiceDate"].to_numpy(dtype="datetime64[ns]")
+    dates_i8 = dates.view("i8")
+
+    codes, customers = pd.factorize(orders["CustomerID"], sort=True)
+    n_cust = len(customers)
+
+    revenue_order = orders["TotalPrice"].to_numpy(dtype="float64")
+    items_order = orders["Quantity"].to_numpy(dtype="float64")
+    new_skus = orders["NewSKUs"].to_numpy(dtype="float64")
+    # keep groupby-sum dtypes (int quantities stay int)
+    revenue_dtype = "int64" if pd.api.types.is_integer_dtype(orders["TotalPrice"]) else "float64"
+    items_dtype = "int64" if pd.api.types.is_integer_dtype(orders["Quantity"]) else "float64"
+
+    no_date = np.iinfo(np.int64).max
+    first_ns = np.full(n_cust, no_date, dtype="int64")
+    last_ns = np.full(n_cust, np.iinfo(np.int64).min, dtype="int64")
+    total_orders = np.zeros(n_cust, dtype="int64")
+    total_revenue = np.zeros(n_cust, dtype="float64")
+    total_items = np.zeros(n_cust, dtype="float64")
+    unique_skus = np.zeros(n_cust, dtype="int64")
+
+    consumed = 0
+    for as_of in snaps:
+        as_of = pd.Timestamp(as_of).normalize()
+        hi = int(np.searchsorted(dates, as_of.to_datetime64(), side="right"))
+        emit = since is None or as_of >= since
+        if hi == 0:
+            if emit:
+                yield _empty_snapshot()
+            continue
+
+        with instrumentation.step("lifetime", rows_in=hi - consumed):
+            if hi > consumed:
+                c = codes[consumed:hi]
+                d = dates_i8[consumed:hi]
+                np.minimum.at(first_ns, c, d)
+                np.maximum.at(last_ns, c, d)
+                total_orders += np.bincount(c, minlength=n_cust)
+                total_revenue += np.bincount(c, weights=revenue_order[consumed:hi], minlength=n_cust)
+                total_items += np.bincount(c, weights=items_order[consumed:hi], minlength=n_cust)
+                unique_skus += np.bincount(c, weights=new_skus[consumed:hi], minlength=n_cust).astype("int64")
+                consumed = hi
+
+            if emit:
+                idx = np.flatnonzero(first_ns != no_date)
+                agg = pd.DataFrame({
+                    "CustomerID": customers[idx],
+                    "first_purchase": pd.to_datetime(first_ns[idx]),
+                    "last_purchase": pd.to_datetime(last_ns[idx]),
+                    "total_orders": total_orders[idx],
+                    "total_revenue": total_revenue[idx].astype(revenue_dtype),
+                    "total_items": total_items[idx].astype(items_dtype),
+                    "unique_skus": unique_skus[idx],
+                })
+                agg["recency_days"] = (as_of - agg["last_purchase"]).dt.days
+                agg["tenure_days"] = (agg["last_purchase"] - agg["first_purchase"]).dt.days
+        if not emit:
+            continue
+
+        if lookback_days is not None and lookback_days > 0:
+            start = as_of - pd.Timedelta(days=lookback_days)
+            lo = int(np.searchsorted(dates, start.to_datetime64(), side="left"))
+        else:
+            lo = 0
+        with instrumentation.step("lookback", rows_in=hi - lo):
+            per_cust, gaps = _lookback_stats(orders.iloc[lo:hi], agg["CustomerID"])
+
+        with instrumentation.step("rolling"):
+            rolling = []
+            for days in windows:
+                w_lo = int(np.searchsorted(dates, (as_of - pd.Timedelta(days=days)).to_datetime64(), side="right"))
+                rolling.append(_rolling_metrics(orders.iloc[w_lo:hi], agg["CustomerID"], days))
+
+        with instrumentation.step("assemble", rows_in=len(agg)):
+            out = _assemble(agg, per_cust, gaps, rolling, as_of, windows)
+        yield out
+
+
+# -------------------------
+# Prefix-sum engine: every snapshot x window from per-customer running totals
+# -------------------------
+def _grouped_median(values: np.ndarray, lo: np.ndarray, counts: np.ndarray, max_rows: int = 5_000_000) -> np.ndarray:
+    """
+    Median of values[lo[i] : lo[i] + counts[i]] per row (NaN when counts[i] == 0); values are
+    non-negative ints. Rows are gathered in blocks of about max_rows values.
+    """
+    out = np.full(len(lo), np.nan)
+    span = int(values.max()) + 1 if len(values) else 1
+    ends = np.cumsum(counts)
+    first = 0
+    while first < len(lo):
+        last = max(int(np.searchsorted(ends, ends[first] - counts[first] + max_rows, side="right")), first + 1)
+        n, starts = counts[first:last], lo[first:last]
+        offsets = np.cumsum(n) - n
+        idx = np.repeat(starts - offsets, n) + np.arange(n.sum())
+        row = np.repeat(np.arange(len(n), dtype="int64"), n)
+        ranked = np.sort(row * span + values[idx]) % span
+        has = n > 0
+        mid_lo = ranked[(offsets + (n - 1) // 2)[has]]
+        mid_hi = ranked[(offsets + n // 2)[has]]
+        out[first:last][has] = (mid_lo + mid_hi) / 2
+        first = last
     return out
 
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--in", dest="in_path", required=True)
-    ap.add_argument("--out", dest="out_path", required=True)
-    ap.add_argument("--start", type=str, default=None, help="YYYY-MM-DD (optional)")
-    ap.add_argument("--end", type=str, default=None, help="YYYY-MM-DD (optional)")
-    ap.add_argument("--lookback_days", type=int, default=365)
-    args = ap.parse_args()
+def _prefix_rows(orders: pd.DataFrame, snaps: pd.DatetimeIndex, lookback_days: int, windows=ROLLING_WINDOWS):
+    """
+    Running totals of the order facts -> (rows(row_cust, row_snap) -> feature frame, first snapshot index per
+    customer code). Rows may be any (customer, snapshot) pairs with the customer seen by that snapshot.
+    """
+    codes, customers = pd.factorize(orders["CustomerID"], sort=True)
+    dates = orders["InvoiceDate"].to_numpy(dtype="datetime64[ns]")
+    udates, rank = np.unique(dates, return_inverse=True)
+    stride = len(udates) + 1
+    key = codes.astype("int64") * stride + rank.reshape(-1)
+    by_key = np.argsort(key, kind="stable")
+    key = key[by_key]
+    cust = codes[by_key]
+    date_ns = dates.view("i8")[by_key]
+    cust_start = np.searchsorted(key, np.arange(len(customers), dtype="int64") * stride)
+
+    def running(column: str, dtype: str) -> np.ndarray:
+        values = orders[column].to_numpy(dtype=dtype)[by_key]
+        return pd.Series(values).groupby(cust, sort=False).cumsum().to_numpy()
+
+    revenue_dtype = "int64" if pd.api.types.is_integer_dtype(orders["TotalPrice"]) else "float64"
+    items_dtype = "int64" if pd.api.types.is_integer_dtype(orders["Quantity"]) else "float64"
+    with instrumentation.step("running_totals", rows_in=len(orders)):
+        revenue = running("TotalPrice", revenue_dtype)
+        items = running("Quantity", items_dtype)
+        unique_per_order = running("UniqueSKUs", "int64")
+        new_skus = running("NewSKUs", "int64")
+        gap = np.zeros(len(key), dtype="int64")
+        same = cust[1:] == cust[:-1]
+        gap[1:][same] = (date_ns[1:] - date_ns[:-1])[same] // DAY_NS
+        gaps_run = pd.Series(gap).groupby(cust, sort=False).cumsum().to_numpy()
+
+    snap_ns = snaps.asi8
+    first_snap = np.searchsorted(snap_ns, date_ns[cust_start], side="left")
+
+    def rows(row_cust: np.ndarray, row_snap: np.ndarray) -> pd.DataFrame:
+        start = cust_start[row_cust]
+
+        def position(bounds: pd.DatetimeIndex, side: str) -> np.ndarray:
+            """
+            Per row: first position of the customer's orders with date >= bound (side="left") or > bound ("right").
+            """
+            r = np.searchsorted(udates, bounds.to_numpy(dtype="datetime64[ns]"), side=side)
+            return np.searchsorted(key, row_cust * stride + r[row_snap], side="left")
+
+        def range_sum(run: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+            upto = lambda p: np.where(p > start, run[np.maximum(p - 1, 0)], 0)
+            return upto(hi) - upto(lo)
+
+        with instrumentation.step("lifetime", rows_in=len(row_cust)):
+            hi = position(snaps, "right")
+            last = date_ns[hi - 1]
+            out = pd.DataFrame({
+                "CustomerID": customers[row_cust],
+                "first_purchase": pd.to_datetime(date_ns[start]),
+                "last_purchase": pd.to_datetime(last),
+                "total_orders": hi - start,
+                "total_revenue": revenue[hi - 1],
+                "total_items": items[hi - 1],
+                "unique_skus": new_skus[hi - 1],
+                "recency_days": (snap_ns[row_snap] - last) // DAY_NS,
+                "tenure_days": (last - date_ns[start]) // DAY_NS,
+            })
+
+        with instrumentation.step("lookback", rows_in=len(row_cust)):
+            if lookback_days is not None and lookback_days > 0:
+                lo = position(snaps - pd.Timedelta(days=lookback_days), "left")
+            else:
+                lo = start
+            n = hi - lo
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out["avg_basket_value"] = np.where(n > 0, range_sum(revenue, lo, hi) / n, np.nan)
+                out["avg_items_per_order"] = np.where(n > 0, range_sum(items, lo, hi) / n, np.nan)
+                out["avg_unique_skus"] = np.where(n > 0, range_sum(unique_per_order, lo, hi) / n, np.nan)
+                # gaps between consecutive lookback orders sit at positions lo+1 .. hi-1
+                gap_lo = np.minimum(lo + 1, hi)
+                out["avg_days_between_orders"] = np.where(n > 1, range_sum(gaps_run, gap_lo, hi) / (n - 1), np.nan)
+            out["median_days_between_orders"] = _grouped_median(gap, gap_lo, hi - gap_lo)
+
+        with instrumentation.step("rolling", rows_in=len(row_cust)):
+            for d in windows:
+                w_lo = position(snaps - pd.Timedelta(days=d), "right")
+                out[f"revenue_last_{d}d"] = range_sum(revenue, w_lo, hi).astype("float64")
+                out[f"orders_last_{d}d"] = (hi - w_lo).astype("float64")
 
-    tx = pd.read_csv(args.in_path)
-    tx["InvoiceDate"] = pd.to_datetime(tx["InvoiceDate"], errors="coerce")
+        out["SnapshotDate"] = pd.to_datetime(snap_ns[row_snap])
+        return out
+
+    return rows, first_snap
+
+
+def build_features_prefix(
+    orders: pd.DataFrame, snaps, lookback_days: int, windows=ROLLING_WINDOWS
+) -> pd.DataFrame:
+    """
+    All snapshots at once (same columns/values as build_features_asof per snapshot).
+
+    - orders (order_facts table) are sorted by (customer, date) once and every additive column gets a
+      per-customer running total.
+    - Each panel row (snapshot, customer seen by then) binary-searches its history end, lookback start
+      and window starts; sums / counts / means are differences of two running totals, so another window
+      or snapshot costs a few array ops per row, not another pass over the orders.
+    - Only the median gap reads the lookback orders themselves.
+    """
+    snaps = pd.DatetimeIndex([pd.Timestamp(s).normalize() for s in snaps])
+    if orders.empty or len(snaps) == 0:
+        return _empty_snapshot()
+    rows, first_snap = _prefix_rows(orders, snaps, lookback_days, windows)
+
+    # panel rows: every customer from the first snapshot on/after its first order, ordered (snapshot, customer)
+    counts = len(snaps) - first_snap
+    row_cust = np.repeat(np.arange(len(first_snap), dtype="int64"), counts)
+    row_snap = np.repeat(first_snap, counts) + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+    order = np.lexsort((row_cust, row_snap))
+    return rows(row_cust[order], row_snap[order])
+
+
+def iter_features_prefix(orders: pd.DataFrame, snaps, lookback_days: int, windows=ROLLING_WINDOWS):
+    """
+    build_features_prefix one snapshot at a time (same rows, in order): running totals are built once,
+    each yielded frame holds only that snapshot's customers. Snapshots before the first order are skipped.
+    """
+    snaps = pd.DatetimeIndex([pd.Timestamp(s).normalize() for s in snaps])
+    if orders.empty or len(snaps) == 0:
+        return
+    rows, first_snap = _prefix_rows(orders, snaps, lookback_days, windows)
+    for i in range(len(snaps)):
+        row_cust = np.flatnonzero(first_snap <= i)
+        if len(row_cust):
+            yield rows(row_cust, np.full(len(row_cust), i, dtype="int64"))
+
+
+def prepare_transactions(tx: pd.DataFrame, typed: bool = False) -> pd.DataFrame:
+    """
+    Parse/clean transactions (or order facts) for feature building. typed=True: dates/IDs already typed (Parquet/in-memory).
+    """
+    if not typed:
+        tx = tx.copy()
+        tx["InvoiceDate"] = pd.to_datetime(tx["InvoiceDate"], errors="coerce")
     tx = tx.dropna(subset=["InvoiceDate", "CustomerID", "InvoiceNo"]).copy()
 
-    tx["CustomerID"] = _to_clean_id(tx["CustomerID"])
+    if not typed:
+        tx["CustomerID"] = clean_ids(tx["CustomerID"])
     tx["TotalPrice"] = pd.to_numeric(tx["TotalPrice"], errors="coerce").fillna(0.0)
     tx["Quantity"] = pd.to_numeric(tx.get("Quantity", 0), errors="coerce").fillna(0.0)
+    return tx
 
-    first = pd.to_datetime(args.start) if args.start else tx["InvoiceDate"].min()
-    last = pd.to_datetime(args.end) if args.end else tx["InvoiceDate"].max()
 
-    snaps = month_end_dates(first, last)
+def _concat_snapshots(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    # snapshots before the first order (a daily/weekly one on the first order's day) are empty placeholders
+    return pd.concat([f for f in frames if len(f)] or frames, ignore_index=True)
 
-    frames = []
-    for as_of in snaps:
-        frames.append(build_features_asof(tx, as_of, lookback_days=args.lookback_days))
 
-    out = pd.concat(frames, ignore_index=True)
+def _snapshot_calendar(orders, start: str | None, end: str | None, cadence: str) -> pd.DatetimeIndex:
+    if isinstance(orders, pd.DataFrame):
+        lo, hi = orders["InvoiceDate"].min(), orders["InvoiceDate"].max()
+    else:
+        lo, hi = duckdb_engine.date_bounds(orders)
+    first = pd.to_datetime(start) if start else lo
+    last = pd.to_datetime(end) if end else hi
+    return snapshot_dates(first, last, cadence)
+
+
+def build_monthly_features(
+    orders,
+    start: str | None = None,
+    end: str | None = None,
+    lookback_days: int = 365,
+    engine: str = "prefix",
+    since: pd.Timestamp | None = None,
+    memory_limit: str | None = None,
+    cadence: str = "monthly",
+    windows=ROLLING_WINDOWS,
+) -> pd.DataFrame:
+    """
+    One feature snapshot per cadence period end (month-end / Sunday / day) from the order fact table,
+    with revenue / orders over each of `windows` days. since: only return snapshots >= since
+    (same values as a full run).
+    engine="duckdb": orders may also be a Parquet path of transactions or order facts (scanned out of core);
+    memory_limit caps DuckDB before it spills.
+    """
+    snaps = _snapshot_calendar(orders, start, end, cadence)
+    windows = tuple(windows)
+
+    if engine == "incremental":
+        frames = list(iter_features_incremental(orders, snaps, lookback_days=lookback_days, since=since,
+                                                windows=windows))
+        return _concat_snapshots(frames)
+
+    snaps = [as_of for as_of in snaps if since is None or as_of >= since]
+    if engine == "duckdb":
+        with instrumentation.step("duckdb"):
+            return duckdb_engine.monthly_features(
+                orders, snaps, lookback_days, windows=windows, memory_limit=memory_limit
+            )
+    if engine == "prefix":
+        return build_features_prefix(orders, snaps, lookback_days=lookback_days, windows=windows)
+    frames = [build_features_asof(orders, as_of, lookback_days=lookback_days, windows=windows) for as_of in snaps]
+    return _concat_snapshots(frames)
+
+
+def iter_monthly_features(
+    orders,
+    start: str | None = None,
+    end: str | None = None,
+    lookback_days: int = 365,
+    engine: str = "prefix",
+    since: pd.Timestamp | None = None,
+    memory_limit: str | None = None,
+    cadence: str = "monthly",
+    windows=ROLLING_WINDOWS,
+):
+    """
+    build_monthly_features as a stream of non-empty per-snapshot frames (concatenated: the same table), so a
+    writer can flush each snapshot and drop it. engine="duckdb" yields its whole result at once (it spills to
+    disk instead); an all-empty range yields one empty frame.
+    """
+    snaps = _snapshot_calendar(orders, start, end, cadence)
+    windows = tuple(windows)
+
+    if engine == "incremental":
+        frames = iter_features_incremental(orders, snaps, lookback_days=lookback_days, since=since, windows=windows)
+    elif engine == "duckdb":
+        frames = [build_monthly_features(orders, start, end, lookback_days, engine, since, memory_limit, cadence,
+                                         windows)]
+    else:
+        snaps = [as_of for as_of in snaps if since is None or as_of >= since]
+        if engine == "prefix":
+            frames = iter_features_prefix(orders, snaps, lookback_days=lookback_days, windows=windows)
+        else:
+            frames = (build_features_asof(orders, as_of, lookback_days=lookback_days, windows=windows)
+                      for as_of in snaps)
+
+    empty = True
+    for frame in frames:
+        if len(frame):
+            empty = False
+            yield frame
+    if empty:
+        yield _empty_snapshot()
+
+
+def _csv_date_formats(orders) -> dict | None:
+    """
+    Per-column CSV date formats of a feature table built from `orders`, fixed before any snapshot is written
+    (None for a DuckDB Parquet source: its result is written in one piece).
+    """
+    if not isinstance(orders, pd.DataFrame):
+        return None
+    purchase = csv_date_format(orders["InvoiceDate"])
+    return {"SnapshotDate": "%Y-%m-%d", "first_purchase": purchase, "last_purchase": purchase}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--in", dest="in_path", required=True, help="cleaned transactions or order facts")
+    ap.add_argument("--out", dest="out_path", required=True)
+    ap.add_argument("--start", type=str, default=None, help="YYYY-MM-DD (optional)")
+    ap.add_argument("--end", type=str, default=None, help="YYYY-MM-DD (optional)")
+    ap.add_argument("--lookback_days", type=int, default=365)
+    ap.add_argument("--cadence", choices=list(CADENCES), default="monthly", help="snapshot every month / week / day end")
+    ap.add_argument("--windows", default=",".join(map(str, ROLLING_WINDOWS)),
+                    help="rolling revenue/orders windows in days, e.g. 7,14,30,60,90,180,365")
+    ap.add_argument("--engine", choices=["prefix", "incremental", "asof", "duckdb"], default="prefix",
+                    help="prefix = all snapshots/windows from running totals; incremental = single-pass engine; "
+                         "asof = per-snapshot reference (parity checks); "
+                         "duckdb = out-of-core SQL engine (Parquet input is never loaded into memory)")
+    ap.add_argument("--memory_limit", default=None, help="duckdb: memory cap before spilling to disk, e.g. 2GB")
+    ap.add_argument("--format", choices=FORMATS, default="csv", help="output format (input is read by suffix)")
+    ap.add_argument("--stream", action="store_true",
+                    help="write each snapshot as soon as it is built (peak memory ~ one snapshot, same file)")
+    args = ap.parse_args()
+
+    if args.engine == "duckdb" and is_columnar(args.in_path):
+        orders = args.in_path
+    else:
+        orders = ensure_order_facts(prepare_transactions(read_table(args.in_path), typed=is_columnar(args.in_path)))
+    params = dict(lookback_days=args.lookback_days, engine=args.engine, memory_limit=args.memory_limit,
+                  cadence=args.cadence, windows=parse_windows(args.windows))
+    if args.stream:
+        frames = iter_monthly_features(orders, args.start, args.end, **params)
+    else:
+        frames = [build_monthly_features(orders, args.start, args.end, **params)]
 
-    Path(args.out_path).parent.mkdir(parents=True, exist_ok=True)
-    out.to_csv(args.out_path, index=False)
+    # both modes go through the same writer (fixed date formats), so the files are identical
+    snapshots, customers = set(), set()
+    with TableWriter(args.out_path, args.format, date_format=_csv_date_formats(orders)) as writer:
+        for frame in frames:
+            writer.write(frame)
+            snapshots.update(frame["SnapshotDate"].unique())
+            customers.update(frame["CustomerID"].unique())
+            del frame  # release the snapshot before the next one is built
 
     print(
-        f"✅ Saved monthly features: {args.out_path} | Rows: {len(out):,} | "
-        f"Months: {out['SnapshotDate'].nunique()} | Customers: {out['CustomerID'].nunique():,}"
+        f"✅ Saved monthly features: {writer.path} | Rows: {writer.rows:,} | "
+        f"Snapshots ({args.cadence}): {len(snapshots)} | Customers: {len(customers):,}"
     )
 
 
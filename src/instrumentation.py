@@ -0,0 +1,231 @@
+from pathlib import Path
+from contextlib import contextmanager, nullcontext
+import cProfile
+import json
+import os
+import sys
+import time
+import uuid
+
+import pandas as pd
+
+# Active run log (None = every step() is a no-op, so library code can stay instrumented)
+_ACTIVE = None
+
+
+# -------------------------
+# Memory probes: Linux VmHWM can be reset per step (clear_refs 5); elsewhere peak = process high-water
+# -------------------------
+def _status_mb(field: str) -> float | None:
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb() -> float:
+    peak = _status_mb("VmHWM:")
+    if peak is not None:
+        return peak
+    try:
+        import resource
+    except ImportError:  # Windows
+        return float("nan")
+    # ru_maxrss: KiB on Linux, bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def rss_mb() -> float:
+    rss = _status_mb("VmRSS:")
+    return rss if rss is not None else peak_rss_mb()
+
+
+def _reset_peak() -> bool:
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def frame_rows(value) -> int:
+    """
+    Rows across the DataFrames in a stage input/output (nested dicts allowed).
+    """
+    if isinstance(value, pd.DataFrame):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(frame_rows(v) for v in value.values())
+    return 0
+
+
+class Step:
+    """
+    One open step; code inside can report rows / extra fields.
+    """
+
+    def __init__(self, name: str, path: str, rows_in: int | None = None):
+        self.name = name
+        self.path = path
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.extra: dict = {}
+        self.peak = 0.0
+
+    def rows(self, rows_in: int | None = None, rows_out: int | None = None) -> None:
+        if rows_in is not None:
+            self.rows_in = rows_in
+        if rows_out is not None:
+            self.rows_out = rows_out
+
+    def note(self, **fields) -> None:
+        self.extra.update(fields)
+
+
+class _NoStep:
+    def rows(self, rows_in=None, rows_out=None) -> None:
+        pass
+
+    def note(self, **fields) -> None:
+        pass
+
+
+NO_STEP = _NoStep()
+
+
+class RunLog:
+    """
+    Collects step metrics for one run and appends them to a JSONL file:
+    - one "step" line per top-level step (stage, export, ...) as it finishes, followed by its
+      sub-steps aggregated by path (calls, summed wall/CPU/rows, max peak)
+    - one "run" line at the end (totals, status, run metadata)
+    profile_dir: cProfile dump per step opened with profile=True (<profile_dir>/<run_id>/<name>.prof).
+    """
+
+    def __init__(self, path, meta: dict | None = None, profile_dir=None, run_id: str | None = None):
+        self.path = Path(path)
+        self.meta = meta or {}
+        self.run_id = run_id or time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()) + "-" + uuid.uuid4().hex[:6]
+        self.profile_dir = Path(profile_dir) / self.run_id if profile_dir else None
+        self.peak_scope = "step" if _reset_peak() else "process"
+        self._stack: list[Step] = []
+        self._totals: dict[str, dict] = {}
+        self._max_peak = 0.0
+        self._prev = None
+
+    def __enter__(self):
+        global _ACTIVE
+        self._prev, _ACTIVE = _ACTIVE, self
+        self._t0, self._cpu0 = time.perf_counter(), time.process_time()
+        self.started_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _ACTIVE
+        _ACTIVE = self._prev
+        self._write({
+            "type": "run",
+            "run_id": self.run_id,
+            "started_at": self.started_at,
+            "status": "ok" if exc_type is None else f"error: {exc_type.__name__}",
+            "wall_s": round(time.perf_counter() - self._t0, 4),
+            "cpu_s": round(time.process_time() - self._cpu0, 4),
+            "peak_rss_mb": round(max(self._max_peak, peak_rss_mb()), 1),
+            "peak_scope": self.peak_scope,
+            "pid": os.getpid(),
+            **self.meta,
+        })
+        return False
+
+    def _write(self, record: dict) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+    @contextmanager
+    def step(self, name: str, rows_in: int | None = None, profile: bool = False):
+        path = "/".join([s.name for s in self._stack] + [name])
+        st = Step(name, path, rows_in)
+
+        # peak so far belongs to every open step; then measure this one from its own start
+        peak = peak_rss_mb()
+        for s in self._stack:
+            s.peak = max(s.peak, peak)
+        if self.peak_scope == "step":
+            _reset_peak()
+        rss0 = rss_mb()
+        self._stack.append(st)
+
+        prof = cProfile.Profile() if profile and self.profile_dir else None
+        t0, cpu0 = time.perf_counter(), time.process_time()
+        if prof:
+            prof.enable()
+        try:
+            yield st
+        finally:
+            if prof:
+                prof.disable()
+            wall, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+            st.peak = max(st.peak, peak_rss_mb())
+            self._stack.pop()
+            for s in self._stack:
+                s.peak = max(s.peak, st.peak)
+            self._max_peak = max(self._max_peak, st.peak)
+            if prof:
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                out = self.profile_dir / f"{path.replace('/', '.')}.prof"
+                prof.dump_stats(out)
+                st.note(profile=str(out))
+            self._record(st, wall, cpu, rss0)
+            if not self._stack:
+                self._flush(path)
+
+    def _record(self, st: Step, wall: float, cpu: float, rss0: float) -> None:
+        t = self._totals.setdefault(st.path, {
+            "calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_rss_mb": 0.0,
+            "rss_start_mb": round(rss0, 1), "rows_in": None, "rows_out": None,
+        })
+        t["calls"] += 1
+        t["wall_s"] += wall
+        t["cpu_s"] += cpu
+        t["peak_rss_mb"] = max(t["peak_rss_mb"], st.peak)
+        t["rss_end_mb"] = round(rss_mb(), 1)
+        for k in ["rows_in", "rows_out"]:
+            v = getattr(st, k)
+            if v is not None:
+                t[k] = (t[k] or 0) + int(v)
+        t.update(st.extra)
+
+    def _flush(self, top: str) -> None:
+        # top-level step first, then its sub-steps in first-seen order
+        paths = [top] + [p for p in self._totals if p.startswith(top + "/")]
+        for p in paths:
+            t = self._totals.pop(p)
+            wall = t["wall_s"]
+            record = {
+                "type": "step",
+                "run_id": self.run_id,
+                "step": p,
+                **t,
+                "wall_s": round(wall, 4),
+                "cpu_s": round(t["cpu_s"], 4),
+                "peak_rss_mb": round(t["peak_rss_mb"], 1),
+            }
+            rows = t["rows_in"] if t["rows_in"] is not None else t["rows_out"]
+            if rows and wall > 0:
+                record["rows_per_s"] = round(rows / wall, 1)
+            self._write(record)
+
+
+def step(name: str, rows_in: int | None = None, profile: bool = False):
+    """
+    Time a block when a RunLog is active (nested steps become "<parent>/<name>"); otherwise a no-op.
+    """
+    if _ACTIVE is None:
+        return nullcontext(NO_STEP)
+    return _ACTIVE.step(name, rows_in=rows_in, profile=profile)
@@ -0,0 +1,124 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import uuid
+import numpy as np
+import pandas as pd
+
+try:
+    import lightgbm as lgb
+    HAS_LGBM = True
+except Exception:
+    HAS_LGBM = False
+
+# Dataset construction parameters (part of the cache key; training params must agree with them).
+# feature_pre_filter off: one binned Dataset serves every min_child_samples in a grid.
+DATASET_PARAMS = {"max_bin": 255, "feature_pre_filter": False, "verbose": -1}
+CACHE_KEEP = 32  # binned datasets kept per cache directory (least recently used are removed)
+
+
+# -------------------------
+# float32 feature matrix: built column by column, no float64 copy of the whole table
+# -------------------------
+def float32_matrix(X, feats: list[str] | None = None) -> np.ndarray:
+    """
+    C-contiguous float32 copy of X[feats] (DataFrame) or X (2-D array); NaN / +-inf -> 0 like model_matrix.
+    """
+    if isinstance(X, pd.DataFrame):
+        feats = list(feats or X.columns)
+        out = np.empty((len(X), len(feats)), dtype=np.float32)
+        for j, col in enumerate(feats):
+            out[:, j] = X[col].to_numpy(dtype=np.float32, na_value=np.nan)
+    else:
+        out = np.array(X, dtype=np.float32, order="C")
+    out[~np.isfinite(out)] = 0
+    return out
+
+
+def dataset_key(X: np.ndarray, y: np.ndarray, feats: list[str]) -> str:
+    """
+    Content version of a training table: features, labels, binning params and LightGBM version.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps({"features": list(feats), "shape": list(X.shape), "params": DATASET_PARAMS,
+                         "lightgbm": lgb.__version__}, sort_keys=True).encode())
+    h.update(np.ascontiguousarray(X).data)
+    h.update(np.asarray(y, dtype=np.float32).tobytes())
+    return h.hexdigest()[:24]
+
+
+def _prune(cache_dir: Path, keep: int = CACHE_KEEP) -> None:
+    files = sorted(cache_dir.glob("*.bin"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for path in files[keep:]:
+        path.unlink(missing_ok=True)
+
+
+def binned_dataset(X, y: np.ndarray, feats: list[str], cache_dir=None) -> "lgb.Dataset":
+    """
+    Constructed (binned) LightGBM Dataset; the float32 matrix is released once binning is done.
+    cache_dir: the binary Dataset is saved under dataset_key and loaded instead of re-binned next time.
+    """
+    X = float32_matrix(X, feats)
+    path = None
+    if cache_dir:
+        cache_dir = Path(cache_dir)
+        path = cache_dir / f"{dataset_key(X, y, feats)}.bin"
+        if path.exists():
+            del X
+            os.utime(path)  # recently used: survives pruning
+            return lgb.Dataset(str(path), params=DATASET_PARAMS, free_raw_data=True).construct()
+
+    ds = lgb.Dataset(X, label=np.asarray(y, dtype=np.float32), feature_name=list(feats), params=DATASET_PARAMS,
+                     free_raw_data=True)
+    del X
+    ds.construct()
+
+    if path is not None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        # unique temp name: parallel CV workers may build the same fold
+        tmp = cache_dir / f"{path.stem}.{uuid.uuid4().hex[:8]}.tmp"
+        ds.save_binary(str(tmp))
+        os.replace(tmp, path)
+        _prune(cache_dir)
+    return ds
+
+
+class BoosterClassifier:
+    """
+    lgb.train Booster behind the predict_proba surface the scoring code uses (pickles with the artifact).
+    """
+
+    def __init__(self, booster: "lgb.Booster", feature_names: list[str]):
+        self.booster_ = booster
+        self.feature_names = list(feature_names)
+        self.best_iteration_ = booster.best_iteration or None
+
+    def predict_proba(self, X) -> np.ndarray:
+        # float32 like the training matrix, so split thresholds compare the same values
+        p = self.booster_.predict(float32_matrix(X, self.feature_names))
+        return np.column_stack([1 - p, p])
+
+
+def train_booster(
+    params: dict,
+    train: "lgb.Dataset",
+    valid: tuple | None = None,
+    early_stopping_rounds: int | None = None,
+) -> BoosterClassifier:
+    """
+    Binary LightGBM on a constructed Dataset. params use LGBMClassifier names (n_estimators, subsample, ...).
+    valid: (X, y) scored on the training bins, for early stopping on AUC.
+    """
+    params = {"objective": "binary", **params, **DATASET_PARAMS}
+    rounds = params.pop("n_estimators", 100)
+    valid_sets, callbacks = [], []
+    if valid is not None:
+        X_val, y_val = valid
+        valid_sets = [lgb.Dataset(float32_matrix(X_val, train.get_feature_name()), label=np.asarray(y_val),
+                                  reference=train, params=DATASET_PARAMS)]
+        params["metric"] = "auc"
+        if early_stopping_rounds:
+            callbacks.append(lgb.early_stopping(early_stopping_rounds, verbose=False))
+    booster = lgb.train(params, train, num_boost_round=rounds, valid_sets=valid_sets, callbacks=callbacks)
+    return BoosterClassifier(booster, train.get_feature_name())
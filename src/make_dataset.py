@@ -1,64 +1,74 @@
 from pathlib import Path
+import argparse
+import tempfile
 import pandas as pd
 
+from customer_ids import clean_ids
+from table_io import CATEGORY_COLUMNS, FORMATS, TableWriter, csv_date_format, write_table
 
-def ensure_dir(p: Path) -> None:
-    p.parent.mkdir(parents=True, exist_ok=True)
 
+RENAME_MAP = {
+    "invoice": "InvoiceNo",
+    "invoiceno": "InvoiceNo",
+    "invoice_no": "InvoiceNo",
+
+    "customer_id": "CustomerID",
+    "customerid": "CustomerID",
+    "customer_id_": "CustomerID",
+
+    "price": "UnitPrice",
+    "unitprice": "UnitPrice",
+    "unit_price": "UnitPrice",
+
+    "invoicedate": "InvoiceDate",
+    "invoice_date": "InvoiceDate",
+
+    "stockcode": "StockCode",
+    "stock_code": "StockCode",
+}
+
+CANONICAL = {
+    "invoiceno": "InvoiceNo",
+    "stockcode": "StockCode",
+    "description": "Description",
+    "quantity": "Quantity",
+    "invoicedate": "InvoiceDate",
+    "unitprice": "UnitPrice",
+    "customerid": "CustomerID",
+    "country": "Country",
+    "totalprice": "TotalPrice",
+}
+
+REQUIRED_COLS = ["InvoiceDate", "CustomerID", "InvoiceNo", "Quantity", "UnitPrice"]
+KEEP_COLS = [
+    "InvoiceDate", "InvoiceNo", "CustomerID",
+    "StockCode", "Description", "Quantity", "UnitPrice", "TotalPrice", "Country"
+]
+
+# Chunked mode: text columns are read as str (no per-chunk type guessing), numbers by the C parser
+TEXT_COLS = ["InvoiceDate", "InvoiceNo", "CustomerID", "StockCode", "Description", "Country"]
+NUMERIC_COLS = ["Quantity", "UnitPrice", "TotalPrice"]
+CATEGORY_TEXT_COLS = [c for c in TEXT_COLS if c in CATEGORY_COLUMNS]  # Parquet dictionaries: sorted, like write_table
+SAMPLE_ROWS = 10_000
+MIN_CHUNK_ROWS = 10_000
+MEMORY_OVERHEAD = 4  # raw chunk + cleaned copy + sort + merge buffers, relative to the raw chunk
 
-def main():
-    PROJECT_ROOT = Path(__file__).resolve().parents[1]
-    RAW = PROJECT_ROOT / "data" / "raw" / "online_retail_II.csv"
-    OUT = PROJECT_ROOT / "data" / "processed" / "transactions_clean.csv"
 
-    df = pd.read_csv(RAW, encoding_errors="ignore")
+def canonical_name(col: str) -> str:
+    c = col.strip().lower().replace(" ", "_")
+    c = RENAME_MAP.get(c, c)
+    return CANONICAL.get(c.lower(), c)
 
+
+def clean_transactions(df: pd.DataFrame, date_format: str | None = None) -> pd.DataFrame:
+    """
+    Raw Online Retail export -> canonical columns, valid rows only, TotalPrice, sorted by InvoiceDate.
+    Ties keep file order (stable sort), so chunked runs merge back to the same order.
+    """
     original_cols = df.columns.tolist()
+    df = df.rename(columns=canonical_name)  # the caller's frame is left untouched
 
-    df.columns = (
-        df.columns
-        .str.strip()
-        .str.lower()
-        .str.replace(" ", "_", regex=False)
-    )
-
-    rename_map = {
-        "invoice": "InvoiceNo",
-        "invoiceno": "InvoiceNo",
-        "invoice_no": "InvoiceNo",
-
-        "customer_id": "CustomerID",
-        "customerid": "CustomerID",
-        "customer_id_": "CustomerID",
-
-        "price": "UnitPrice",
-        "unitprice": "UnitPrice",
-        "unit_price": "UnitPrice",
-
-        "invoicedate": "InvoiceDate",
-        "invoice_date": "InvoiceDate",
-
-        "stockcode": "StockCode",
-        "stock_code": "StockCode",
-    }
-
-    df = df.rename(columns={c: rename_map.get(c, c) for c in df.columns})
-
-    canonical = {
-        "invoiceno": "InvoiceNo",
-        "stockcode": "StockCode",
-        "description": "Description",
-        "quantity": "Quantity",
-        "invoicedate": "InvoiceDate",
-        "unitprice": "UnitPrice",
-        "customerid": "CustomerID",
-        "country": "Country",
-        "totalprice": "TotalPrice",
-    }
-    df = df.rename(columns={c: canonical.get(c.lower(), c) for c in df.columns})
-
-    required_cols = ["InvoiceDate", "CustomerID", "InvoiceNo", "Quantity", "UnitPrice"]
-    missing = [c for c in required_cols if c not in df.columns]
+    missing = [c for c in REQUIRED_COLS if c not in df.columns]
     if missing:
         raise ValueError(
             f"❌ Missing required columns: {missing}\n"
@@ -66,30 +76,187 @@ def main():
             f"Normalized columns are: {df.columns.tolist()}"
         )
 
-    df["InvoiceDate"] = pd.to_datetime(df["InvoiceDate"], errors="coerce")
-    df = df.dropna(subset=["InvoiceDate", "CustomerID", "InvoiceNo"])
+    df["InvoiceDate"] = pd.to_datetime(df["InvoiceDate"], errors="coerce", format=date_format)
+    df = df.dropna(subset=["InvoiceDate", "CustomerID", "InvoiceNo"]).copy()
 
-    df["CustomerID"] = (
-        df["CustomerID"].astype(str).str.replace(".0", "", regex=False).str.strip()
-    )
+    df["CustomerID"] = clean_ids(df["CustomerID"])
 
     df["Quantity"] = pd.to_numeric(df["Quantity"], errors="coerce")
     df["UnitPrice"] = pd.to_numeric(df["UnitPrice"], errors="coerce")
     df = df.dropna(subset=["Quantity", "UnitPrice"])
-    df = df[(df["Quantity"] > 0) & (df["UnitPrice"] > 0)]
+    df = df[(df["Quantity"] > 0) & (df["UnitPrice"] > 0)].copy()
 
     df["TotalPrice"] = df["Quantity"] * df["UnitPrice"]
 
-    keep = [
-        "InvoiceDate", "InvoiceNo", "CustomerID",
-        "StockCode", "Description", "Quantity", "UnitPrice", "TotalPrice", "Country"
-    ]
-    keep = [c for c in keep if c in df.columns]
-    df = df[keep].sort_values("InvoiceDate")
+    keep = [c for c in KEEP_COLS if c in df.columns]
+    return df[keep].sort_values("InvoiceDate", kind="stable")
+
+
+# -------------------------
+# Chunked mode: sorted runs per chunk + k-way merge (memory set by chunk size, not file size)
+# -------------------------
+def read_options(in_path) -> dict:
+    """
+    read_csv kwargs for the chunked reader: only needed columns, explicit str dtypes for text.
+    """
+    header = pd.read_csv(in_path, nrows=0, encoding_errors="ignore").columns
+    usecols = [c for c in header if canonical_name(c) in KEEP_COLS]
+    dtype = {c: str for c in usecols if canonical_name(c) in TEXT_COLS}
+    return {"usecols": usecols, "dtype": dtype, "encoding_errors": "ignore"}
+
+
+def rows_for_memory(in_path, max_memory_mb: float, options: dict) -> int:
+    sample = pd.read_csv(in_path, nrows=SAMPLE_ROWS, **options)
+    per_row = sample.memory_usage(deep=True, index=False).sum() / max(len(sample), 1)
+    return max(MIN_CHUNK_ROWS, int(max_memory_mb * 2**20 / (per_row * MEMORY_OVERHEAD)))
+
+
+def merge_runs(runs: list[Path], block_rows: int):
+    """
+    Yield InvoiceDate-sorted blocks from date-sorted run files.
+    Only rows strictly older than every open run's buffered tail are emitted, so equal
+    timestamps are complete when emitted and keep run (= file) order.
+    """
+    import pyarrow.parquet as pq
+
+    readers = [pq.ParquetFile(p).iter_batches(batch_size=block_rows) for p in runs]
+    buffers = [None] * len(runs)
+    done = [False] * len(runs)
+
+    def refill(i: int) -> None:
+        batch = next(readers[i], None)
+        if batch is None:
+            done[i] = True
+            return
+        batch = batch.to_pandas()
+        buffers[i] = batch if buffers[i] is None else pd.concat([buffers[i], batch], ignore_index=True)
+
+    for i in range(len(runs)):
+        while not done[i] and (buffers[i] is None or buffers[i].empty):
+            refill(i)
+
+    while True:
+        tails = [buffers[i]["InvoiceDate"].iloc[-1] for i in range(len(runs)) if not done[i]]
+        frontier = min(tails) if tails else None
+
+        ready = []
+        for i, buf in enumerate(buffers):
+            if buf is None or buf.empty:
+                continue
+            if frontier is None:
+                ready.append(buf)
+                buffers[i] = buf.iloc[:0]
+                continue
+            n = int(buf["InvoiceDate"].searchsorted(frontier, side="left"))
+            if n:
+                ready.append(buf.iloc[:n])
+                buffers[i] = buf.iloc[n:].reset_index(drop=True)
+        if ready:
+            yield pd.concat(ready, ignore_index=True).sort_values("InvoiceDate", kind="stable")
+        if frontier is None:
+            return
+
+        for i in range(len(runs)):
+            if not done[i] and buffers[i]["InvoiceDate"].iloc[-1] == frontier:
+                refill(i)
+                while not done[i] and buffers[i].empty:
+                    refill(i)
+
+
+def clean_transactions_chunked(
+    in_path,
+    out_path,
+    fmt: str = "csv",
+    chunk_rows: int | None = None,
+    max_memory_mb: float | None = None,
+    tmp_dir: str | None = None,
+) -> tuple[Path, int, int]:
+    """
+    Same output as clean_transactions(read_csv(in_path)), with peak memory set by
+    chunk_rows (or derived from max_memory_mb). Returns (out_path, rows, customers).
+    """
+    from pandas.tseries.api import guess_datetime_format
+
+    options = read_options(in_path)
+    if chunk_rows is None:
+        chunk_rows = rows_for_memory(in_path, max_memory_mb, options)
+
+    date_format = None
+    integral = {c: True for c in NUMERIC_COLS}
+    date_formats = set()
+    customers = set()
+    categories = {c: set() for c in CATEGORY_TEXT_COLS}
+
+    with tempfile.TemporaryDirectory(prefix="make_dataset_", dir=tmp_dir) as tmp:
+        runs = []
+        for chunk in pd.read_csv(in_path, chunksize=chunk_rows, **options):
+            if date_format is None:
+                # read_csv + to_datetime infers ONE format from the first non-null date of the file
+                raw_dates = chunk[[c for c in chunk.columns if canonical_name(c) == "InvoiceDate"][0]].dropna()
+                if raw_dates.empty:
+                    continue
+                date_format = guess_datetime_format(str(raw_dates.iloc[0])) or "mixed"
+
+            clean = clean_transactions(chunk, date_format=date_format)
+            for c in NUMERIC_COLS:
+                integral[c] &= pd.api.types.is_integer_dtype(clean[c])
+                clean[c] = clean[c].astype("float64")
+            date_formats.add(csv_date_format(clean["InvoiceDate"]))
+            customers.update(clean["CustomerID"].unique())
+            for c in categories:
+                if c in clean.columns:
+                    categories[c].update(clean[c].dropna().unique())
+
+            run = Path(tmp) / f"run_{len(runs):05d}.parquet"
+            clean.to_parquet(run, index=False)
+            runs.append(run)
+
+        if not runs:
+            raise ValueError(f"❌ No rows with a valid InvoiceDate in {in_path}")
+
+        block_rows = max(1, chunk_rows // (len(runs) + 1))
+        csv_dates = max(date_formats, key=len)  # any chunk with times -> times for all rows
+        with TableWriter(out_path, fmt, date_format=csv_dates) as writer:
+            for block in merge_runs(runs, block_rows):
+                for c in NUMERIC_COLS:
+                    if integral[c]:
+                        block[c] = block[c].astype("int64")
+                if fmt == "parquet":
+                    # the whole file's categories in every block, not each block's own (appearance order)
+                    for c, values in categories.items():
+                        if c in block.columns:
+                            block[c] = pd.Categorical(block[c], categories=sorted(values))
+                writer.write(block)
+
+    return writer.path, writer.rows, len(customers)
+
+
+def main():
+    PROJECT_ROOT = Path(__file__).resolve().parents[1]
+    RAW = PROJECT_ROOT / "data" / "raw" / "online_retail_II.csv"
+    OUT = PROJECT_ROOT / "data" / "processed" / "transactions_clean.csv"
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--in", dest="in_path", default=str(RAW))
+    ap.add_argument("--out", dest="out_path", default=str(OUT))
+    ap.add_argument("--format", choices=FORMATS, default="csv", help="parquet = typed columnar intermediate")
+    ap.add_argument("--chunk_rows", type=int, default=None, help="chunked mode: raw rows per chunk")
+    ap.add_argument("--max_memory_mb", type=float, default=None, help="chunked mode: derive chunk size from a memory budget")
+    ap.add_argument("--tmp_dir", default=None, help="chunked mode: directory for sorted run files")
+    args = ap.parse_args()
+
+    if args.chunk_rows or args.max_memory_mb:
+        out_path, rows, customers = clean_transactions_chunked(
+            args.in_path, args.out_path, args.format,
+            chunk_rows=args.chunk_rows, max_memory_mb=args.max_memory_mb, tmp_dir=args.tmp_dir,
+        )
+        print(f"✅ Saved: {out_path} | Rows: {rows:,} | Customers: {customers:,} (chunked)")
+        return
+
+    df = clean_transactions(pd.read_csv(args.in_path, encoding_errors="ignore"))
 
-    ensure_dir(OUT)
-    df.to_csv(OUT, index=False)
-    print(f"✅ Saved: {OUT} | Rows: {len(df):,} | Customers: {df['CustomerID'].nunique():,}")
+    out_path = write_table(df, args.out_path, args.format)
+    print(f"✅ Saved: {out_path} | Rows: {len(df):,} | Customers: {df['CustomerID'].nunique():,}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+# One row per (CustomerID, InvoiceNo), built once from cleaned lines; features, RFM and labels read it
+# instead of line items, so distinct-order counts are row counts and distinct-SKU counts are sums.
+ORDER_COLUMNS = ["CustomerID", "InvoiceNo", "InvoiceDate", "TotalPrice", "Quantity", "UniqueSKUs", "NewSKUs"]
+
+
+def is_order_facts(df: pd.DataFrame) -> bool:
+    return {"UniqueSKUs", "NewSKUs"}.issubset(df.columns)
+
+
+def build_order_facts(tx: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cleaned lines -> order fact table, in InvoiceDate order (ties keep line order).
+
+    InvoiceDate: the order's first line. TotalPrice / Quantity: line sums.
+    UniqueSKUs: distinct StockCodes in the order (line count when there is no StockCode column).
+    NewSKUs: of those, SKUs the customer had not bought in an earlier order; a running sum is the
+    customer's distinct SKUs to date.
+    """
+    tx = tx.dropna(subset=["InvoiceDate", "CustomerID", "InvoiceNo"])
+    keys = ["CustomerID", "InvoiceNo"]
+    grouped = tx.groupby(keys, sort=False)
+    order_id = grouped.ngroup().to_numpy()  # line -> order, numbered like the agg rows below
+    orders = grouped.agg(
+        InvoiceDate=("InvoiceDate", "min"),
+        TotalPrice=("TotalPrice", "sum"),
+        Quantity=("Quantity", "sum"),
+    ).reset_index()
+    by_date = np.argsort(orders["InvoiceDate"].to_numpy(), kind="stable")
+    position = np.empty(len(orders), dtype="int64")
+    position[by_date] = np.arange(len(orders))
+
+    if "StockCode" in tx.columns:
+        pairs = pd.DataFrame({"order": order_id, "CustomerID": tx["CustomerID"].to_numpy(),
+                              "StockCode": tx["StockCode"].to_numpy()})
+        pairs = pairs[pairs["StockCode"].notna()].drop_duplicates(["order", "StockCode"])
+        unique = np.bincount(pairs["order"], minlength=len(orders))
+        # a customer's SKU is new in the earliest order (date order) that contains it
+        first = pairs.iloc[np.argsort(position[pairs["order"].to_numpy()], kind="stable")]
+        new = np.bincount(first.drop_duplicates(["CustomerID", "StockCode"])["order"], minlength=len(orders))
+    else:
+        unique = new = np.bincount(order_id, minlength=len(orders))
+    orders["UniqueSKUs"] = unique
+    orders["NewSKUs"] = new
+    orders = orders.iloc[by_date].reset_index(drop=True)
+    return orders[ORDER_COLUMNS]
+
+
+def ensure_order_facts(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    CLIs accept either cleaned transactions or a saved order fact table.
+    """
+    return df if is_order_facts(df) else build_order_facts(df)
@@ -0,0 +1,95 @@
+from datetime import datetime, timezone
+from pathlib import Path
+import hashlib
+import json
+import pandas as pd
+
+from table_io import SUFFIXES, apply_schema, is_columnar, read_table, write_table
+
+# Snapshot-partitioned history for BI: <dir>/<YYYY-MM-DD>.<suffix> per SnapshotDate + <dir>/_manifest.json.
+# A partition file is only rewritten when its rows change, so a folder-based BI refresh (Power BI incremental
+# refresh) picks up new / restated snapshots instead of reloading the whole history.
+PARTITION_COLUMN = "SnapshotDate"
+MANIFEST = "_manifest.json"
+
+
+def is_partitioned(path) -> bool:
+    return (Path(path) / MANIFEST).exists()
+
+
+def read_manifest(out_dir) -> dict:
+    path = Path(out_dir) / MANIFEST
+    if not path.exists():
+        raise FileNotFoundError(f"Missing {path}. Run the pipeline to write partitioned history.")
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _digest(part: pd.DataFrame) -> str:
+    h = hashlib.sha256(json.dumps([str(c) for c in part.columns]).encode())
+    h.update(pd.util.hash_pandas_object(part, index=False).to_numpy().tobytes())
+    return h.hexdigest()[:20]
+
+
+def write_partitions(df: pd.DataFrame, out_dir, fmt: str = "csv") -> dict:
+    """
+    One file per SnapshotDate under out_dir + manifest; unchanged partitions (same digest) are not rewritten,
+    partitions for snapshots no longer in df are removed. Returns the manifest plus written / kept / removed counts.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    previous = {p["snapshot"]: p for p in read_manifest(out_dir)["partitions"]} if is_partitioned(out_dir) else {}
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    entries, written = [], 0
+    for snapshot, part in df.groupby(PARTITION_COLUMN, sort=True, observed=True):
+        name = pd.Timestamp(snapshot).strftime("%Y-%m-%d")
+        file = f"{name}{SUFFIXES[fmt]}"
+        digest = _digest(part)
+        old = previous.pop(name, None)
+        if old and old["digest"] == digest and old["file"] == file and (out_dir / file).exists():
+            entries.append(old)
+            continue
+        if old and old["file"] != file:
+            (out_dir / old["file"]).unlink(missing_ok=True)
+        write_table(part, out_dir / file, fmt)
+        entries.append({"snapshot": name, "file": file, "rows": len(part), "digest": digest, "updated_at": now})
+        written += 1
+
+    for stale in previous.values():
+        (out_dir / stale["file"]).unlink(missing_ok=True)
+
+    manifest = {
+        "partition_column": PARTITION_COLUMN,
+        "format": fmt,
+        "columns": [str(c) for c in df.columns],
+        "rows": int(sum(e["rows"] for e in entries)),
+        "latest": entries[-1]["snapshot"] if entries else None,
+        "partitions": entries,
+    }
+    tmp = out_dir / f"{MANIFEST}.tmp"
+    tmp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    tmp.replace(out_dir / MANIFEST)  # readers never see a half-written manifest
+    return {**manifest, "written": written, "kept": len(entries) - written, "removed": len(previous)}
+
+
+def partition_path(out_dir, snapshot=None) -> Path | None:
+    """
+    File of one snapshot's partition (default: the latest); None when that snapshot has no rows.
+    """
+    manifest = read_manifest(out_dir)
+    name = manifest["latest"] if snapshot is None else pd.Timestamp(snapshot).strftime("%Y-%m-%d")
+    files = {p["snapshot"]: p["file"] for p in manifest["partitions"]}
+    return Path(out_dir) / files[name] if name in files else None
+
+
+def read_partition(out_dir, snapshot=None) -> pd.DataFrame:
+    """
+    One snapshot's rows (default: the latest), typed like apply_schema; empty frame with the manifest columns
+    when that snapshot has no partition.
+    """
+    path = partition_path(out_dir, snapshot)
+    if path is None:
+        return apply_schema(pd.DataFrame(columns=read_manifest(out_dir)["columns"]))
+    if is_columnar(path):
+        return apply_schema(read_table(path))
+    return apply_schema(pd.read_csv(path, float_precision="round_trip"))
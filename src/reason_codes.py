@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from lgbm_dataset import float32_matrix
+
+# Why a row scores high: the features pushing its churn log-odds up the most, strongest first.
+# LightGBM: native per-row contributions (pred_contrib); LogReg: coefficient x (standardized, if scaled) value.
+# Rows are explained in fixed-size chunks on a thread pool (LightGBM and numpy release the GIL), so at most
+# `workers` dense chunk_rows x features blocks exist at a time; only int16 feature codes are kept per row.
+N_REASONS = 3
+CHUNK_ROWS = 50_000
+
+
+def reason_columns(n: int = N_REASONS) -> list[str]:
+    return [f"reason_{i}" for i in range(1, n + 1)]
+
+
+def contributions(model, X: pd.DataFrame, feats: list[str], threads: int | None = None) -> np.ndarray:
+    """
+    rows x feats contributions to the churn log-odds of a fitted churn_model model (bias / intercept dropped).
+    """
+    if hasattr(model, "booster_"):
+        # BoosterClassifier / LGBMClassifier: float32 matrix like predict_proba, last column = expected value
+        params = {"num_threads": threads} if threads else {}
+        return model.booster_.predict(float32_matrix(X, feats), pred_contrib=True, **params)[:, :-1]
+
+    steps = getattr(model, "steps", None)
+    final = steps[-1][1] if steps else model
+    if not hasattr(final, "coef_"):
+        raise ValueError(f"No reason codes for model type: {type(model).__name__}")
+    Z = X[feats].replace([np.inf, -np.inf], np.nan).fillna(0)  # churn_model.model_matrix
+    if steps:
+        Z = model[:-1].transform(Z)  # StandardScaler: coefficients act on standardized values
+    return np.asarray(Z, dtype="float64") * final.coef_[0]
+
+
+def top_reasons(contrib: np.ndarray, n: int = N_REASONS) -> np.ndarray:
+    """
+    rows x n feature positions of the largest positive contributions (-1 when fewer than n raise the score).
+    """
+    order = np.argsort(-contrib, axis=1, kind="stable")[:, :n]
+    top = np.take_along_axis(contrib, order, axis=1)
+    codes = np.full((len(contrib), n), -1, dtype="int16")
+    codes[:, :order.shape[1]] = np.where(top > 0, order, -1)
+    return codes
+
+
+def reason_codes(
+    model,
+    df: pd.DataFrame,
+    feats: list[str],
+    n: int = N_REASONS,
+    chunk_rows: int = CHUNK_ROWS,
+    workers: int | None = None,
+    rows: np.ndarray | None = None,
+) -> pd.DataFrame:
+    """
+    reason_1..reason_n for every row of df (feature names as categoricals, NaN = no further driver), df's index.
+    workers: threads (default: all cores; LightGBM threads per chunk = cores // workers).
+    rows: boolean mask or positions of the rows to explain (default: all); the others stay NaN.
+    """
+    explained = df if rows is None else df.iloc[rows]
+    chunks = [(lo, min(lo + chunk_rows, len(explained))) for lo in range(0, len(explained), chunk_rows)]
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, len(chunks), cpus))
+    threads = max(1, cpus // workers)
+
+    def explain(bounds: tuple[int, int]) -> np.ndarray:
+        lo, hi = bounds
+        return top_reasons(contributions(model, explained.iloc[lo:hi], feats, threads), n)
+
+    with instrumentation.step("reason_codes", rows_in=len(explained)):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            blocks = list(pool.map(explain, chunks))  # chunk order -> same output for any worker count
+    codes = np.concatenate(blocks) if blocks else np.empty((0, n), dtype="int16")
+    if rows is not None:
+        codes, explained_codes = np.full((len(df), n), -1, dtype="int16"), codes
+        codes[rows] = explained_codes
+
+    out = pd.DataFrame(index=df.index)
+    for j, col in enumerate(reason_columns(n)):
+        out[col] = pd.Categorical.from_codes(codes[:, j], categories=list(feats))
+    return out
@@ -1,104 +1,573 @@
 from pathlib import Path
-import subprocess
-import pandas as pd
+import argparse
+import hashlib
+import json
+import shutil
 import sys
+import tempfile
+import time
+import pandas as pd
+
+import make_dataset
+import feature_engineering
+import churn_label
+import segment_snapshot
+import churn_model
+import campaign_actions
+import customer360
+import customer_ids
+import dashboard_cube
+import decisioning
+import duckdb_engine
+import instrumentation
+import order_facts
+import partitions
+import reason_codes
+import snapshots
+from table_io import (
+    FORMATS, SUFFIXES, TableWriter, apply_schema, csv_date_format, read_table, reason_columns_in, write_table,
+)
 
 ROOT = Path(__file__).resolve().parent.parent
 DATA = ROOT / "data"
+RAW = DATA / "raw" / "online_retail_II.csv"
 PROC = DATA / "processed"
+CACHE = DATA / "cache"
+RUN_LOG = PROC / "_run_log.jsonl"
+PROFILES = DATA / "profiles"
+
+
+# -------------------------
+# Stages: typed in-memory frames in -> dict of named outputs (DataFrame or text)
+# -------------------------
+def stage_make_dataset(inputs: dict, params: dict) -> dict:
+    if params.get("chunk_rows") or params.get("max_memory_mb"):
+        # bounded-memory ingestion: only the cleaned table is ever fully in memory
+        with tempfile.TemporaryDirectory(prefix="make_dataset_") as tmp:
+            out, _, _ = make_dataset.clean_transactions_chunked(
+                params["raw_path"], Path(tmp) / "transactions.parquet", "parquet",
+                chunk_rows=params["chunk_rows"], max_memory_mb=params["max_memory_mb"],
+            )
+            tx = pd.read_parquet(out)
+    else:
+        with instrumentation.step("read_raw") as st:
+            raw = pd.read_csv(params["raw_path"], encoding_errors="ignore")
+            st.rows(rows_out=len(raw))
+        with instrumentation.step("clean", rows_in=len(raw)) as st:
+            tx = make_dataset.clean_transactions(raw)
+            st.rows(rows_out=len(tx))
+    # every later stage groups / joins on dense int32 codes; exports decode them (PipelineRunner.registry)
+    registry, tx["CustomerID"] = customer_ids.CustomerRegistry.encode_new(tx["CustomerID"])
+    with instrumentation.step("order_facts", rows_in=len(tx)) as st:
+        orders = order_facts.build_order_facts(tx)
+        st.rows(rows_out=len(orders))
+    return {"transactions": tx, "orders": orders, "customers": registry.frame()}
+
+
+def stage_feature_engineering(inputs: dict, params: dict) -> dict:
+    orders = feature_engineering.prepare_transactions(inputs["make_dataset"]["orders"], typed=True)
+    feats = feature_engineering.build_monthly_features(
+        orders, lookback_days=params["lookback_days"], engine=params["engine"], since=params.get("since"),
+        memory_limit=params["memory_limit"], cadence=params["cadence"],
+        windows=snapshots.parse_windows(params["windows"]),
+    )
+    return {"features": feats}
+
+
+def stage_churn_label(inputs: dict, params: dict) -> dict:
+    tx = churn_label.prepare_transactions(inputs["make_dataset"]["orders"], typed=True)
+    feats = churn_label.prepare_features(inputs["feature_engineering"]["features"], typed=True)
+    windows = churn_label.parse_label_windows(params["label_window_days"])
+    return {"labeled": churn_label.label_features(tx, feats, windows)}
+
+
+def stage_segment_snapshot(inputs: dict, params: dict) -> dict:
+    orders = segment_snapshot.prepare_transactions(inputs["make_dataset"]["orders"], typed=True)
+    segments = segment_snapshot.compute_segment_snapshots(
+        orders, start=params.get("since"), workers=params["workers"], engine=params["engine"],
+        memory_limit=params["memory_limit"], cadence=params["cadence"],
+    )
+    return {"segments": segments}
+
 
-SCRIPTS = {
-    "make_dataset": ROOT / "src" / "make_dataset.py",
-    "feature_engineering": ROOT / "src" / "feature_engineering.py",
-    "churn_label": ROOT / "src" / "churn_label.py",
-    "segment_snapshot": ROOT / "src" / "segment_snapshot.py",
-    "churn_model": ROOT / "src" / "churn_model.py",
-    "campaign_actions": ROOT / "src" / "campaign_actions.py",
+def stage_churn_model(inputs: dict, params: dict) -> dict:
+    df = churn_model.prepare_labeled(inputs["churn_label"]["labeled"], typed=True)
+    seg = churn_model.prepare_segments(inputs["segment_snapshot"]["segments"], typed=True)
+    top_pcts = decisioning.parse_top_pcts(params["top_pct"])
+    models_dir = Path(params["models_dir"])
+
+    if params.get("model_version"):
+        # score-only: saved artifact, no fitting / evaluation
+        model, meta = churn_model.load_model_artifact(params["model_version"], models_dir)
+        if params.get("since") is not None:
+            df = df[df["SnapshotDate"] >= params["since"]]
+        report_lines = meta["report"] + [f"Scored with saved model {meta['version']} (no retraining)"]
+    else:
+        model, meta, report_lines = churn_model.train_model(
+            df, cutoff_date=params["cutoff_date"], selection=params["selection"],
+            cv_folds=params["cv_folds"], workers=params["cv_workers"], dataset_cache=params["dataset_cache"],
+        )
+        churn_model.save_model_artifact(model, meta, models_dir)
+
+    scores = churn_model.score_snapshots(model, meta["features"], df, seg, top_pcts=top_pcts,
+                                         reasons=params["reasons"],
+                                         reason_rows=churn_model.snapshot_mask(df, params["reason_snapshots"]))
+    return {"scores": scores, "report": "\n".join(report_lines)}
+
+
+def stage_campaign_actions(inputs: dict, params: dict) -> dict:
+    scores = campaign_actions.prepare_scores(inputs["churn_model"]["scores"], typed=True)
+    rules = campaign_actions.load_rules(params["rules_path"])
+    return {"actions": campaign_actions.build_campaign_actions(scores, rules=rules)}
+
+
+def stage_dashboard_cube(inputs: dict, params: dict) -> dict:
+    return dashboard_cube.build_dashboard_cube(
+        inputs["make_dataset"]["transactions"], inputs["churn_model"]["scores"], inputs["campaign_actions"]["actions"]
+    )
+
+
+# name -> (function, upstream stages, modules whose source versions the stage)
+STAGES = {
+    "make_dataset": (stage_make_dataset, [], [make_dataset, customer_ids, order_facts]),
+    "feature_engineering": (stage_feature_engineering, ["make_dataset"], [feature_engineering, duckdb_engine, snapshots]),
+    "churn_label": (stage_churn_label, ["make_dataset", "feature_engineering"], [churn_label]),
+    "segment_snapshot": (stage_segment_snapshot, ["make_dataset"], [segment_snapshot, duckdb_engine, snapshots]),
+    "churn_model": (stage_churn_model, ["churn_label", "segment_snapshot"], [churn_model, decisioning, reason_codes]),
+    "campaign_actions": (stage_campaign_actions, ["churn_model"], [campaign_actions]),
+    "dashboard_cube": (stage_dashboard_cube, ["make_dataset", "churn_model", "campaign_actions"], [dashboard_cube]),
 }
 
+# execution-only parameters: do not change a stage's output, so they stay out of its cache key
+UNKEYED_PARAMS = {"raw_path", "chunk_rows", "max_memory_mb", "models_dir", "rules_path", "workers", "cv_workers",
+                  "dataset_cache", "memory_limit"}
 
-def run(cmd: list[str]):
-    if cmd[0] == "python":
-        cmd = [sys.executable] + cmd[1:]
-    print("▶", " ".join(cmd))
-    subprocess.check_call(cmd)
+# (stage, output) -> file stem under data/processed
+OUTPUT_FILES = {
+    ("make_dataset", "transactions"): "transactions_clean",
+    ("feature_engineering", "features"): "customer_features_monthly",
+    ("churn_label", "labeled"): "customer_features_labeled",
+    ("segment_snapshot", "segments"): "customer_segment_snapshot",
+    ("churn_model", "scores"): "churn_scores",
+    ("churn_model", "report"): "churn_model_report",
+    ("campaign_actions", "actions"): "campaign_actions",
+    **{("dashboard_cube", name): f"dashboard_{name}" for name in dashboard_cube.CUBES},
+}
 
+# history tables also written as data/processed/<stem>/<SnapshotDate>.csv + _manifest.json (BI folder sources)
+PARTITIONED_OUTPUTS = ["customer_features_monthly", "customer_segment_snapshot", "churn_scores", "campaign_actions"]
+# Parquet runs: BI history and dashboard cubes are also exported as CSV
+BI_HISTORY_CSV = ["churn_scores", "campaign_actions", *(f"dashboard_{name}" for name in dashboard_cube.CUBES)]
 
-def main():
-    PROC.mkdir(parents=True, exist_ok=True)
 
-    tx_clean = PROC / "transactions_clean.csv"
-    feats = PROC / "customer_features_monthly.csv"
-    feats_labeled = PROC / "customer_features_labeled.csv"
-    seg_snap = PROC / "customer_segment_snapshot.csv"
-    churn_scores = PROC / "churn_scores.csv"
-    churn_report = PROC / "churn_model_report.txt"
-    actions = PROC / "campaign_actions.csv"
-
-    # 1) Clean transactions
-    run(["python", str(SCRIPTS["make_dataset"])])
-
-    # 2) Monthly features
-    run([
-        "python", str(SCRIPTS["feature_engineering"]),
-        "--in", str(tx_clean),
-        "--out", str(feats),
-        "--lookback_days", "365"
-    ])
-
-    # 3) Labels (right-censoring)
-    run([
-        "python", str(SCRIPTS["churn_label"]),
-        "--tx", str(tx_clean),
-        "--features", str(feats),
-        "--out", str(feats_labeled),
-        "--label_window_days", "90"
-    ])
-
-    # 4) Segment snapshot (time-aware)
-    run([
-        "python", str(SCRIPTS["segment_snapshot"]),
-        "--in", str(tx_clean),
-        "--out", str(seg_snap)
-    ])
-
-    # 5) Churn model scores (HISTORY)
-    run([
-        "python", str(SCRIPTS["churn_model"]),
-        "--in", str(feats_labeled),
-        "--segment_snapshot", str(seg_snap),
-        "--out_scores", str(churn_scores),
-        "--out_report", str(churn_report)
-    ])
-
-    # 6) Campaign actions (HISTORY) — recommended: only_action_list in BI would be a separate extract;
-    # keep history full by default
-    run([
-        "python", str(SCRIPTS["campaign_actions"]),
-        "--scores", str(churn_scores),
-        "--out", str(actions)
-    ])
-
-    # 7) Export LATEST extracts for BI convenience
-    df_scores = pd.read_csv(churn_scores)
-    df_scores["SnapshotDate"] = pd.to_datetime(df_scores["SnapshotDate"], errors="coerce")
-    latest = df_scores["SnapshotDate"].max()
-
-    df_scores_latest = df_scores[df_scores["SnapshotDate"] == latest].copy()
-    out_scores_latest = PROC / "churn_scores_latest.csv"
-    df_scores_latest.to_csv(out_scores_latest, index=False)
-
-    df_act = pd.read_csv(actions)
-    df_act["SnapshotDate"] = pd.to_datetime(df_act["SnapshotDate"], errors="coerce")
-    df_act_latest = df_act[df_act["SnapshotDate"] == latest].copy()
-    out_actions_latest = PROC / "campaign_actions_latest.csv"
-    df_act_latest.to_csv(out_actions_latest, index=False)
+def run_stage(name: str, inputs: dict, params: dict) -> dict:
+    fn, _, _ = STAGES[name]
+    # root stages read files, not frames: no rows_in
+    with instrumentation.step(name, rows_in=instrumentation.frame_rows(inputs) or None, profile=True) as st:
+        outputs = fn(inputs, params)
+        # typed frames in memory == what a cache hit returns
+        outputs = {k: apply_schema(v) if isinstance(v, pd.DataFrame) else v for k, v in outputs.items()}
+        st.rows(rows_out=instrumentation.frame_rows(outputs))
+    return outputs
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+
+class PipelineRunner:
+    """
+    In-process DAG runner with content-addressed stage caching.
+
+    A stage key hashes the stage parameters, the stage module source and the
+    keys of its upstream stages (the root stage hashes the raw file bytes), so
+    a key identifies the stage output content. Outputs live under
+    data/cache/<stage>/<key>/ and are only loaded when something needs them.
+    """
+
+    def __init__(self, params: dict, cache_dir: Path = CACHE, use_cache: bool = True):
+        self.params = params
+        self.cache_dir = cache_dir
+        self.use_cache = use_cache
+        self._keys: dict[str, str] = {}
+        self._outputs: dict[str, dict] = {}
+        self._registry = None
+
+    def key(self, name: str) -> str:
+        if name not in self._keys:
+            _, upstream, modules = STAGES[name]
+            h = hashlib.sha256()
+            h.update(name.encode())
+            keyed = {k: v for k, v in self.params.get(name, {}).items() if k not in UNKEYED_PARAMS}
+            h.update(json.dumps(keyed, sort_keys=True, default=str).encode())
+            for module in modules:
+                h.update(Path(module.__file__).read_bytes())
+            for up in upstream:
+                h.update(self.key(up).encode())
+            self._keys[name] = h.hexdigest()[:20]
+        return self._keys[name]
+
+    def _entry(self, name: str) -> Path:
+        return self.cache_dir / name / self.key(name)
+
+    def is_cached(self, name: str) -> bool:
+        return self.use_cache and (self._entry(name) / "_SUCCESS").exists()
+
+    def _load(self, name: str) -> dict | None:
+        entry = self._entry(name)
+        if not self.is_cached(name):
+            return None
+        out = {}
+        for p in sorted(entry.iterdir()):
+            if p.suffix == ".parquet":
+                out[p.stem] = pd.read_parquet(p)
+            elif p.suffix == ".txt":
+                out[p.stem] = p.read_text(encoding="utf-8")
+        return out
+
+    def _store(self, name: str, outputs: dict) -> None:
+        entry = self._entry(name)
+        entry.mkdir(parents=True, exist_ok=True)
+        for out_name, value in outputs.items():
+            if isinstance(value, pd.DataFrame):
+                value.to_parquet(entry / f"{out_name}.parquet", index=False)
+            else:
+                (entry / f"{out_name}.txt").write_text(value, encoding="utf-8")
+        (entry / "_SUCCESS").touch()
+
+    def output(self, name: str) -> dict:
+        if name in self._outputs:
+            return self._outputs[name]
+
+        if self.is_cached(name):
+            with instrumentation.step(name) as st:
+                cached = self._load(name)
+                st.note(cache="hit")
+                st.rows(rows_out=instrumentation.frame_rows(cached))
+            print(f"▶ {name}: cache hit [{self.key(name)}]")
+            self._outputs[name] = cached
+            return cached
+
+        _, upstream, _ = STAGES[name]
+        inputs = {up: self.output(up) for up in upstream}
+        print(f"▶ {name}: running [{self.key(name)}]")
+        t0 = time.perf_counter()
+        outputs = run_stage(name, inputs, self.params.get(name, {}))
+        print(f"   done in {time.perf_counter() - t0:.1f}s")
+
+        if self.use_cache:
+            self._store(name, outputs)
+        self._outputs[name] = outputs
+        return outputs
+
+    def registry(self) -> customer_ids.CustomerRegistry:
+        """
+        make_dataset's CustomerID registry; a cached stage only reads its customers table, not the transactions.
+        """
+        if self._registry is None:
+            if "make_dataset" not in self._outputs and self.is_cached("make_dataset"):
+                customers = pd.read_parquet(self._entry("make_dataset") / "customers.parquet")
+            else:
+                customers = self.output("make_dataset")["customers"]
+            self._registry = customer_ids.CustomerRegistry.from_frame(customers)
+        return self._registry
+
+
+def export_history(df: pd.DataFrame, stem: str, fmt: str) -> Path:
+    """
+    History table -> data/processed/<stem> in fmt, + snapshot partitions / CSV copy for the BI tables.
+    """
+    with instrumentation.step("bi_export", rows_in=len(df)) as st:
+        path = write_table(df, PROC / f"{stem}{SUFFIXES[fmt]}", fmt)
+        st.note(file=path.name)
+        if fmt != "csv" and stem in BI_HISTORY_CSV:
+            write_table(df, PROC / f"{stem}.csv")
+        if stem in PARTITIONED_OUTPUTS:
+            # BI exports are always CSV
+            summary = partitions.write_partitions(df, PROC / stem, "csv")
+            st.note(partitions_written=summary["written"], partitions_kept=summary["kept"])
+    return path
+
+
+def export_outputs(runner: PipelineRunner, fmt: str) -> dict:
+    """
+    Write stage outputs to data/processed (CustomerID codes decoded); files whose stage key is unchanged are left as-is.
+    """
+    state_path = PROC / "_pipeline_state.json"
+    state = json.loads(state_path.read_text()) if state_path.exists() else {}
+
+    paths = {}
+    for (stage, out_name), stem in OUTPUT_FILES.items():
+        key = runner.key(stage)
+        is_text = out_name == "report"
+        path = PROC / (f"{stem}.txt" if is_text else f"{stem}{SUFFIXES[fmt]}")
+        paths[stem] = path
+        copies = ([PROC / stem / partitions.MANIFEST] if stem in PARTITIONED_OUTPUTS else []) + (
+            [PROC / f"{stem}.csv"] if fmt != "csv" and stem in BI_HISTORY_CSV else [])
+        if state.get(path.name) == key and all(p.exists() for p in [path, *copies]):
+            continue
+        value = runner.output(stage)[out_name]
+        if is_text:
+            path.write_text(value, encoding="utf-8")
+        else:
+            export_history(runner.registry().decode_frame(value), stem, fmt)
+        state[path.name] = key
+
+    state_path.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    return paths
+
+
+def export_customer360(load_frames, key: str | None = None) -> Path:
+    """
+    Customer-sorted memory-mapped history store (scores + actions); rebuilt only when `key` changes.
+    load_frames() -> (scores, actions) is only called for a rebuild. key=None (incremental append): always rebuilt.
+    """
+    state_path = PROC / "_pipeline_state.json"
+    state = json.loads(state_path.read_text()) if state_path.exists() else {}
+    out_dir = PROC / customer360.STORE.name
+    if key is not None and state.get(out_dir.name) == key and (out_dir / "meta.json").exists():
+        return out_dir
+
+    scores, actions = load_frames()
+    with instrumentation.step("customer360", rows_in=len(scores)):
+        customer360.build_store(customer360.history_frame(scores, actions), out_dir)
+    if key is None:
+        state.pop(out_dir.name, None)
+    else:
+        state[out_dir.name] = key
+    state_path.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    return out_dir
+
+
+# -------------------------
+# Incremental append: invoices newer than the watermark -> recompute affected snapshots only
+# -------------------------
+WATERMARK = PROC / "_watermark.json"
+
+# parameters that shape the stored history; changing them needs a full rebuild
+HISTORY_PARAMS = {
+    "feature_engineering": ["lookback_days", "cadence", "windows"],
+    "churn_label": ["label_window_days"],
+    "segment_snapshot": ["cadence"],
+    "churn_model": ["reasons", "reason_snapshots"],  # reason_1..N columns of the score history
+}
+
+
+def history_params(params: dict) -> dict:
+    return {f"{stage}.{k}": params[stage][k] for stage, keys in HISTORY_PARAMS.items() for k in keys}
+
+
+def save_watermark(watermark: pd.Timestamp, params: dict, fmt: str, source_key: str | None = None) -> None:
+    """
+    source_key: make_dataset cache key of a full build (None after an incremental append).
+    """
+    state = {"watermark": str(watermark), "format": fmt, "params": history_params(params), "source_key": source_key}
+    WATERMARK.write_text(json.dumps(state, indent=2), encoding="utf-8")
+
+
+def watermark_is_current(runner: PipelineRunner, params: dict, fmt: str) -> bool:
+    if not WATERMARK.exists():
+        return False
+    state = json.loads(WATERMARK.read_text())
+    return state == {**state, "format": fmt, "params": history_params(params), "source_key": runner.key("make_dataset")}
+
+
+def load_history(stem: str, fmt: str) -> pd.DataFrame:
+    path = PROC / f"{stem}{SUFFIXES[fmt]}"
+    if not path.exists():
+        raise FileNotFoundError(f"Missing {path}. Run a full build before --append.")
+    if fmt == "csv":
+        # exact float parsing: kept rows are written back unchanged
+        return apply_schema(pd.read_csv(path, float_precision="round_trip"))
+    return apply_schema(read_table(path))
+
+
+def replace_snapshots(history: pd.DataFrame, fresh: pd.DataFrame, since: pd.Timestamp) -> pd.DataFrame:
+    """
+    History rows before `since` + recomputed rows from `since` on (same row order as a full run).
+    """
+    kept = history[history["SnapshotDate"] < since]
+    return apply_schema(pd.concat([kept, fresh], ignore_index=True))
+
+
+def run_incremental(delta_path: Path, params: dict, fmt: str) -> dict | None:
+    """
+    Append invoices newer than the watermark to the cleaned store and refresh only what they change:
+    - features / RFM segments: snapshots from the first new invoice's period (month / week / day) on
+    - labels: those snapshots + the ones whose label window was still open (censored) at the old watermark
+    - scores: retrain on the merged history (newly observable labels), or with a saved model
+      (model_version set) rescore only the refreshed snapshots
+    - actions: re-derived from the merged scores
+    - dashboard cubes: re-aggregated from the merged transactions / scores / actions
+    Returns the refreshed frames by file stem, or None when there is nothing new.
+    """
+    if not WATERMARK.exists():
+        raise FileNotFoundError(f"Missing {WATERMARK}. Run a full build before --append.")
+    state = json.loads(WATERMARK.read_text())
+    if state["format"] != fmt:
+        raise ValueError(f"History is stored as {state['format']}; rerun --append with --format {state['format']}.")
+    if state["params"] != history_params(params):
+        raise ValueError(f"History was built with {state['params']}; changed parameters need a full rebuild.")
+    watermark = pd.Timestamp(state["watermark"])
+
+    new = apply_schema(make_dataset.clean_transactions(pd.read_csv(delta_path, encoding_errors="ignore")))
+    skipped = int((new["InvoiceDate"] <= watermark).sum())
+    new = new[new["InvoiceDate"] > watermark]
+    if new.empty:
+        print(f"ℹ️ No transactions after the watermark ({watermark}); {skipped:,} rows already loaded.")
+        return None
+
+    tx_old = load_history("transactions_clean", fmt)
+    tx = apply_schema(pd.concat([tx_old, new], ignore_index=True))
+    # stages run on int32 codes, as in a full build; history files are encoded on load and decoded on write
+    registry, tx["CustomerID"] = customer_ids.CustomerRegistry.encode_new(tx["CustomerID"])
+
+    def history_codes(stem: str) -> pd.DataFrame:
+        return registry.encode_frame(load_history(stem, fmt))
+
+    cadence = params["feature_engineering"]["cadence"]
+    since = snapshots.snapshot_on_or_after(new["InvoiceDate"].min(), cadence)
+    windows = churn_label.parse_label_windows(params["churn_label"]["label_window_days"])
+    # first snapshot strictly after watermark - window: its label window was still open at the watermark
+    label_since = min(since, snapshots.snapshot_on_or_after(
+        watermark.normalize() - pd.Timedelta(days=max(windows) - 1), cadence))
+    print(f"▶ append: {len(new):,} new transactions ({skipped:,} already loaded) | "
+          f"snapshots from {since.date()}, labels from {label_since.date()}")
+
+    made = {"transactions": tx, "orders": order_facts.build_order_facts(tx)}
+    fe = run_stage("feature_engineering", {"make_dataset": made}, {**params["feature_engineering"], "since": since})
+    feats = replace_snapshots(history_codes("customer_features_monthly"), fe["features"], since)
+
+    open_feats = feats[feats["SnapshotDate"] >= label_since]
+    lab = run_stage("churn_label", {"make_dataset": made, "feature_engineering": {"features": open_feats}},
+                    params["churn_label"])
+    labeled = replace_snapshots(history_codes("customer_features_labeled"), lab["labeled"], label_since)
+
+    seg = run_stage("segment_snapshot", {"make_dataset": made}, {**params["segment_snapshot"], "since": since})
+    segments = replace_snapshots(history_codes("customer_segment_snapshot"), seg["segments"], since)
+
+    history = {"churn_label": {"labeled": labeled}, "segment_snapshot": {"segments": segments}}
+    if params["churn_model"].get("model_version"):
+        model = run_stage("churn_model", history, {**params["churn_model"], "since": label_since})
+        scores = replace_snapshots(history_codes("churn_scores"), model["scores"], label_since)
+        # full-build row order = prepare_labeled's (unstable) sort over the whole labeled history
+        order = churn_model.prepare_labeled(labeled, typed=True)[["CustomerID", "SnapshotDate"]]
+        scores = order.merge(scores, on=["CustomerID", "SnapshotDate"], how="left", validate="one_to_one")
+        if params["churn_model"]["reason_snapshots"] == "latest":
+            # as in a full build, only the (new) latest snapshot keeps reasons: not the previous latest
+            stale = scores["SnapshotDate"] < scores["SnapshotDate"].max()
+            for c in reason_columns_in(scores.columns):
+                scores[c] = scores[c].where(~stale)
+        model["scores"] = scores
+    else:
+        model = run_stage("churn_model", history, params["churn_model"])
+    actions = run_stage("campaign_actions", {"churn_model": model}, params["campaign_actions"])["actions"]
+    cube = run_stage("dashboard_cube", {"make_dataset": {"transactions": tx}, "churn_model": model,
+                                        "campaign_actions": {"actions": actions}}, {})
+
+    # cleaned store: CSV grows in place, Parquet is rewritten
+    tx_path = PROC / f"transactions_clean{SUFFIXES[fmt]}"
+    date_format = csv_date_format(tx["InvoiceDate"])
+    if fmt == "csv" and date_format == csv_date_format(tx_old["InvoiceDate"]):
+        with TableWriter(tx_path, fmt, date_format=date_format, append=True) as writer:
+            writer.write(new)
+    else:
+        write_table(registry.decode_frame(tx), tx_path, fmt)
+
+    refreshed = {
+        stem: registry.decode_frame(df) for stem, df in {
+            "customer_features_monthly": feats,
+            "customer_features_labeled": labeled,
+            "customer_segment_snapshot": segments,
+            "churn_scores": model["scores"],
+            "campaign_actions": actions,
+            **{f"dashboard_{name}": df for name, df in cube.items()},
+        }.items()
+    }
+    for stem, df in refreshed.items():
+        export_history(df, stem, fmt)
+    (PROC / "churn_model_report.txt").write_text(model["report"], encoding="utf-8")
+
+    # these files no longer match any cached stage key: the next full run must rewrite them
+    state_path = PROC / "_pipeline_state.json"
+    if state_path.exists():
+        pipeline_state = json.loads(state_path.read_text())
+        for stem in ["transactions_clean", "churn_model_report", *refreshed]:
+            for suffix in [".txt", *SUFFIXES.values()]:
+                pipeline_state.pop(f"{stem}{suffix}", None)
+        state_path.write_text(json.dumps(pipeline_state, indent=2), encoding="utf-8")
+
+    save_watermark(tx["InvoiceDate"].max(), params, fmt)
+    return refreshed
+
+
+def export_csv(df: pd.DataFrame, path: Path) -> Path:
+    with instrumentation.step("bi_export", rows_in=len(df)) as st:
+        st.note(file=path.name)
+        return write_table(df, path)
+
+
+def export_latest(stem: str, snapshot: str) -> Path:
+    """
+    <stem>_latest.csv = that snapshot's history partition (a file copy, nothing is parsed).
+    """
+    path = PROC / f"{stem}_latest.csv"
+    src = partitions.partition_path(PROC / stem, snapshot)
+    if src is None:
+        return export_csv(partitions.read_partition(PROC / stem, snapshot), path)
+    with instrumentation.step("bi_export") as st:
+        st.note(file=path.name, partition=src.name)
+        shutil.copyfile(src, path)
+    return path
+
+
+def run(args: argparse.Namespace, params: dict) -> None:
+    if args.append:
+        # 1-6) Incremental: new invoices only refresh the snapshots they affect
+        refreshed = run_incremental(Path(args.append), params, args.format)
+        if refreshed is None:
+            return
+        churn_scores = PROC / f"churn_scores{SUFFIXES[args.format]}"
+        actions = PROC / f"campaign_actions{SUFFIXES[args.format]}"
+        out_360 = export_customer360(lambda: (refreshed["churn_scores"], refreshed["campaign_actions"]))
+    else:
+        runner = PipelineRunner(params, cache_dir=Path(args.cache_dir), use_cache=not args.no_cache)
+
+        # 1-6) Stages (in-process, cached) + history outputs
+        paths = export_outputs(runner, args.format)
+        churn_scores = paths["churn_scores"]
+        actions = paths["campaign_actions"]
+
+        def history_frames() -> tuple[pd.DataFrame, pd.DataFrame]:
+            registry = runner.registry()
+            return (registry.decode_frame(runner.output("churn_model")["scores"]),
+                    registry.decode_frame(runner.output("campaign_actions")["actions"]))
+
+        out_360 = export_customer360(history_frames, key=runner.key("campaign_actions"))
+
+        if not watermark_is_current(runner, params, args.format):
+            tx_max = runner.output("make_dataset")["transactions"]["InvoiceDate"].max()
+            save_watermark(tx_max, params, args.format, source_key=runner.key("make_dataset"))
+
+    # 7) LATEST extracts for BI: copies of the latest snapshot partitions (BI exports are always CSV)
+    latest = partitions.read_manifest(PROC / "churn_scores")["latest"]
+    out_scores_latest = export_latest("churn_scores", latest)
+    out_actions_latest = export_latest("campaign_actions", latest)
+    if args.format != "csv":
+        churn_scores, actions = PROC / "churn_scores.csv", PROC / "campaign_actions.csv"
 
     # Optional: also export action list only (top15) for ops
+    df_scores_latest = partitions.read_partition(PROC / "churn_scores", latest)
     if "action_flag_top15" in df_scores_latest.columns:
         df_ops = df_scores_latest[df_scores_latest["action_flag_top15"] == 1].copy()
-        out_ops = PROC / "churn_ops_target_latest.csv"
-        df_ops.to_csv(out_ops, index=False)
+        out_ops = export_csv(df_ops, PROC / "churn_ops_target_latest.csv")
     else:
         out_ops = None
 
@@ -109,7 +578,98 @@ def main():
     print(f"   actions (latest):       {out_actions_latest}")
     if out_ops:
         print(f"   ops target (latest):    {out_ops}")
-    print(f"   latest SnapshotDate:    {latest.date()}")
+    print(f"   history partitions:     {PROC / 'churn_scores'}/, {PROC / 'campaign_actions'}/ (+ _manifest.json)")
+    print(f"   dashboard cubes:        {PROC}/dashboard_*.csv")
+    print(f"   customer 360 store:     {out_360}")
+    print(f"   latest SnapshotDate:    {latest}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--format", choices=FORMATS, default="csv",
+                    help="intermediate format; parquet keeps CSV only for the BI exports")
+    ap.add_argument("--raw", default=str(RAW), help="raw Online Retail II export")
+    ap.add_argument("--append", default=None,
+                    help="incremental mode: new invoices export (same layout as --raw); only affected snapshots are rebuilt")
+    ap.add_argument("--chunk_rows", type=int, default=None, help="make_dataset: chunked ingestion, raw rows per chunk")
+    ap.add_argument("--max_memory_mb", type=float, default=None, help="make_dataset: chunk size from a memory budget")
+    ap.add_argument("--lookback_days", type=int, default=365)
+    ap.add_argument("--engine", choices=["prefix", "incremental", "asof", "duckdb"], default="prefix",
+                    help="feature_engineering engine; prefix = all snapshots/windows from running totals; "
+                         "duckdb = out-of-core SQL engine that spills to disk")
+    ap.add_argument("--cadence", choices=list(snapshots.CADENCES), default="monthly",
+                    help="features + RFM segments: snapshot every month / week / day end")
+    ap.add_argument("--windows", default=",".join(map(str, feature_engineering.ROLLING_WINDOWS)),
+                    help="rolling revenue/orders windows in days, e.g. 7,14,30,60,90,180,365")
+    ap.add_argument("--label_window_days", type=str, default="90")
+    ap.add_argument("--cutoff_date", default=None)
+    ap.add_argument("--selection", choices=["holdout", "cv"], default="holdout",
+                    help="churn_model: one time split, or rolling-origin CV over a small grid")
+    ap.add_argument("--cv_folds", type=int, default=churn_model.CV_FOLDS)
+    ap.add_argument("--cv_workers", type=int, default=None, help="cv: processes (default: all cores)")
+    ap.add_argument("--top_pct", type=str, default=str(decisioning.DEFAULT_TOP_PCT),
+                    help="action list share(s) per snapshot, e.g. 0.05,0.10,0.15,0.25")
+    ap.add_argument("--reasons", type=int, default=reason_codes.N_REASONS,
+                    help="churn_scores reason_1..reason_N: top churn drivers per row (0 = off)")
+    ap.add_argument("--reason_snapshots", choices=["latest", "all"], default="latest",
+                    help="snapshots with reason codes (--append explains the same ones as a full build)")
+    ap.add_argument("--score_only", action="store_true",
+                    help="churn_model: score with the latest saved model artifact instead of retraining")
+    ap.add_argument("--models_dir", default=str(churn_model.MODELS), help="versioned model artifacts")
+    ap.add_argument("--segment_engine", choices=["vectorized", "snapshot", "duckdb"], default="vectorized")
+    ap.add_argument("--workers", type=int, default=1, help="processes for --segment_engine snapshot")
+    ap.add_argument("--duckdb_memory_limit", default=None,
+                    help="duckdb engines: memory cap before spilling to disk, e.g. 4GB (default: 80%% of RAM)")
+    ap.add_argument("--rules", default=str(campaign_actions.RULES), help="campaign rule table (JSON)")
+    ap.add_argument("--cache_dir", default=str(CACHE))
+    ap.add_argument("--no_cache", action="store_true", help="recompute every stage (cache is not read or written)")
+    ap.add_argument("--run_log", default=str(RUN_LOG), help="JSONL run log: per-stage / sub-step timings, memory, rows")
+    ap.add_argument("--profile", action="store_true", help=f"cProfile each stage into {PROFILES}/<run_id>/")
+    args = ap.parse_args()
+    if args.workers > 1 and args.segment_engine != "snapshot":
+        ap.error("--workers needs --segment_engine snapshot (the other engines run in one process)")
+
+    PROC.mkdir(parents=True, exist_ok=True)
+
+    params = {
+        "make_dataset": {
+            "raw_path": args.raw,
+            "raw_sha256": None if args.append else file_digest(Path(args.raw)),
+            "chunk_rows": args.chunk_rows,
+            "max_memory_mb": args.max_memory_mb,
+        },
+        "feature_engineering": {
+            "lookback_days": args.lookback_days, "engine": args.engine, "memory_limit": args.duckdb_memory_limit,
+            "cadence": args.cadence, "windows": ",".join(map(str, snapshots.parse_windows(args.windows))),
+        },
+        "churn_label": {"label_window_days": ",".join(map(str, churn_label.parse_label_windows(args.label_window_days)))},
+        "segment_snapshot": {
+            "engine": args.segment_engine, "workers": args.workers, "memory_limit": args.duckdb_memory_limit,
+            "cadence": args.cadence,
+        },
+        "churn_model": {
+            "models_dir": args.models_dir,
+            "model_version": churn_model.resolve_artifact(None, args.models_dir).name if args.score_only else None,
+            "cutoff_date": args.cutoff_date,
+            "selection": args.selection,
+            "cv_folds": args.cv_folds if args.selection == "cv" else None,
+            "cv_workers": args.cv_workers,
+            "dataset_cache": None if args.no_cache else str(Path(args.cache_dir) / "lgbm_datasets"),
+            "top_pct": ",".join(map(str, decisioning.parse_top_pcts(args.top_pct))),
+            "reasons": args.reasons,
+            "reason_snapshots": args.reason_snapshots,
+        },
+        "campaign_actions": {"rules_path": args.rules, "rules_sha256": file_digest(Path(args.rules))},
+    }
+
+    run_log = instrumentation.RunLog(
+        args.run_log,
+        meta={"mode": "append" if args.append else "full", "format": args.format, "argv": sys.argv[1:]},
+        profile_dir=PROFILES if args.profile else None,
+    )
+    with run_log:
+        run(args, params)
+    print(f"   run log:                {run_log.path} [{run_log.run_id}]")
 
 
 if __name__ == "__main__":
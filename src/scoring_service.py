@@ -0,0 +1,422 @@
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from urllib.parse import parse_qs, urlsplit
+import pandas as pd
+import numpy as np
+
+import campaign_actions
+import churn_model
+import reason_codes
+from customer_ids import clean_ids
+from decisioning import apply_thresholds, risk_buckets
+from table_io import is_columnar, read_table, reason_columns_in
+
+PROC = Path(__file__).resolve().parent.parent / "data" / "processed"
+
+RESULT_COLS = [
+    "CustomerID", "SnapshotDate",
+    "churn_probability", "risk_bucket", "dynamic_threshold", "churn_flag", "expected_loss",
+    "total_revenue", "total_orders", "recency_days", "tenure_days",
+    "segment", "RFM_Score", "value_tier",
+    "priority", "action", "offer_type", "message_angle", "budget_suggestion",
+]  # + reason_1..reason_N after message_angle
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+def clean_id(x) -> str:
+    # same normalization as customer_ids.clean_ids, for a single request value
+    return str(x).replace(".0", "").strip()
+
+
+# -------------------------
+# Model + feature cache (latest snapshot, one row per customer)
+# -------------------------
+class ChurnScorer:
+    """
+    Saved churn_model artifact + latest per-customer features in memory; scores any batch of IDs.
+    Results are a pure function of (model, features), so each customer is scored once and memoized.
+    """
+
+    def __init__(self, model, meta: dict, features: pd.DataFrame, segments: pd.DataFrame | None = None,
+                 rules: dict | None = None):
+        self.model = model
+        self.meta = meta
+        self.feats = meta["features"]
+        self.rules = rules if rules is not None else campaign_actions.load_rules()
+
+        missing = [c for c in self.feats if c not in features.columns]
+        if missing:
+            raise ValueError(f"Model features missing from input: {missing}")
+
+        # one ID spelling for frames and requests: typed (Parquet) IDs are int64, request IDs go through clean_id
+        features = features.assign(CustomerID=clean_ids(features["CustomerID"]))
+        if segments is not None:
+            segments = segments.assign(CustomerID=clean_ids(segments["CustomerID"]))
+
+        # value_tier quantiles span every snapshot, as in the batch campaign_actions stage
+        # (attached after thresholds: churn_model decides on segment, campaign_actions adds the tier)
+        features = features.assign(_value_tier=campaign_actions.compute_value_tier(features))
+
+        latest = churn_model.select_snapshots(features, "latest")
+        latest = latest.drop_duplicates("CustomerID", keep="last").reset_index(drop=True)
+        self.snapshot = latest["SnapshotDate"].max()
+
+        keep = ["CustomerID", "SnapshotDate", "total_revenue", "total_orders", "recency_days", "tenure_days",
+                "_value_tier"]
+        ctx = latest[[c for c in keep if c in latest.columns]]
+        if segments is not None:
+            seg = segments[segments["SnapshotDate"] == self.snapshot]
+            join_cols = [c for c in seg.columns if c not in ["CustomerID", "SnapshotDate"] + list(ctx.columns)]
+            ctx = ctx.merge(seg[["CustomerID", "SnapshotDate"] + join_cols], on=["CustomerID", "SnapshotDate"],
+                            how="left")
+            if "Segment" in ctx.columns and "segment" not in ctx.columns:
+                ctx["segment"] = ctx["Segment"]
+            if "RecencyDays" in ctx.columns and "recency_days" not in ctx.columns:
+                ctx["recency_days"] = ctx["RecencyDays"]
+
+        self.context = ctx
+        self.X = churn_model.model_matrix(latest, self.feats).to_numpy(dtype=float)
+        self.rows = {cid: i for i, cid in enumerate(latest["CustomerID"])}
+        self.results: dict[str, dict] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def cached(self, customer_ids: list) -> list[dict | None] | None:
+        """
+        Results straight from the memo, or None if any known customer still needs scoring.
+        """
+        keys = [clean_id(c) for c in customer_ids]
+        if any(k in self.rows and k not in self.results for k in keys):
+            return None
+        return [self.results.get(k) for k in keys]
+
+    def score(self, customer_ids: list) -> list[dict | None]:
+        """
+        One result per requested ID (None for customers not in the latest snapshot), in request order.
+        """
+        keys = [clean_id(c) for c in customer_ids]
+        todo = list(dict.fromkeys(k for k in keys if k in self.rows and k not in self.results))
+        if todo:
+            self.results.update(zip(todo, self._score_rows([self.rows[k] for k in todo])))
+        return [self.results.get(k) for k in keys]
+
+    def warm(self) -> int:
+        return len(self.score(list(self.rows)))
+
+    def _score_rows(self, rows: list[int]) -> list[dict]:
+        scores = self.context.iloc[rows].reset_index(drop=True)
+        X = pd.DataFrame(self.X[rows], columns=self.feats)
+        scores.insert(2, "churn_probability", self.model.predict_proba(X)[:, 1])
+        scores.insert(3, "risk_bucket", risk_buckets(scores["churn_probability"]))
+        scores = scores.join(reason_codes.reason_codes(self.model, X, self.feats, workers=1))
+        scores = apply_thresholds(scores)
+        scores["value_tier"] = scores.pop("_value_tier")
+        out = campaign_actions.build_campaign_actions(scores, rules=self.rules)
+
+        out["SnapshotDate"] = out["SnapshotDate"].dt.strftime("%Y-%m-%d")
+        at = RESULT_COLS.index("message_angle") + 1
+        cols = [c for c in RESULT_COLS[:at] + reason_columns_in(out.columns) + RESULT_COLS[at:] if c in out.columns]
+        values = [[None if isinstance(v, float) and math.isnan(v) else v for v in out[c].tolist()] for c in cols]
+        return [dict(zip(cols, r)) for r in zip(*values)]
+
+
+def load_scorer(features_path, segments_path=None, model="latest", models_dir=churn_model.MODELS,
+                rules_path=campaign_actions.RULES) -> ChurnScorer:
+    model, meta = churn_model.load_model_artifact(model, models_dir)
+    features = churn_model.prepare_labeled(read_table(features_path), typed=is_columnar(features_path),
+                                           require_label=False)
+    segments = None
+    if segments_path and Path(segments_path).exists():
+        segments = churn_model.prepare_segments(read_table(segments_path), typed=is_columnar(segments_path))
+    return ChurnScorer(model, meta, features, segments, campaign_actions.load_rules(rules_path))
+
+
+# -------------------------
+# Micro-batching: concurrent requests share one model call
+# -------------------------
+class MicroBatcher:
+    """
+    Collects requests until max_batch IDs are queued or max_wait_ms passed, then scores them together
+    (in a worker thread, so the event loop keeps accepting connections). Memo hits skip the queue.
+    """
+
+    def __init__(self, scorer: ChurnScorer, max_batch: int = 256, max_wait_ms: float = 2.0):
+        self.scorer = scorer
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.batches = 0
+
+    async def score(self, customer_ids: list) -> list[dict | None]:
+        hit = self.scorer.cached(customer_ids)
+        if hit is not None:
+            return hit
+        fut = asyncio.get_running_loop().create_future()
+        await self.queue.put((customer_ids, fut))
+        return await fut
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            n = len(items[0][0])
+            deadline = loop.time() + self.max_wait
+            while n < self.max_batch:
+                try:
+                    item = self.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                items.append(item)
+                n += len(item[0])
+
+            ids = [c for batch, _ in items for c in batch]
+            try:
+                results = await loop.run_in_executor(None, self.scorer.score, ids)
+            except Exception as e:
+                for _, fut in items:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+
+            self.batches += 1
+            at = 0
+            for batch, fut in items:
+                if not fut.done():
+                    fut.set_result(results[at:at + len(batch)])
+                at += len(batch)
+
+
+# -------------------------
+# HTTP/1.1 (keep-alive, JSON only)
+#   GET  /health
+#   GET  /score/<customer_id>        or /score?customer_id=a,b
+#   POST /score  {"customer_ids": [...]}
+# -------------------------
+class ScoringService:
+    def __init__(self, batcher: MicroBatcher):
+        self.batcher = batcher
+        self.scorer = batcher.scorer
+        self.requests = 0
+
+    async def route(self, method: str, target: str, body: bytes) -> tuple[int, dict]:
+        url = urlsplit(target)
+        if url.path == "/health":
+            return 200, {
+                "status": "ok",
+                "model": self.scorer.meta.get("version"),
+                "model_type": self.scorer.meta.get("model"),
+                "snapshot": str(self.scorer.snapshot.date()),
+                "customers": len(self.scorer),
+                "scored": len(self.scorer.results),
+                "requests": self.requests,
+                "batches": self.batcher.batches,
+            }
+
+        if url.path.startswith("/score/") and method == "GET":
+            result = (await self.batcher.score([url.path[len("/score/"):]]))[0]
+            if result is None:
+                return 404, {"error": "unknown customer", "customer_id": url.path[len("/score/"):]}
+            return 200, result
+
+        if url.path == "/score":
+            if method == "GET":
+                ids = [c for v in parse_qs(url.query).get("customer_id", []) for c in v.split(",") if c]
+            elif method == "POST":
+                try:
+                    ids = json.loads(body or b"{}").get("customer_ids")
+                except (ValueError, AttributeError):
+                    return 400, {"error": "body must be JSON: {\"customer_ids\": [...]}"}
+            else:
+                return 405, {"error": f"method not allowed: {method}"}
+            if not isinstance(ids, list) or not ids:
+                return 400, {"error": "customer_ids must be a non-empty list"}
+
+            results = await self.batcher.score(ids)
+            return 200, {
+                "results": [r if r is not None else {"CustomerID": clean_id(c), "error": "unknown customer"}
+                            for c, r in zip(ids, results)],
+            }
+
+        return 404, {"error": f"no route: {method} {url.path}"}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                    body = await reader.readexactly(int(headers.get("content-length", 0)))
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "malformed request"}, keep_alive=False)
+                    break
+
+                self.requests += 1
+                try:
+                    status, payload = await self.route(method.upper(), target, body)
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def respond(writer: asyncio.StreamWriter, status: int, payload: dict, keep_alive: bool):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + data)
+        await writer.drain()
+
+
+async def serve(scorer: ChurnScorer, host: str, port: int, max_batch: int, max_wait_ms: float):
+    batcher = MicroBatcher(scorer, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    service = ScoringService(batcher)
+    server = await asyncio.start_server(service.handle, host, port)
+    batch_task = asyncio.create_task(batcher.run())
+
+    print(f"✅ Serving churn scores on http://{host}:{port} | Model: {scorer.meta.get('version')} "
+          f"({scorer.meta.get('model')}) | Snapshot: {scorer.snapshot.date()} | Customers: {len(scorer):,}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batch_task.cancel()
+
+
+# -------------------------
+# Load test against a running instance
+# -------------------------
+async def read_response(reader: asyncio.StreamReader) -> tuple[int, bytes]:
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        h = await reader.readline()
+        if h in (b"\r\n", b"\n", b""):
+            break
+        k, _, v = h.decode("latin-1").partition(":")
+        if k.strip().lower() == "content-length":
+            length = int(v)
+    return status, await reader.readexactly(length)
+
+
+async def loadtest(host: str, port: int, ids: list[str], n_requests: int, concurrency: int,
+                   batch_size: int, seed: int = 42) -> dict:
+    rng = random.Random(seed)
+    todo = iter(range(n_requests))
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for _ in todo:
+                if batch_size == 1:
+                    req = f"GET /score/{rng.choice(ids)} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("latin-1")
+                else:
+                    body = json.dumps({"customer_ids": rng.sample(ids, min(batch_size, len(ids)))}).encode()
+                    req = (f"POST /score HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                           f"Content-Length: {len(body)}\r\n\r\n").encode("latin-1") + body
+                t0 = time.perf_counter()
+                writer.write(req)
+                await writer.drain()
+                status, _ = await read_response(reader)
+                latencies.append(time.perf_counter() - t0)
+                errors += status != 200
+        finally:
+            writer.close()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - t0
+
+    ms = np.array(latencies) * 1000.0
+    return {
+        "requests": len(ms),
+        "errors": errors,
+        "seconds": elapsed,
+        "requests_per_s": len(ms) / elapsed,
+        "customers_per_s": len(ms) * batch_size / elapsed,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mode", choices=["serve", "loadtest"], default="serve",
+                    help="serve = HTTP scoring service; loadtest = hammer a running instance")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--features", default=str(PROC / "customer_features_monthly.csv"),
+                    help="customer_features_monthly (latest snapshot is served; loadtest samples its IDs)")
+    ap.add_argument("--segment_snapshot", default=str(PROC / "customer_segment_snapshot.csv"),
+                    help="customer_segment_snapshot (optional)")
+    ap.add_argument("--models_dir", default=str(churn_model.MODELS), help="versioned model artifacts")
+    ap.add_argument("--model", default="latest", help="artifact version or directory (default: latest)")
+    ap.add_argument("--rules", default=str(campaign_actions.RULES), help="campaign rule table (JSON)")
+    ap.add_argument("--max_batch", type=int, default=256, help="max customer IDs per model call")
+    ap.add_argument("--max_wait_ms", type=float, default=2.0, help="how long a request waits for batch-mates")
+    ap.add_argument("--warm", action="store_true", help="score every customer at startup (no cold misses)")
+    ap.add_argument("--requests", type=int, default=2000, help="loadtest: total requests")
+    ap.add_argument("--concurrency", type=int, default=32, help="loadtest: parallel keep-alive connections")
+    ap.add_argument("--batch_size", type=int, default=1, help="loadtest: customer IDs per request")
+    args = ap.parse_args()
+
+    if args.mode == "loadtest":
+        features = read_table(args.features)
+        ids = sorted(clean_ids(features["CustomerID"]).unique())
+        stats = asyncio.run(loadtest(args.host, args.port, ids, args.requests, args.concurrency, args.batch_size))
+        print(f"✅ Load test: {stats['requests']:,} requests in {stats['seconds']:.2f}s | "
+              f"{stats['requests_per_s']:,.0f} req/s | {stats['customers_per_s']:,.0f} customers/s | "
+              f"errors: {stats['errors']}")
+        print(f"   latency ms: p50 {stats['p50_ms']:.2f} | p95 {stats['p95_ms']:.2f} | "
+              f"p99 {stats['p99_ms']:.2f} | max {stats['max_ms']:.2f}")
+        return
+
+    scorer = load_scorer(args.features, args.segment_snapshot, args.model, args.models_dir, args.rules)
+    if args.warm:
+        t0 = time.perf_counter()
+        print(f"✅ Warmed {scorer.warm():,} customers in {time.perf_counter() - t0:.2f}s")
+    try:
+        asyncio.run(serve(scorer, args.host, args.port, args.max_batch, args.max_wait_ms))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
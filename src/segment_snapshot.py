@@ -2,29 +2,24 @@
 from __future__ import annotations
 
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from multiprocessing import shared_memory
 from pathlib import Path
 import pandas as pd
 import numpy as np
 
-
-def to_clean_id(s: pd.Series) -> pd.Series:
-    return s.astype(str).str.replace(".0", "", regex=False).str.strip()
+import duckdb_engine
+from customer_ids import clean_ids
+from order_facts import ensure_order_facts
+from snapshots import CADENCES, snapshot_dates
+from table_io import FORMATS, TableWriter, is_columnar, read_table, write_table
 
 
 def _safe_to_datetime(s: pd.Series) -> pd.Series:
     return pd.to_datetime(s, errors="coerce", utc=False)
 
 
-def month_ends_between(start: pd.Timestamp, end: pd.Timestamp) -> list[pd.Timestamp]:
-    start = pd.Timestamp(start).normalize()
-    end = pd.Timestamp(end).normalize()
-    first = (start + pd.offsets.MonthEnd(0))
-    if first < start:
-        first = start + pd.offsets.MonthEnd(1)
-    month_ends = pd.date_range(first, end + pd.offsets.MonthEnd(0), freq="ME")
-    return [pd.Timestamp(d).normalize() for d in month_ends]
-
-
 def rfm_scores_quantile(rfm: pd.DataFrame) -> pd.DataFrame:
     out = rfm.copy()
 
@@ -112,10 +107,11 @@ def compute_snapshot_rfm(
             "R_Score", "F_Score", "M_Score", "RFM_Score", "Segment"
         ])
 
+    # tx = order facts: one row per order, so Frequency is a plain count
     grp = sub.groupby(customer_col, as_index=False).agg(
         LastPurchase=(date_col, "max"),
         FirstPurchase=(date_col, "min"),
-        Frequency=(invoice_col, pd.Series.nunique),
+        Frequency=(invoice_col, "count"),
         Monetary=(amount_col, "sum"),
     )
 
@@ -141,55 +137,483 @@ def compute_snapshot_rfm(
     return scored[cols].sort_values([customer_col]).reset_index(drop=True)
 
 
-def build_segment_snapshot(in_path: Path, out_path: Path, start: str | None = None, end: str | None = None) -> None:
-    tx = pd.read_csv(in_path)
+# -------------------------
+# Whole-history engine: all month-ends scored together (same output as compute_snapshot_rfm per month)
+# -------------------------
+_SCORE_LABELS = [1, 2, 3, 4, 5]
+
+
+def segment_lookup() -> np.ndarray:
+    """
+    5x5x5 (R, F, M) -> segment table, indexed by the 1..5 scores directly.
+    """
+    lut = np.empty((6, 6, 6), dtype=object)
+    for r in _SCORE_LABELS:
+        for f in _SCORE_LABELS:
+            for m in _SCORE_LABELS:
+                lut[r, f, m] = segment_from_rfm(r, f, m)
+    return lut
+
+
+def grouped_quintile_scores(values: np.ndarray, group: np.ndarray) -> np.ndarray:
+    """
+    Vectorized rfm_scores_quantile.qscore (ascending) for many snapshots at once.
+
+    values/group are ordered like the per-snapshot frames (group, then customer), so
+    rank(method="first") ties break the same way. qcut edges only depend on the group
+    size (ranks are 1..n); they are computed with the same Series.quantile call qcut uses.
+    """
+    s = pd.Series(values).replace([np.inf, -np.inf], np.nan).fillna(0).to_numpy()
+    pos = np.arange(len(s))
+    order = np.lexsort((pos, s, group))
+    sizes = np.bincount(group)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    ranks = np.empty(len(s), dtype="float64")
+    ranks[order] = pos - starts[group[order]] + 1
+
+    scores = np.empty(len(s), dtype="int64")
+    for n in np.unique(sizes[sizes > 0]):
+        edges = pd.Series(np.arange(1, n + 1, dtype="float64")).quantile(np.linspace(0, 1, 6)).to_numpy()
+        rows = np.flatnonzero(sizes[group] == n)
+        if np.unique(edges).size < edges.size:
+            # qcut raises on duplicate edges -> same pd.cut fallback as qscore, per snapshot
+            for g in np.unique(group[rows]):
+                g_rows = rows[group[rows] == g]
+                scores[g_rows] = pd.cut(
+                    pd.Series(ranks[g_rows]), 5, labels=_SCORE_LABELS, include_lowest=True
+                ).astype(int).to_numpy()
+            continue
+        # qcut(right=True, include_lowest=True): bin = #edges strictly below the rank (min 1)
+        below = (ranks[rows][:, None] > edges[None, :]).sum(axis=1)
+        scores[rows] = np.maximum(below, 1)
+    return scores
+
+
+def running_group_sums(values: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    """
+    Per-row running sum of `values` within its group, in row order.
+
+    Uses the same Kahan-compensated update as pandas' groupby sum, so the value at
+    any row is bit-identical to groupby().sum() over the group's rows up to it
+    (keeps Monetary ties/ranks exactly as the per-snapshot path sees them).
+    Vectorized across groups: one step per row position within a group.
+    """
+    values = np.asarray(values, dtype="float64")
+    order = np.argsort(groups, kind="stable")
+    v = values[order]
+    g = groups[order]
+    starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+    counts = np.diff(np.r_[starts, len(g)])
+
+    total = np.zeros(len(starts))
+    comp = np.zeros(len(starts))
+    running = np.empty(len(v))
+    active = np.arange(len(starts))
+    for k in range(int(counts.max()) if len(counts) else 0):
+        active = active[counts[active] > k]
+        idx = starts[active] + k
+        val = v[idx]
+        ok = ~np.isnan(val)
+        y = val - comp[active]
+        t = total[active] + y
+        c = t - total[active] - y
+        c[np.isnan(c)] = 0.0
+        total[active] = np.where(ok, t, total[active])
+        comp[active] = np.where(ok, c, comp[active])
+        running[idx] = total[active]
+
+    out = np.empty(len(v))
+    out[order] = running
+    return out
+
+
+_RFM_COLUMNS = [
+    "SnapshotDate", "YearMonth",
+    "RecencyDays", "Frequency", "Monetary",
+    "R_Score", "F_Score", "M_Score", "RFM_Score",
+    "Segment"
+]
 
+
+def _rfm_cells(
+    tx: pd.DataFrame,
+    month_ends: list[pd.Timestamp],
+    customer_col: str = "CustomerID",
+    date_col: str = "InvoiceDate",
+    invoice_col: str = "InvoiceNo",
+    amount_col: str = "TotalPrice",
+):
+    """
+    Per (customer, snapshot period) cells accumulated within customer -> (rows(row_cust, row_bucket) -> RFM
+    inputs, customer codes, first snapshot number per customer); None when no order falls before the last
+    snapshot. Rows may be any (customer, snapshot) pairs with the customer active by then.
+    """
+    snaps = np.array([pd.Timestamp(me).normalize().value for me in month_ends], dtype="int64")
+    n_snaps = len(snaps)
+
+    tx = tx.sort_values(date_col, kind="stable")
+    date_ns = tx[date_col].to_numpy(dtype="datetime64[ns]").view("i8")
+    bucket = np.searchsorted(snaps, date_ns, side="left")
+    keep = bucket < n_snaps
+    if not keep.any():
+        return None
+
+    codes, customers = pd.factorize(tx[customer_col], sort=True)
+    is_order = tx[invoice_col].notna().to_numpy()
+
+    amount = tx[amount_col].to_numpy()[keep]
+    cust = codes[keep].astype("int64")
+    if pd.api.types.is_integer_dtype(tx[amount_col]):
+        running = pd.Series(amount).groupby(cust).cumsum().to_numpy()
+    else:
+        running = running_group_sums(amount, cust)
+
+    # rows are date-ordered, so the last row of a (customer, month) cell carries its as-of totals
+    cells = pd.DataFrame({
+        "cell": cust * n_snaps + bucket[keep],
+        "last": date_ns[keep],
+        "orders": is_order[keep].astype("int64"),
+        "amount": running,
+    }).groupby("cell", sort=True).agg(last=("last", "max"), orders=("orders", "sum"), amount=("amount", "last"))
+
+    cell_key = cells.index.to_numpy()
+    cell_cust = cell_key // n_snaps
+    by_cust = cells.groupby(cell_cust, sort=False)
+    last_cum = by_cust["last"].cummax().to_numpy()
+    freq_cum = by_cust["orders"].cumsum().to_numpy()
+    monetary_cum = cells["amount"].to_numpy()
+    customers = np.asarray(customers)
+
+    first_cell = np.flatnonzero(np.r_[True, cell_cust[1:] != cell_cust[:-1]])
+
+    def rows(row_cust: np.ndarray, row_bucket: np.ndarray) -> pd.DataFrame:
+        src = np.searchsorted(cell_key, row_cust * n_snaps + row_bucket, side="right") - 1
+        snap_dates = snaps[row_bucket]
+        ref_ns = snap_dates + pd.Timedelta(days=1).value
+        return pd.DataFrame({
+            customer_col: customers[row_cust],
+            "SnapshotDate": pd.to_datetime(snap_dates),
+            "RecencyDays": np.clip((ref_ns - last_cum[src]) // pd.Timedelta(days=1).value, 0, None),
+            "Frequency": freq_cum[src].astype(int),
+            "Monetary": monetary_cum[src],
+        })
+
+    return rows, cell_cust[first_cell], cell_key[first_cell] % n_snaps
+
+
+def build_rfm_history(
+    tx: pd.DataFrame,
+    month_ends: list[pd.Timestamp],
+    customer_col: str = "CustomerID",
+    date_col: str = "InvoiceDate",
+    invoice_col: str = "InvoiceNo",
+    amount_col: str = "TotalPrice",
+) -> pd.DataFrame:
+    """
+    RFM + segments for every snapshot date (month-ends, Sundays or days) in one pass.
+
+    Per (customer, snapshot period) cells are aggregated once and accumulated within customer;
+    each (snapshot, customer) row reads its as-of state from the last cell <= snapshot.
+    Scores use grouped ranks partitioned by SnapshotDate and a precomputed segment table.
+    Expects tx = order facts in date order (as built by order_facts) for bit-identical Monetary.
+    """
+    state = _rfm_cells(tx, month_ends, customer_col, date_col, invoice_col, amount_col)
+    if state is None:
+        return pd.DataFrame(columns=[customer_col] + _RFM_COLUMNS)
+    rows, panel_cust, first_bucket = state
+
+    # panel rows: every customer from its first active month-end onwards, ordered (snapshot, customer)
+    counts = len(month_ends) - first_bucket
+    row_cust = np.repeat(panel_cust, counts)
+    row_bucket = np.repeat(first_bucket, counts) + (
+        np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    )
+    order = np.lexsort((row_cust, row_bucket))
+    row_cust, row_bucket = row_cust[order], row_bucket[order]
+    return score_rfm_panel(rows(row_cust, row_bucket), row_bucket, customer_col)
+
+
+def iter_rfm_history(
+    tx: pd.DataFrame,
+    month_ends: list[pd.Timestamp],
+    customer_col: str = "CustomerID",
+    date_col: str = "InvoiceDate",
+    invoice_col: str = "InvoiceNo",
+    amount_col: str = "TotalPrice",
+):
+    """
+    build_rfm_history one snapshot at a time (same rows, in order): cells are built once, each yielded
+    frame holds and scores only that snapshot's customers. Snapshots before the first order are skipped.
+    """
+    state = _rfm_cells(tx, month_ends, customer_col, date_col, invoice_col, amount_col)
+    if state is None:
+        return
+    rows, panel_cust, first_bucket = state
+    for b in range(len(month_ends)):
+        row_cust = panel_cust[first_bucket <= b]
+        if len(row_cust):
+            row_bucket = np.full(len(row_cust), b, dtype="int64")
+            yield score_rfm_panel(rows(row_cust, row_bucket), np.zeros(len(row_cust), dtype="int64"), customer_col)
+
+
+def score_rfm_panel(out: pd.DataFrame, group: np.ndarray, customer_col: str = "CustomerID") -> pd.DataFrame:
+    """
+    RFM inputs ordered (SnapshotDate, customer) -> scores + segments; group = snapshot number per row.
+    """
+    cols = [customer_col] + _RFM_COLUMNS
+    out["YearMonth"] = out["SnapshotDate"].dt.strftime("%Y-%m")
+
+    out["R_Score"] = 6 - grouped_quintile_scores(out["RecencyDays"].to_numpy(), group)
+    out["F_Score"] = grouped_quintile_scores(out["Frequency"].to_numpy(), group)
+    out["M_Score"] = grouped_quintile_scores(out["Monetary"].to_numpy(), group)
+    out["RFM_Score"] = out["R_Score"] + out["F_Score"] + out["M_Score"]
+    out["Segment"] = segment_lookup()[out["R_Score"].to_numpy(), out["F_Score"].to_numpy(), out["M_Score"].to_numpy()]
+
+    return out[cols]
+
+
+def prepare_transactions(tx: pd.DataFrame, typed: bool = False) -> pd.DataFrame:
+    """
+    Validate + derive TotalPrice. typed=True: dates/IDs already typed (Parquet/in-memory), skip re-parsing.
+    """
     required = {"InvoiceDate", "CustomerID", "InvoiceNo"}
     missing = required - set(tx.columns)
     if missing:
         raise ValueError(f"Missing required columns in transactions: {sorted(missing)}")
 
+    tx = tx.copy()
     if "TotalPrice" not in tx.columns:
         if {"Quantity", "UnitPrice"}.issubset(tx.columns):
             tx["TotalPrice"] = tx["Quantity"] * tx["UnitPrice"]
         else:
             raise ValueError("No TotalPrice column found (and cannot derive from Quantity*UnitPrice).")
 
-    tx["InvoiceDate"] = _safe_to_datetime(tx["InvoiceDate"]).dt.tz_localize(None)
+    if not typed:
+        tx["InvoiceDate"] = _safe_to_datetime(tx["InvoiceDate"]).dt.tz_localize(None)
     tx = tx.dropna(subset=["InvoiceDate", "CustomerID"]).copy()
 
-    tx["CustomerID"] = to_clean_id(tx["CustomerID"])
+    if not typed:
+        tx["CustomerID"] = clean_ids(tx["CustomerID"])
+    return tx
 
-    min_d = tx["InvoiceDate"].min().normalize()
-    max_d = tx["InvoiceDate"].max().normalize()
+
+def snapshot_ends(tx, start: str | None = None, end: str | None = None, cadence: str = "monthly") -> list[pd.Timestamp]:
+    if isinstance(tx, pd.DataFrame):
+        min_d, max_d = tx["InvoiceDate"].min(), tx["InvoiceDate"].max()
+    else:
+        min_d, max_d = duckdb_engine.date_bounds(tx)
+    min_d, max_d = min_d.normalize(), max_d.normalize()
 
     if start:
         min_d = max(pd.Timestamp(start).normalize(), min_d)
     if end:
         max_d = min(pd.Timestamp(end).normalize(), max_d)
 
-    month_ends = month_ends_between(min_d, max_d)
-    if not month_ends:
-        raise ValueError("No month-ends found in the specified date range.")
+    snaps = list(snapshot_dates(min_d, max_d, cadence))
+    if not snaps:
+        raise ValueError(f"No {cadence} snapshot dates found in the specified date range.")
+    return snaps
+
+
+# -------------------------
+# Parallel snapshots: transaction columns live in shared memory, workers map read-only views
+# -------------------------
+_WORKER: dict = {}
 
-    snapshots = [compute_snapshot_rfm(tx, me) for me in month_ends]
-    out = pd.concat(snapshots, ignore_index=True)
 
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    out.to_csv(out_path, index=False)
+def _attach_worker(spec: dict, customers: np.ndarray) -> None:
+    """
+    Pool initializer: map the shared columns once per worker (nothing is pickled per task).
+    """
+    for name, (shm_name, dtype, n) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _WORKER[f"_shm_{name}"] = shm  # keep the mapping alive
+        _WORKER[name] = np.ndarray((n,), dtype=dtype, buffer=shm.buf)
+    _WORKER["customers"] = customers
+
+
+def _snapshot_worker(snapshot_end: pd.Timestamp) -> pd.DataFrame:
+    # rows are date-sorted: history <= snapshot_end is a prefix of the shared arrays
+    hi = int(np.searchsorted(_WORKER["date"], pd.Timestamp(snapshot_end).normalize().value, side="right"))
+    invoice = _WORKER["invoice"][:hi]
+    tx = pd.DataFrame({
+        "CustomerID": _WORKER["customer"][:hi],
+        "InvoiceDate": _WORKER["date"][:hi].view("datetime64[ns]"),
+        "InvoiceNo": pd.Series(invoice).where(invoice >= 0),
+        "TotalPrice": _WORKER["amount"][:hi],
+    })
+    # customer codes follow sorted-ID order, so groupby/sort/rank order matches the serial path
+    out = compute_snapshot_rfm(tx, snapshot_end)
+    out["CustomerID"] = _WORKER["customers"][out["CustomerID"].to_numpy()]
+    return out
+
+
+def _parallel_snapshots(tx: pd.DataFrame, month_ends: list[pd.Timestamp], workers: int):
+    tx = tx.sort_values("InvoiceDate", kind="stable")
+    customer_codes, customers = pd.factorize(tx["CustomerID"], sort=True)
+    invoice_codes, _ = pd.factorize(tx["InvoiceNo"])
+    columns = {
+        "customer": customer_codes.astype("int64"),
+        "date": tx["InvoiceDate"].to_numpy(dtype="datetime64[ns]").view("i8"),
+        "invoice": invoice_codes.astype("int64"),
+        "amount": tx["TotalPrice"].to_numpy(),
+    }
+
+    blocks, spec = [], {}
+    try:
+        for name, arr in columns.items():
+            shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            blocks.append(shm)
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+            spec[name] = (shm.name, arr.dtype.str, len(arr))
+        del columns
+
+        # spawn, like the churn_model CV pool: fork is unsafe once the parent has started OpenMP / BLAS threads
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_attach_worker,
+            initargs=(spec, np.asarray(customers)),  # keeps the ID dtype (int32 codes / int64 / str)
+        ) as pool:
+            # map keeps month-end order -> deterministic output; frames are handed out as they arrive
+            yield from pool.map(_snapshot_worker, month_ends)
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+
+def check_workers(engine: str, workers: int) -> None:
+    # only the per-snapshot reference engine runs on a process pool
+    if workers > 1 and engine != "snapshot":
+        raise ValueError(f"workers={workers} needs engine='snapshot' (engine '{engine}' runs in one process)")
+
+
+def compute_segment_snapshots(
+    tx,
+    start: str | None = None,
+    end: str | None = None,
+    workers: int = 1,
+    engine: str = "vectorized",
+    memory_limit: str | None = None,
+    cadence: str = "monthly",
+) -> pd.DataFrame:
+    """
+    One RFM snapshot per cadence period end (month-end / Sunday / day).
+    engine="vectorized": build_rfm_history (all snapshot dates at once).
+    engine="snapshot": compute_snapshot_rfm per snapshot date (reference), optionally across `workers` processes.
+    engine="duckdb": RFM inputs from the out-of-core SQL engine (tx may be a Parquet path), scored like vectorized.
+    """
+    check_workers(engine, workers)
+    month_ends = snapshot_ends(tx, start, end, cadence)
+    if engine == "vectorized":
+        return build_rfm_history(tx, month_ends)
+    if engine == "duckdb":
+        rfm = duckdb_engine.rfm_inputs(tx, month_ends, memory_limit=memory_limit)
+        group, _ = pd.factorize(rfm["SnapshotDate"], sort=True)
+        return score_rfm_panel(rfm, group)
+    if workers > 1 and len(month_ends) > 1:
+        snapshots = list(_parallel_snapshots(tx, month_ends, min(workers, len(month_ends))))
+    else:
+        snapshots = [compute_snapshot_rfm(tx, me) for me in month_ends]
+    # snapshots before the first order (a daily one on the first order's day) are empty placeholders
+    return pd.concat([s for s in snapshots if len(s)] or snapshots, ignore_index=True)
+
+
+def iter_segment_snapshots(
+    tx,
+    start: str | None = None,
+    end: str | None = None,
+    workers: int = 1,
+    engine: str = "vectorized",
+    memory_limit: str | None = None,
+    cadence: str = "monthly",
+):
+    """
+    compute_segment_snapshots as a stream of non-empty per-snapshot frames (concatenated: the same table).
+    engine="duckdb" yields its whole result at once (it spills to disk instead).
+    """
+    check_workers(engine, workers)
+    month_ends = snapshot_ends(tx, start, end, cadence)
+    if engine == "vectorized":
+        frames = iter_rfm_history(tx, month_ends)
+    elif engine == "duckdb":
+        frames = [compute_segment_snapshots(tx, start, end, engine=engine, memory_limit=memory_limit,
+                                            cadence=cadence)]
+    elif workers > 1 and len(month_ends) > 1:
+        frames = _parallel_snapshots(tx, month_ends, min(workers, len(month_ends)))
+    else:
+        frames = (compute_snapshot_rfm(tx, me) for me in month_ends)
+    for frame in frames:
+        if len(frame):
+            yield frame
+
+
+def build_segment_snapshot(
+    in_path: Path,
+    out_path: Path,
+    start: str | None = None,
+    end: str | None = None,
+    fmt: str = "csv",
+    workers: int = 1,
+    engine: str = "vectorized",
+    memory_limit: str | None = None,
+    cadence: str = "monthly",
+    stream: bool = False,
+) -> None:
+    """
+    stream=True: each snapshot is written as soon as it is scored and then released (peak memory ~ one
+    snapshot instead of the whole history); the file is identical to the default mode.
+    """
+    if engine == "duckdb" and is_columnar(in_path):
+        tx = in_path  # scanned by DuckDB, never loaded into memory
+    else:
+        tx = ensure_order_facts(prepare_transactions(read_table(in_path), typed=is_columnar(in_path)))
+    params = dict(workers=workers, engine=engine, memory_limit=memory_limit, cadence=cadence)
+
+    if not stream:
+        out = compute_segment_snapshots(tx, start, end, **params)
+        out_path = write_table(out, out_path, fmt)
+        rows, n_snapshots, n_customers = len(out), out["SnapshotDate"].nunique(), out["CustomerID"].nunique()
+    else:
+        # SnapshotDate is the only datetime column and always midnight: per-frame CSV dates match
+        snapshots, customers = set(), set()
+        with TableWriter(out_path, fmt) as writer:
+            for frame in iter_segment_snapshots(tx, start, end, **params):
+                writer.write(frame)
+                snapshots.update(frame["SnapshotDate"].unique())
+                customers.update(frame["CustomerID"].unique())
+                del frame  # release the snapshot before the next one is scored
+        out_path, rows, n_snapshots, n_customers = writer.path, writer.rows, len(snapshots), len(customers)
+
     print(f"✅ Segment snapshot saved: {out_path}")
-    print(f"📌 Rows: {len(out):,} | Months: {len(month_ends)} | Unique customers: {out['CustomerID'].nunique():,}")
+    print(f"📌 Rows: {rows:,} | Snapshots ({cadence}): {n_snapshots} | Unique customers: {n_customers:,}")
 
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--in", dest="in_path", required=True)
+    ap.add_argument("--in", dest="in_path", required=True, help="cleaned transactions or order facts")
     ap.add_argument("--out", dest="out_path", required=True)
     ap.add_argument("--start", default=None)
     ap.add_argument("--end", default=None)
+    ap.add_argument("--format", choices=FORMATS, default="csv", help="output format (input is read by suffix)")
+    ap.add_argument("--cadence", choices=list(CADENCES), default="monthly", help="snapshot every month / week / day end")
+    ap.add_argument("--engine", choices=["vectorized", "snapshot", "duckdb"], default="vectorized",
+                    help="vectorized = all snapshot dates at once; snapshot = per snapshot date reference; "
+                         "duckdb = out-of-core SQL engine (Parquet input is never loaded into memory)")
+    ap.add_argument("--workers", type=int, default=1, help="processes for --engine snapshot (1 = serial)")
+    ap.add_argument("--memory_limit", default=None, help="duckdb: memory cap before spilling to disk, e.g. 2GB")
+    ap.add_argument("--stream", action="store_true",
+                    help="write each snapshot as soon as it is scored (peak memory ~ one snapshot, same file)")
     args = ap.parse_args()
+    if args.workers > 1 and args.engine != "snapshot":
+        ap.error("--workers needs --engine snapshot (the other engines run in one process)")
 
-    build_segment_snapshot(Path(args.in_path), Path(args.out_path), start=args.start, end=args.end)
+    build_segment_snapshot(
+        Path(args.in_path), Path(args.out_path), start=args.start, end=args.end, fmt=args.format,
+        workers=args.workers, engine=args.engine, memory_limit=args.memory_limit, cadence=args.cadence,
+        stream=args.stream,
+    )
 
 
 if __name__ == "__main__":
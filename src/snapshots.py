@@ -0,0 +1,39 @@
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+# Snapshot calendars shared by features, RFM segments and the incremental append: a snapshot is the
+# midnight of the last day of its period and covers every order up to that midnight.
+CADENCES = {"daily": "D", "weekly": "W-SUN", "monthly": "ME"}
+
+
+def _offset(cadence: str):
+    if cadence not in CADENCES:
+        raise ValueError(f"Unknown cadence {cadence!r}; expected one of {sorted(CADENCES)}")
+    return to_offset(CADENCES[cadence])
+
+
+def snapshot_on_or_after(ts: pd.Timestamp, cadence: str = "monthly") -> pd.Timestamp:
+    """
+    First snapshot date >= ts's day (month-end / Sunday / the day itself).
+    """
+    return _offset(cadence).rollforward(pd.Timestamp(ts).normalize())
+
+
+def snapshot_dates(first: pd.Timestamp, last: pd.Timestamp, cadence: str = "monthly") -> pd.DatetimeIndex:
+    """
+    Snapshot dates from the first on/after `first` to the first on/after `last` (both days inclusive).
+    """
+    return pd.date_range(
+        snapshot_on_or_after(first, cadence), snapshot_on_or_after(last, cadence), freq=_offset(cadence)
+    )
+
+
+def parse_windows(arg, primary_first: bool = False, option: str = "--windows") -> list[int]:
+    """
+    "30,90" -> [30, 90]: day windows, deduplicated. Ascending (rolling feature windows), or with
+    primary_first=True in the given order (churn_label: the first window is the primary label).
+    """
+    windows = [int(w) for w in str(arg).split(",") if w.strip()]
+    if not windows or any(w <= 0 for w in windows):
+        raise ValueError(f"Invalid {option}: {arg}")
+    return list(dict.fromkeys(windows)) if primary_first else sorted(set(windows))
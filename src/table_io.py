@@ -0,0 +1,157 @@
+from pathlib import Path
+import re
+import pandas as pd
+
+# CSV = BI export format. Parquet = typed, compressed columnar intermediates.
+FORMATS = ("csv", "parquet")
+SUFFIXES = {"csv": ".csv", "parquet": ".parquet"}
+
+# Fixed schema for pipeline intermediates (applied on every Parquet write)
+DATE_COLUMNS = ["InvoiceDate", "SnapshotDate", "first_purchase", "last_purchase"]
+CATEGORY_COLUMNS = [
+    "Country", "YearMonth", "Segment", "segment", "risk_bucket",
+    "value_tier", "priority", "action", "offer_type", "message_angle",
+]
+REASON_COLUMN = re.compile(r"reason_(\d+)")  # reason_codes.reason_columns: reason_1..reason_N (categories too)
+TEXT_COLUMNS = ["InvoiceNo", "StockCode", "Description"]
+ID_COLUMN = "CustomerID"
+
+
+def is_columnar(path) -> bool:
+    return Path(path).suffix.lower() == SUFFIXES["parquet"]
+
+
+def with_format(path, fmt: str) -> Path:
+    """
+    Align a path's suffix with the output format (readers pick the format from the suffix).
+    """
+    path = Path(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt} (expected one of {FORMATS})")
+    if fmt == "parquet" or is_columnar(path):
+        return path.with_suffix(SUFFIXES[fmt])
+    return path
+
+
+def numeric_ids(s: pd.Series) -> pd.Series:
+    """
+    Cleaned CustomerID strings -> int64 when every ID is an integer, else unchanged.
+    Integer columns (typed IDs, int32 registry codes) keep their dtype.
+    """
+    if pd.api.types.is_integer_dtype(s):
+        return s
+    num = pd.to_numeric(s, errors="coerce")
+    if num.notna().all() and (num % 1 == 0).all():
+        return num.astype("int64")
+    return s.astype(str)
+
+
+def reason_columns_in(columns) -> list[str]:
+    """
+    reason_1..reason_N columns present (any N, from churn_model --reasons), in N order.
+    """
+    found = [c for c in columns if isinstance(c, str) and REASON_COLUMN.fullmatch(c)]
+    return sorted(found, key=lambda c: int(REASON_COLUMN.fullmatch(c).group(1)))
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    out = df.copy()
+    for c in DATE_COLUMNS:
+        if c in out.columns and not pd.api.types.is_datetime64_dtype(out[c]):
+            out[c] = pd.to_datetime(out[c], errors="coerce")
+    for c in CATEGORY_COLUMNS + reason_columns_in(out.columns):
+        if c in out.columns and not isinstance(out[c].dtype, pd.CategoricalDtype):
+            out[c] = out[c].astype("category")
+    for c in TEXT_COLUMNS:
+        if c in out.columns:
+            out[c] = out[c].astype(str).where(out[c].notna())
+    if ID_COLUMN in out.columns:
+        out[ID_COLUMN] = numeric_ids(out[ID_COLUMN])
+    return out
+
+
+def read_table(path, columns: list[str] | None = None) -> pd.DataFrame:
+    if is_columnar(path):
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+
+def write_table(df: pd.DataFrame, path, fmt: str = "csv") -> Path:
+    path = with_format(path, fmt)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if fmt == "parquet":
+        apply_schema(df).to_parquet(path, index=False, compression="zstd")
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+
+def csv_date_format(dates: pd.Series) -> str:
+    """
+    The format to_csv picks for a datetime column: date-only when every value is midnight.
+    """
+    has_time = bool((dates.dropna() != dates.dropna().dt.normalize()).any())
+    return "%Y-%m-%d %H:%M:%S" if has_time else "%Y-%m-%d"
+
+
+class TableWriter:
+    """
+    Append DataFrames to one CSV / Parquet file (header / schema from the first frame).
+    CSV: pass date_format when frames may differ in time-of-day (pandas picks it per frame), either one
+    format for every datetime column or {column: format}; append=True continues an existing CSV (no header).
+    """
+
+    def __init__(self, path, fmt: str = "csv", date_format: str | dict | None = None, append: bool = False):
+        self.path = with_format(path, fmt)
+        self.fmt = fmt
+        self.date_format = date_format
+        if append and fmt != "csv":
+            raise ValueError("append=True is only supported for CSV (Parquet files are rewritten)")
+        self.append = append
+        self.rows = 0
+        self._schema = None
+        self._writer = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.fmt == "parquet":
+            self._write_parquet(df)
+        else:
+            first = self.rows == 0 and not self.append
+            date_format = self.date_format
+            if isinstance(date_format, dict):
+                df = df.assign(**{c: df[c].dt.strftime(f) for c, f in date_format.items()
+                                  if c in df.columns and pd.api.types.is_datetime64_any_dtype(df[c])})
+                date_format = None
+            df.to_csv(self.path, index=False, mode="w" if first else "a", header=first, date_format=date_format)
+        self.rows += len(df)
+
+    def _write_parquet(self, df: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(apply_schema(df), preserve_index=False)
+        if self._writer is None:
+            # per-frame category counts / all-null columns must not narrow the file schema
+            fields = []
+            for f in table.schema:
+                if pa.types.is_dictionary(f.type):
+                    f = f.with_type(pa.dictionary(pa.int32(), f.type.value_type))
+                elif pa.types.is_null(f.type):
+                    f = f.with_type(pa.string())
+                fields.append(f)
+            self._schema = pa.schema(fields, metadata=table.schema.metadata)
+            self._writer = pq.ParquetWriter(self.path, self._schema, compression="zstd")
+        self._writer.write_table(table.cast(self._schema))
+
+    def close(self) -> Path:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,61 @@
+from pathlib import Path
+import shutil
+import subprocess
+import sys
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(ROOT / "src"), str(ROOT / "benchmarks")]
+
+import synthetic_data  # noqa: E402
+
+# Small synthetic export: ~2 years of monthly snapshots, a few hundred customers (seconds per pipeline run)
+ROWS = 20_000
+CUSTOMERS = 600
+INVOICES = 2_000
+
+
+@pytest.fixture(scope="session")
+def raw_csv(tmp_path_factory) -> Path:
+    cfg = {**synthetic_data.default_config(ROWS), "customers": CUSTOMERS, "invoices": INVOICES}
+    return synthetic_data.generate_csv(cfg, tmp_path_factory.mktemp("raw") / "online_retail_II.csv")
+
+
+@pytest.fixture(scope="session")
+def clean_tx(raw_csv) -> pd.DataFrame:
+    import make_dataset
+
+    return make_dataset.clean_transactions(pd.read_csv(raw_csv, encoding_errors="ignore"))
+
+
+@pytest.fixture(scope="session")
+def orders(clean_tx) -> pd.DataFrame:
+    """
+    Order fact table on int32 customer codes, as the pipeline stages see it.
+    """
+    import customer_ids
+    import order_facts
+
+    tx = clean_tx.copy()
+    _, tx["CustomerID"] = customer_ids.CustomerRegistry.encode_new(tx["CustomerID"])
+    return order_facts.build_order_facts(tx)
+
+
+def make_project(root: Path, raw: Path) -> Path:
+    """
+    Copy of src/ + config/ with `raw` as data/raw/online_retail_II.csv (run_pipeline paths are repo-relative).
+    """
+    shutil.copytree(ROOT / "src", root / "src", ignore=shutil.ignore_patterns("__pycache__"))
+    shutil.copytree(ROOT / "config", root / "config")
+    (root / "data" / "raw").mkdir(parents=True)
+    shutil.copy(raw, root / "data" / "raw" / "online_retail_II.csv")
+    return root
+
+
+def run_pipeline(project: Path, *args: str) -> str:
+    proc = subprocess.run([sys.executable, "src/run_pipeline.py", *args], cwd=project, capture_output=True,
+                          text=True)
+    if proc.returncode != 0:
+        raise AssertionError(f"run_pipeline {' '.join(args)} failed:\n{proc.stdout[-3000:]}\n{proc.stderr[-3000:]}")
+    return proc.stdout
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from conftest import make_project, run_pipeline
+
+# every history / BI output an --append run rewrites
+OUTPUTS = [
+    "transactions_clean", "customer_features_monthly", "customer_features_labeled", "customer_segment_snapshot",
+    "churn_scores", "campaign_actions", "churn_scores_latest", "campaign_actions_latest", "churn_ops_target_latest",
+    "dashboard_sales_monthly", "dashboard_risk_segments", "dashboard_action_budget", "dashboard_cohort_retention",
+]
+
+
+@pytest.fixture(scope="module")
+def split_raw(raw_csv, tmp_path_factory):
+    """
+    The raw export cut into a base file and a delta with the last ~6 weeks of invoices.
+    """
+    raw = pd.read_csv(raw_csv)
+    dates = pd.to_datetime(raw["InvoiceDate"])
+    cut = dates.max() - pd.Timedelta(days=45)
+    out = tmp_path_factory.mktemp("split")
+    raw[dates <= cut].to_csv(out / "base.csv", index=False)
+    raw[dates > cut].to_csv(out / "delta.csv", index=False)
+    return out / "base.csv", out / "delta.csv"
+
+
+def assert_same_outputs(a, b):
+    for stem in OUTPUTS:
+        left = pd.read_csv(a / "data" / "processed" / f"{stem}.csv")
+        right = pd.read_csv(b / "data" / "processed" / f"{stem}.csv")
+        pd.testing.assert_frame_equal(left, right, check_exact=False, rtol=1e-9, obj=stem)
+
+
+def test_append_matches_full_build(raw_csv, split_raw, tmp_path):
+    base, delta = split_raw
+    appended = make_project(tmp_path / "append", base)
+    run_pipeline(appended, "--no_cache")
+    run_pipeline(appended, "--append", str(delta))
+
+    full = make_project(tmp_path / "full", raw_csv)
+    run_pipeline(full, "--no_cache")
+    assert_same_outputs(appended, full)
+
+    scores = pd.read_csv(full / "data" / "processed" / "churn_scores.csv")
+    explained = scores.loc[scores["reason_1"].notna(), "SnapshotDate"].unique()
+    assert list(explained) == [scores["SnapshotDate"].max()]
+
+
+def test_score_only_append_matches_full_build(raw_csv, split_raw, tmp_path):
+    base, delta = split_raw
+    appended = make_project(tmp_path / "append", base)
+    run_pipeline(appended, "--no_cache")
+    models = appended / "models" / "churn_model"
+    run_pipeline(appended, "--append", str(delta), "--score_only")
+
+    # same saved model, scored over the whole history in one go
+    full = make_project(tmp_path / "full", raw_csv)
+    run_pipeline(full, "--no_cache", "--score_only", "--models_dir", str(models))
+    assert_same_outputs(appended, full)
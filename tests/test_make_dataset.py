@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+
+import make_dataset
+from table_io import write_table
+
+
+@pytest.fixture(scope="module")
+def expected(raw_csv, clean_tx, tmp_path_factory) -> dict:
+    out = tmp_path_factory.mktemp("in_memory")
+    return {fmt: write_table(clean_tx, out / "transactions_clean.csv", fmt) for fmt in ["csv", "parquet"]}
+
+
+@pytest.mark.parametrize("chunk_rows", [1_000, 7_777, 1_000_000])
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_chunked_matches_in_memory(raw_csv, expected, tmp_path, fmt, chunk_rows):
+    path, rows, customers = make_dataset.clean_transactions_chunked(
+        raw_csv, tmp_path / "transactions_clean.csv", fmt, chunk_rows=chunk_rows, tmp_dir=tmp_path,
+    )
+    if fmt == "csv":
+        assert path.read_bytes() == expected[fmt].read_bytes()
+    else:
+        pd.testing.assert_frame_equal(pd.read_parquet(path), pd.read_parquet(expected[fmt]))
+    clean = pd.read_parquet(expected["parquet"])
+    assert (rows, customers) == (len(clean), clean["CustomerID"].nunique())
+
+
+def test_clean_leaves_input_untouched(raw_csv):
+    raw = pd.read_csv(raw_csv, nrows=5_000)
+    before = raw.copy()
+    make_dataset.clean_transactions(raw)
+    pd.testing.assert_frame_equal(raw, before)
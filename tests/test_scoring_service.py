@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import scoring_service
+from conftest import make_project, run_pipeline
+from table_io import read_table
+
+
+@pytest.fixture(scope="module")
+def parquet_project(tmp_path_factory, raw_csv):
+    project = make_project(tmp_path_factory.mktemp("parquet"), raw_csv)
+    run_pipeline(project, "--format", "parquet", "--no_cache")
+    return project
+
+
+def _batch_latest(proc) -> pd.DataFrame:
+    scores = read_table(proc / "churn_scores.parquet")
+    latest = scores[scores["SnapshotDate"] == scores["SnapshotDate"].max()]
+    return latest.set_index(latest["CustomerID"].astype(str))
+
+
+def test_scores_from_parquet_artifacts(parquet_project):
+    proc = parquet_project / "data" / "processed"
+    scorer = scoring_service.load_scorer(
+        proc / "customer_features_monthly.parquet", proc / "customer_segment_snapshot.parquet",
+        models_dir=parquet_project / "models" / "churn_model",
+    )
+    batch = _batch_latest(proc)
+    assert len(scorer) == len(batch)
+
+    # typed IDs, cleaned strings and raw float spellings all resolve to the same customer
+    ids = list(batch.index)
+    for request in ([int(c) for c in ids], ids, [f"{c}.0" for c in ids]):
+        results = scorer.score(request)
+        assert all(r is not None for r in results)
+        assert [r["CustomerID"] for r in results] == ids
+
+    results = pd.DataFrame(scorer.score(ids)).set_index("CustomerID")
+    np.testing.assert_allclose(results["churn_probability"], batch.loc[results.index, "churn_probability"],
+                               rtol=1e-9)
+    for c in ["risk_bucket", "segment", "reason_1"]:
+        expected = batch.loc[results.index, c].astype(object).where(batch.loc[results.index, c].notna(), None)
+        assert results[c].tolist() == expected.tolist()
+    assert scorer.score(["no-such-customer"]) == [None]
+
+
+def test_parquet_features_with_csv_segments(parquet_project, tmp_path):
+    proc = parquet_project / "data" / "processed"
+    segments_csv = tmp_path / "customer_segment_snapshot.csv"
+    read_table(proc / "customer_segment_snapshot.parquet").to_csv(segments_csv, index=False)
+
+    scorer = scoring_service.load_scorer(proc / "customer_features_monthly.parquet", segments_csv,
+                                         models_dir=parquet_project / "models" / "churn_model")
+    batch = _batch_latest(proc)
+    results = pd.DataFrame(scorer.score(list(batch.index))).set_index("CustomerID")
+    assert results["segment"].tolist() == batch.loc[results.index, "segment"].astype(str).tolist()
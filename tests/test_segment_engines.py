@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+
+import segment_snapshot as ss
+
+
+@pytest.fixture(scope="module")
+def tx(orders) -> pd.DataFrame:
+    return ss.prepare_transactions(orders, typed=True)
+
+
+@pytest.fixture(scope="module", params=["monthly", "weekly"])
+def reference(request, tx) -> tuple[str, pd.DataFrame]:
+    # snapshot = per-date qcut + segment_from_rfm, the reference the whole-history engines must reproduce
+    return request.param, ss.compute_segment_snapshots(tx, engine="snapshot", cadence=request.param)
+
+
+@pytest.mark.parametrize("engine", ["vectorized", "duckdb"])
+def test_engines_match_snapshot(tx, reference, engine):
+    if engine == "duckdb":
+        pytest.importorskip("duckdb")
+    cadence, ref = reference
+    out = ss.compute_segment_snapshots(tx, engine=engine, cadence=cadence)
+    pd.testing.assert_frame_equal(ref, out, check_exact=False, rtol=1e-9, check_dtype=False)
+
+
+def test_parallel_snapshots_match_serial(tx, reference):
+    cadence, ref = reference
+    out = ss.compute_segment_snapshots(tx, engine="snapshot", workers=2, cadence=cadence)
+    pd.testing.assert_frame_equal(ref, out)
+
+
+@pytest.mark.parametrize("engine", ["vectorized", "snapshot"])
+def test_stream_matches_table(tx, engine):
+    frames = list(ss.iter_segment_snapshots(tx, engine=engine))
+    assert all(frame["SnapshotDate"].nunique() == 1 for frame in frames)
+    pd.testing.assert_frame_equal(pd.concat(frames, ignore_index=True),
+                                  ss.compute_segment_snapshots(tx, engine=engine))
+
+
+@pytest.mark.parametrize("engine", ["vectorized", "duckdb"])
+def test_workers_need_snapshot_engine(tx, engine):
+    with pytest.raises(ValueError, match="engine='snapshot'"):
+        ss.compute_segment_snapshots(tx, engine=engine, workers=2)